@@ -1,65 +1,288 @@
+import sys
 import xml.etree.ElementTree as ElementTree
-from fuzzywuzzy import fuzz
+from xml.parsers import expat
+from array import array
+from collections import OrderedDict
+from threading import Lock
 from assets import get_asset
-from typing import List, Tuple
+from bible.bible_metadata import BibleMetadata
+from bible.bible_index import BibleIndex, get_index_path, is_index_fresh
+from typing import Dict, List, Optional, Tuple
 
+# How many books are kept in memory when the Bible is read from the XML file.
+MAX_LOADED_BOOKS = 4
 
-class Bible:
-    def __init__(self, asset_name: str = 'niv.xml') -> None:
-        # Get the XML file path.
-        asset_path = get_asset(asset_name)
 
-        # Parse the XML path
-        tree = ElementTree.parse(asset_path)
-        root = tree.getroot()
+def scan_books(xml_path: str) -> Tuple[Dict[str, List[int]], Dict[str, Tuple[int, int]]]:
+    """Streams the Bible XML file and returns the verse count of every chapter, and where every
+    book is in the file, without building any element.
 
-        self.content = {}
+    Args:
+        xml_path (str): Path to the Bible XML file.
 
-        for book in root.iterfind('book'):
-            book_name = book.get('name').lower()
-            self.content[book_name] = {}
+    Returns:
+        Tuple[Dict[str, List[int]], Dict[str, Tuple[int, int]]]: Lowercase book name to the verse
+            count of each chapter, and lowercase book name to the byte offsets of the start of the
+            book and of what follows it, both in the order the books appear in the file.
+    """
+    verse_counts: Dict[str, List[int]] = {}
+    book_ranges: Dict[str, Tuple[int, int]] = {}
 
-            for chapter in book.iterfind('chapter'):
-                chapter_no = chapter.get('name')
-                self.content[book_name][chapter_no] = {}
+    parser = expat.ParserCreate()
 
-                for verse in chapter.iterfind('verse'):
-                    verse_no = verse.get('name')
+    # The book being read, where it starts, and whether its end tag was read.
+    current: List = [None, 0, False]
 
-                    self.content[book_name][chapter_no][verse_no] = verse.text
+    def close_book():
+        # The book ends at the first tag after its end tag, so the whole end tag is included.
+        if current[0] is not None and current[2]:
+            book_ranges[current[0]] = (current[1], parser.CurrentByteIndex)
+            current[0] = None
 
-    def fuzzy_search_book(self, query: str) -> str:
-        '''
-        Returns the bible book name that best matches the query.
-        '''
-        books = self.content.keys()
-        scores = {}
+    def on_start(name: str, attrs: Dict[str, str]):
+        close_book()
+
+        if name == 'book':
+            book = attrs['name'].lower()
+            current[:] = [book, parser.CurrentByteIndex, False]
+            verse_counts[book] = []
+        elif name == 'chapter' and current[0] is not None:
+            verse_counts[current[0]].append(0)
+        elif name == 'verse' and current[0] is not None:
+            counts = verse_counts[current[0]]
+            counts[-1] = max(counts[-1], int(attrs['name']))
+
+    def on_end(name: str):
+        close_book()
+
+        if name == 'book':
+            current[2] = True
+
+    parser.StartElementHandler = on_start
+    parser.EndElementHandler = on_end
+
+    with open(xml_path, 'rb') as f:
+        parser.ParseFile(f)
+
+    return (verse_counts, book_ranges)
+
+
+class ChapterText:
+    """The verses of a chapter, stored as offsets into a text shared by the whole book. Verse `i`
+    is `text[offsets[i - 1]:offsets[i]]`.
+    """
+
+    __slots__ = ('_text', '_offsets')
+
+    def __init__(self, text: str, offsets: array) -> None:
+        self._text = text
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def text(self) -> str:
+        """The text of the whole book."""
+        return self._text
+
+    @property
+    def offsets_size(self) -> int:
+        """The size of the verse offsets, in bytes."""
+        return len(self._offsets) * self._offsets.itemsize
+
+    def get_range(self, start: int, end: int) -> List[str]:
+        """Returns the verses from `start` to `end` (both inclusive, 1-indexed). The range is clamped
+        to the verses that exist in the chapter.
+        """
+        start = max(start, 1)
+        end = min(end, len(self))
+
+        text = self._text
+        offsets = self._offsets
+
+        return [text[offsets[i - 1]:offsets[i]] for i in range(start, end + 1)]
+
+
+class LazyXmlBibleText:
+    """Bible text read from the translation XML file. This is only used when the compiled index
+    (see `bible.bible_index`) is not available.
+
+    The XML file is streamed once to record the books, their chapter and verse counts, and where
+    each book is in the file. The verses of a book are only read when they are first needed, by
+    seeking to the book and parsing only its bytes, and only the most recently used books are kept
+    in memory.
+    """
+
+    def __init__(self, xml_path: str, max_loaded_books: int = MAX_LOADED_BOOKS,
+                 verse_counts: Optional[Dict[str, List[int]]] = None) -> None:
+        """
+        Args:
+            xml_path (str): Path to the Bible XML file.
+            max_loaded_books (int, optional): How many books are kept in memory.
+            verse_counts (Dict[str, List[int]], optional): The verse counts of the XML file, see
+                `scan_verse_counts`. If given, the file is only scanned when the first book is
+                read. Otherwise, it is scanned now.
+        """
+        self.xml_path = xml_path
+        self.max_loaded_books = max_loaded_books
+
+        # Book name -> the byte offsets of the book in the XML file, see `scan_books`.
+        self._book_ranges: Optional[Dict[str, Tuple[int, int]]] = None
+        self._scan_lock = Lock()
+
+        # Book name -> the verse count of each chapter, in the order of the books in the file.
+        if verse_counts is None:
+            (verse_counts, self._book_ranges) = scan_books(xml_path)
+
+        self._verse_counts: Dict[str, List[int]] = verse_counts
+
+        # Book name -> chapters of the book, in least recently used order.
+        self._loaded_books: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def _get_book_ranges(self) -> Dict[str, Tuple[int, int]]:
+        with self._scan_lock:
+            if self._book_ranges is None:
+                (_, self._book_ranges) = scan_books(self.xml_path)
+
+            return self._book_ranges
+
+    def _read_book(self, book: str) -> List[ChapterText]:
+        """Reads only the bytes of the given book from the XML file, and returns its chapters."""
+        book_range = self._get_book_ranges().get(book)
+
+        if book_range is None:
+            raise KeyError(book)
+
+        (start, end) = book_range
+
+        with open(self.xml_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        return self._to_chapters(book, ElementTree.fromstring(data))
+
+    def _to_chapters(self, book: str, book_elem: ElementTree.Element) -> List[ChapterText]:
+        """Stores the verses of the book in one string, and each chapter as offsets into it."""
+        verses = {}
+
+        for chapter in book_elem.iterfind('chapter'):
+            chapter_no = int(chapter.get('name'))
 
-        for book in books:
-            score = fuzz.ratio(book, query.lower())
-            scores[book] = score
+            for verse in chapter.iterfind('verse'):
+                verses[(chapter_no, int(verse.get('name')))] = verse.text or ''
 
-        best_score = max(scores.values())
+        parts = []
+        length = 0
+        chapter_offsets = []
 
-        # Best matches for the given query
-        books_with_best_score = []
+        # Missing verses are stored as empty strings, so every chapter is contiguous from 1.
+        for chapter_no, verse_count in enumerate(self._verse_counts[book], start=1):
+            offsets = array('I', [length])
 
-        for book in books:
-            if scores[book] == best_score:
-                books_with_best_score.append(book)
+            for verse_no in range(1, verse_count + 1):
+                verse = verses.get((chapter_no, verse_no), '')
+                parts.append(verse)
+                length += len(verse)
+                offsets.append(length)
 
-        # Create a list of books with the length of the title
-        books_and_length = map(
-            lambda title: (len(title), title),
-            books_with_best_score
-        )
+            chapter_offsets.append(offsets)
 
-        # Sort the book by the title length first, then lexicographically
-        sorted_books = sorted(books_and_length)
-        # print(sorted_books)
+        text = ''.join(parts)
+        return [ChapterText(text, offsets) for offsets in chapter_offsets]
 
-        # Return the book name of the first item
-        return sorted_books[0][1]
+    def _get_book(self, book: str) -> List[ChapterText]:
+        with self._lock:
+            content = self._loaded_books.get(book)
+
+            if content is not None:
+                self._loaded_books.move_to_end(book)
+                return content
+
+        # Read outside the lock, so that readers of loaded books do not wait. Two threads may read
+        # the same book at once, and the last one is kept.
+        content = self._read_book(book)
+
+        with self._lock:
+            self._loaded_books[book] = content
+            self._loaded_books.move_to_end(book)
+
+            # Evict the least recently used books.
+            while len(self._loaded_books) > self.max_loaded_books:
+                self._loaded_books.popitem(last=False)
+
+        return content
+
+    @property
+    def loaded_books(self) -> List[str]:
+        """The books that are currently in memory, from the least recently used."""
+        return list(self._loaded_books.keys())
+
+    @property
+    def memory_size(self) -> int:
+        """An estimate of the memory used by the loaded books, in bytes."""
+        size = 0
+
+        for chapters in list(self._loaded_books.values()):
+            if len(chapters) > 0:
+                size += sys.getsizeof(chapters[0].text)
+
+            size += sum(chapter.offsets_size for chapter in chapters)
+
+        return size
+
+    @property
+    def book_names(self) -> List[str]:
+        return list(self._verse_counts.keys())
+
+    def chapter_count(self, book: str) -> int:
+        return len(self._verse_counts[book])
+
+    def verse_count(self, book: str, chapter: int) -> int:
+        verse_counts = self._verse_counts[book]
+        chapter = int(chapter)
+
+        if chapter < 1 or chapter > len(verse_counts):
+            raise KeyError(f'{book} has no chapter {chapter}')
+
+        return verse_counts[chapter - 1]
+
+    def get_verses(self, book: str, chapter: int, start: int, end: int) -> List[str]:
+        # Validates the chapter number
+        chapter = int(chapter)
+        self.verse_count(book, chapter)
+
+        return self._get_book(book)[chapter - 1].get_range(start, end)
+
+
+class Bible:
+    def __init__(self, asset_name: str = 'niv.xml', metadata: Optional[BibleMetadata] = None) -> None:
+        # Get the XML file path.
+        asset_path = get_asset(asset_name)
+
+        # Prefer the compiled index (see build_bible_index.py), it is memory mapped and decodes
+        # verses on demand instead of parsing the whole XML file.
+        index_path = get_index_path(asset_path)
+
+        if is_index_fresh(asset_path, index_path):
+            self.text = BibleIndex(index_path)
+        elif metadata is None:
+            self.text = LazyXmlBibleText(asset_path)
+        else:
+            self.text = LazyXmlBibleText(
+                asset_path, verse_counts=metadata.verse_counts)
+
+        if metadata is None:
+            metadata = BibleMetadata.from_text(self.text)
+
+        self.metadata = metadata
+
+    def fuzzy_search_book(self, query: str) -> str:
+        '''
+        Returns the bible book name that best matches the query.
+        '''
+        return self.metadata.fuzzy_search_book(query)
 
     def parse_book_chapter_verse(self, input_str: str) -> Tuple[str, str, str]:
         '''
@@ -87,45 +310,8 @@ class Bible:
         # Ensure the book exists
         book_name = self.fuzzy_search_book(book)
 
-        # Get all the verses from the book and chapter
-        verses: dict = self.content[book_name][str(chapter)]
-
-        # Get the number of verses available
-        verse_nums = map(int, verses.keys())
-        last_verse_num = max(verse_nums)
-
-        # Add the verses that satisfies the range
-        result = []
-
-        for i in range(1, last_verse_num + 1):
-            if i >= start and i <= end:
-                result.append(verses[str(i)])
-
-        return result
+        return self.text.get_verses(book_name, chapter, start, end)
 
     def get_verse_range(self, book: str, chapter: int, start: int, end: int) -> Tuple[int, int]:
-        """Returns the verse range for the given book and chapter.
-
-        Args:
-            book (str): The book
-            chapter (int): The chapter number
-            start (int): Desired start verse number
-            end (int): Desired end verse number
-
-        Returns:
-            Tuple[int, int]: The valid start and end verse number
-        """
-        verses = self.content[book][str(chapter)]
-        verses_count = len(verses)
-
-        result_start = start
-
-        if result_start < 1:
-            result_start = 1
-
-        result_end = end
-
-        if result_end > verses_count:
-            result_end = verses_count
-
-        return (result_start, result_end)
+        """Returns the verse range for the given book and chapter. See `BibleMetadata.get_verse_range`."""
+        return self.metadata.get_verse_range(book, chapter, start, end)
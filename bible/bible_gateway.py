@@ -1,37 +1,196 @@
-from typing import List, Tuple
-from bs4 import BeautifulSoup
-from bs4.element import NavigableString, Tag
-from . import utils
+import re
+import time
+from typing import Dict, List, Optional, Tuple
 import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import NavigableString, Tag
+from .bible_gateway_stream import BibleGatewayStreamParser
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .gateway_client import DeadlineExceeded, GatewayClient, get_default_client
+from .page_cache import PageCache
+from .passage import ChapterMarker, FootnoteMarker, HeadingMarker, Passage, VerseMarker, \
+    parse_footnote_id
 
 BASE_URL = 'https://www.biblegateway.com/passage'
 
+# Statuses, other than server errors, that mean Bible Gateway is failing rather than the request.
+OVERLOADED_STATUSES = frozenset([429])
+
+# Only the passage text and its footnotes are used, so the rest of the page is not built into the tree.
+PASSAGE_STRAINER = SoupStrainer('div', class_=['std-text', 'footnotes'])
+
+# Parser engines. `soup` builds a BeautifulSoup tree of the passage, and `stream` extracts the
+# passage while reading the page, without any tree. Both give the same output.
+ENGINE_SOUP = 'soup'
+ENGINE_STREAM = 'stream'
+ENGINES = [ENGINE_SOUP, ENGINE_STREAM]
+DEFAULT_ENGINE = ENGINE_STREAM
+
+
+# The passage text of a page. Pages without it, e.g. "No results found", are not cached.
+PASSAGE_PATTERN = re.compile(r'<div[^>]*\bclass=["\'][^"\']*\bstd-text\b')
+
+
+def has_passage(html: str) -> bool:
+    """Returns whether the Bible Gateway page has a passage."""
+    return PASSAGE_PATTERN.search(html) is not None
+
 
 def is_html_tag(test, name: str) -> bool:
     return isinstance(test, Tag) and test.name == name
 
 
 class BibleGateway:
-    def get_url(self, book: str, chapter: int, version: str = 'NIV') -> str:
+    def __init__(self, client: Optional[GatewayClient] = None,
+                 cache: Optional[PageCache] = None,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        Args:
+            client (GatewayClient, optional): The HTTP client. Defaults to the one shared by the
+                process.
+            cache (PageCache, optional): Where fetched pages are cached. Defaults to no cache.
+            breaker (CircuitBreaker, optional): Stops fetching while Bible Gateway is failing.
+                Defaults to always fetching.
+        """
+        self._client = client
+        self.cache = cache
+        self.breaker = breaker
+
+    @property
+    def client(self) -> GatewayClient:
+        if self._client is None:
+            self._client = get_default_client()
+
+        return self._client
+
+    def get_url(self, book: str, chapter: int, version: str = 'NIV',
+                end_chapter: Optional[int] = None) -> str:
         # Replace whitespace with %20, which is used for URLs
         book_parsed = book.replace(" ", "%20")
 
+        # Several chapters are searched as a range, e.g. John 17-18
+        chapters = str(chapter)
+        if end_chapter is not None and end_chapter != chapter:
+            chapters = f'{chapter}-{end_chapter}'
+
         # Add the query parameters
-        return BASE_URL + f'/?search={book_parsed}+{chapter}' + f'&version={version}'
+        return BASE_URL + f'/?search={book_parsed}+{chapters}' + f'&version={version}'
+
+    def probe(self):
+        """Fetches a chapter without the cache or the circuit breaker, raising if it fails. It is
+        used to check whether Bible Gateway has recovered.
+        """
+        self.client.get(self.get_url('John', 1))
+
+    def _record_error(self, error: Exception, seconds: float):
+        """Records the failed fetch in the circuit breaker. Only connection errors, timeouts and
+        statuses that mean Bible Gateway is down or overloaded count as failures. Another status,
+        e.g. for an unknown version, means that Bible Gateway answered. Running out of the caller's
+        time, e.g. a timeout shortened to fit the deadline, is ignored.
+        """
+        if isinstance(error, DeadlineExceeded):
+            self.breaker.record_ignored()
+        elif isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            self.breaker.record_failure()
+        elif isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+
+            if status >= 500 or status in OVERLOADED_STATUSES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success(seconds)
+        else:
+            self.breaker.record_ignored()
+
+    def get_html(self, book: str, chapter: int, version: str = 'NIV',
+                 deadline: Optional[float] = None, end_chapter: Optional[int] = None) -> str:
+        """Returns the Bible Gateway page of the chapter, or of the chapters up to `end_chapter` in a
+        single request. A cached page is used if there is one. Only pages with a passage are
+        cached, so that e.g. a "No results found" page is fetched again next time.
+
+        Args:
+            book (str): The book name.
+            chapter (int): The chapter number.
+            version (str, optional): The Bible version. Defaults to 'NIV'.
+            deadline (float, optional): The `time.monotonic()` by which the fetch must end. Defaults
+                to the client's total timeout from now.
+            end_chapter (int, optional): The last chapter. Defaults to only `chapter`.
+
+        Raises:
+            DeadlineExceeded: If the page is not cached and the fetch is not expected to end before
+                the deadline. Nothing is fetched.
+            CircuitOpenError: If the page is not cached and the circuit breaker is open.
 
-    def get_html(self, book: str, chapter: int, version: str = 'NIV') -> str:
-        result = requests.get(self.get_url(book, chapter, version))
-        print('Fetching from ' + result.url)
+        Returns:
+            str: The HTML source.
+        """
+        if self.cache is not None:
+            html = self.cache.get(book, chapter, version, end_chapter)
+
+            if html is not None:
+                return html
+
+        # Give up up front, rather than time out part-way
+        if not self.client.can_fetch_by(deadline):
+            raise DeadlineExceeded('Not enough time left to fetch from Bible Gateway')
+
+        if self.breaker is not None and not self.breaker.allow_request():
+            raise CircuitOpenError('Bible Gateway is failing, not fetching for now')
+
+        url = self.get_url(book, chapter, version, end_chapter)
+        print('Fetching from ' + url)
+
+        start = time.monotonic()
 
-        # Throw error if not successful
-        result.raise_for_status()
+        try:
+            html = self.client.get(url, deadline=deadline).text
+        except Exception as e:
+            if self.breaker is not None:
+                self._record_error(e, time.monotonic() - start)
 
-        return result.text
+            raise
+
+        if self.breaker is not None:
+            self.breaker.record_success(time.monotonic() - start)
+
+        if self.cache is not None:
+            if has_passage(html):
+                self.cache.put(book, chapter, version, html, end_chapter)
+            else:
+                print(f'Not caching {url}, it has no passage')
+
+        return html
 
 
 class BibleGatewayParser:
-    def __init__(self, raw_html: str) -> None:
+    def __init__(self, raw_html: str, engine: str = DEFAULT_ENGINE) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown parser engine {engine}, must be one of {ENGINES}')
+
         self.raw_html = raw_html
+        self.engine = engine
+        self._soup: Optional[BeautifulSoup] = None
+        self._stream: Optional[BibleGatewayStreamParser] = None
+        self._passage: Optional[Passage] = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        """The parsed passage text and footnotes. The page is parsed once, on first use."""
+        if self._soup is None:
+            self._soup = BeautifulSoup(
+                self.raw_html, 'html.parser', parse_only=PASSAGE_STRAINER)
+
+        return self._soup
+
+    @property
+    def stream(self) -> BibleGatewayStreamParser:
+        """The passage lines and footnotes read by the `stream` engine. The page is read once, on
+        first use.
+        """
+        if self._stream is None:
+            self._stream = BibleGatewayStreamParser().parse(self.raw_html)
+
+        return self._stream
 
     def get_footnotes(self) -> List[Tuple[str, str]]:
         """Returns the footnotes for the passage. The first is the verse and the second is the
@@ -40,10 +199,33 @@ class BibleGatewayParser:
         Returns:
             List[Tuple[str, str]]: The first is the verse and the second is the footnote.
         """
-        soup = BeautifulSoup(self.raw_html, 'html.parser')
+        return [(verse, content) for _, verse, content in self._get_footnote_items()]
+
+    def get_footnotes_by_id(self, footnote_ids: List[str]) -> List[Tuple[str, str]]:
+        """Returns the footnotes with the ids, in the order of the ids. Unknown ids are skipped.
+
+        Args:
+            footnote_ids (List[str]): The footnote ids, e.g. from `Passage.get_range_with_footnotes`.
+
+        Returns:
+            List[Tuple[str, str]]: The first is the verse and the second is the footnote.
+        """
+        footnotes: Dict[str, Tuple[str, str]] = {}
+
+        for footnote_id, verse, content in self._get_footnote_items():
+            if footnote_id is not None:
+                footnotes[footnote_id] = (verse, content)
+
+        return [footnotes[footnote_id] for footnote_id in footnote_ids if footnote_id in footnotes]
+
+    def _get_footnote_items(self) -> List[Tuple[Optional[str], str, str]]:
+        """Returns the id, verse and content of every footnote."""
+        if self.engine == ENGINE_STREAM:
+            return list(self.stream.footnotes or [])
+
         result = []
 
-        footnotes_section = soup.find('div', class_='footnotes')
+        footnotes_section = self.soup.find('div', class_='footnotes')
 
         if not footnotes_section is None:
             # Find all footnotes list items
@@ -57,19 +239,18 @@ class BibleGatewayParser:
                 # Get the footnote content.
                 # Telegram supports enough for this HTML format, see https://core.telegram.org/bots/api#html-style
                 content_span = footnote.find('span')
-                content = self._extract_span(content_span)
+                content = ''.join(self._extract_span(content_span))
 
                 # Footnote can contain nested HTML tags, so use this first
                 # content = footnote.find('span').text
-                result.append((verse, content))
+                result.append((footnote.get('id'), verse, content))
 
         return result
 
-    def _extract_header(self, header: Tag) -> str:
+    def _extract_header(self, header: Tag) -> List[str]:
         header_span = header.find('span')
-        header_text = self._extract_span(header_span)
 
-        return f'<b>{header_text}</b>'
+        return [HeadingMarker(), '<b>', *self._extract_span(header_span), '</b>']
 
     def _extract_sup(self, sup: Tag) -> str:
         """Extracts the content of <sup> tag.
@@ -87,22 +268,22 @@ class BibleGatewayParser:
 
         if 'versenum' in tag_classes:
             # Verse number
-            return self._format_verse_num(text)
+            return VerseMarker(text)
         elif 'footnote' in tag_classes:
-            # Footnote indicator
-            return f'<i>{text}</i>'
+            # Footnote indicator, linked to its footnote
+            return FootnoteMarker(text, parse_footnote_id(sup.get('data-fn')))
         else:
             # Ignore other <sup> tags
             return ''
 
-    def _extract_span(self, span: Tag) -> str:
+    def _extract_span(self, span: Tag) -> List[str]:
         """Recursively extract the content text of the <span> tag.
 
         Args:
             span (Tag): The span tag.
 
         Returns:
-            str: The extracted text.
+            List[str]: The pieces of the extracted text. Verse numbers are `VerseMarker` pieces.
         """
         children = list(span.children)
 
@@ -111,69 +292,61 @@ class BibleGatewayParser:
             tag_class = span.get('class', [])
 
             if 'small-caps' in tag_class:
-                return children[0].text.upper()
+                return [children[0].text.upper()]
             else:
-                return children[0].text
+                return [children[0].text]
 
-        result = ''
+        result = []
 
         # Else, iterate and extract
         for child in children:
-            child_text = child.text
-
             if isinstance(child, NavigableString):
-                result += child_text
+                result.append(child.text)
             elif is_html_tag(child, 'sup'):
-                result += self._extract_sup(child)
-            elif is_html_tag(child, 'span') and not 'chapternum' in child.get('class', []):
-                result += self._extract_span(child)
+                result.append(self._extract_sup(child))
+            elif is_html_tag(child, 'span') and 'chapternum' in child.get('class', []):
+                result.append(ChapterMarker(child.text))
+            elif is_html_tag(child, 'span'):
+                result.extend(self._extract_span(child))
             elif is_html_tag(child, 'i'):
-                result += f'<i>{child_text}</i>'
+                result.append(f'<i>{child.text}</i>')
 
         return result
 
-    def _extract_poetry(self, div: Tag) -> str:
-        result = ''
+    def _extract_poetry(self, div: Tag) -> List[str]:
+        result = []
 
         p = div.find('p')
         for child in p.children:
             if is_html_tag(child, 'br'):
-                result += '\n'
+                result.append('\n')
             elif is_html_tag(child, 'span'):
-                result += self._extract_span(child)
+                result.extend(self._extract_span(child))
 
         return result
 
-    def _format_verse_num(self, num: str) -> str:
-        num_chars = filter(lambda c: c.isnumeric(), num)
-        number = int(''.join(num_chars))
-        return f' <b>{utils.get_superscript(number)}</b> '
-
-    def _extract_paragraph(self, p: Tag) -> str:
-        verses_in_paragraph = ''
+    def _extract_paragraph(self, p: Tag) -> List[str]:
+        verses_in_paragraph = []
 
         spans = filter(lambda x: is_html_tag(x, 'span'), p.children)
 
         for span in spans:
-            verses_in_paragraph += self._extract_span(span)
+            verses_in_paragraph.extend(self._extract_span(span))
 
         return verses_in_paragraph
 
-    def extract_verses(self, from_verse: int = 1, to_verse: int = -1) -> str:
-        """Returns the verses as formatted like in Bible Gateway.
-
-        Args:
-            from_verse (int, optional): Which verse number to start from. Defaults to 1.
-            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end. This
-            number must be larger or equal to `from_verse`. 
-
-        Returns:
-            str: The verses.
+    def _extract_lines(self) -> List[List[str]]:
+        """Returns the lines of the whole passage: headers, paragraphs and poetry. Each line is a
+        list of text pieces.
         """
-        soup = BeautifulSoup(self.raw_html, 'html.parser')
+        if self.engine == ENGINE_STREAM:
+            if self.stream.lines is None:
+                raise ValueError('The page has no passage text!')
+
+            return self.stream.lines
 
         result_lines = []
-        std_text = soup.find('div', class_='std-text')
+        std_text = self.soup.find('div', class_='std-text')
 
         for child in std_text.children:
             if is_html_tag(child, 'h3') or is_html_tag(child, 'h4'):
@@ -191,23 +364,80 @@ class BibleGatewayParser:
                 for p_child in paragraphs:
                     result_lines.append(self._extract_paragraph(p_child))
 
-        result = '\n\n'.join(result_lines)
+        return result_lines
 
-        # Perform cutting if needed
-        if from_verse > 1:
-            verse_num_str = self._format_verse_num(str(from_verse))
-            target = result.find(verse_num_str)
+    def get_passage(self) -> Passage:
+        """Returns the whole chapter, with where each verse starts. It is built once, on first use.
 
-            # If the target is valid, then cut the verse
-            if target != -1:
-                result = result[target:]
+        Returns:
+            Passage: The chapter.
+        """
+        if self._passage is None:
+            self._passage = Passage.from_lines(self._extract_lines())
 
-        if to_verse != -1 and to_verse >= from_verse:
-            verse_num_str = self._format_verse_num(str(to_verse + 1))
-            target = result.find(verse_num_str)
+        return self._passage
 
-            # If it the end target is valid, then cut the verse
-            if target != -1:
-                result = result[:target]
+    def extract_chapter_verses(self, chapter: int, from_verse: int = 1, to_verse: int = -1) -> str:
+        """Returns the verses of one chapter of a page of several chapters, as formatted like in
+        Bible Gateway. For a page of only this chapter, it is the same as `extract_verses`.
 
-        return result
+        Args:
+            chapter (int): The chapter.
+            from_verse (int, optional): Which verse number to start from. Defaults to 1.
+            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end.
+
+        Raises:
+            KeyError: If the page does not have the chapter, see `Passage.get_chapter`.
+
+        Returns:
+            str: The verses.
+        """
+        return self.get_passage().get_chapter(chapter).get_range(from_verse, to_verse)
+
+    def extract_verses_with_footnotes(self, from_verse: int = 1, to_verse: int = -1,
+                                      chapter: Optional[int] = None,
+                                      first_footnote: int = 0) -> Tuple[str, List[Tuple[str, str]]]:
+        """Returns the verses like `extract_verses`, and only the footnotes of those verses. The
+        footnote letters are relettered in order, starting at `first_footnote`. If the page's
+        footnote letters are not linked to the footnotes, they are kept, and every footnote is
+        returned with the first range, i.e. when `first_footnote` is 0.
+
+        Args:
+            from_verse (int, optional): Which verse number to start from. Defaults to 1.
+            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end.
+            chapter (int, optional): The chapter of a page of several chapters, see
+                `extract_chapter_verses`. Defaults to the whole page.
+            first_footnote (int, optional): The index of the first footnote letter, e.g. to continue
+                the letters of a previous chapter. Defaults to 0, meaning `a`.
+
+        Returns:
+            Tuple[str, List[Tuple[str, str]]]: The verses, and the verse and content of each of
+                their footnotes, in the order of their letters.
+        """
+        passage = self.get_passage()
+        linked = len(passage.footnote_starts) > 0
+
+        if chapter is not None:
+            passage = passage.get_chapter(chapter)
+
+        if not linked:
+            footnotes = self.get_footnotes() if first_footnote == 0 else []
+            return (passage.get_range(from_verse, to_verse), footnotes)
+
+        (verses, footnote_ids) = passage.get_range_with_footnotes(
+            from_verse, to_verse, first_footnote)
+
+        return (verses, self.get_footnotes_by_id(footnote_ids))
+
+    def extract_verses(self, from_verse: int = 1, to_verse: int = -1) -> str:
+        """Returns the verses as formatted like in Bible Gateway.
+
+        Args:
+            from_verse (int, optional): Which verse number to start from. Defaults to 1.
+            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end. This
+            number must be larger or equal to `from_verse`. 
+
+        Returns:
+            str: The verses.
+        """
+        return self.get_passage().get_range(from_verse, to_verse)
@@ -0,0 +1,337 @@
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+from .passage import ChapterMarker, FootnoteMarker, HeadingMarker, VerseMarker, parse_footnote_id
+
+# Elements that never have content, so there is no end tag to wait for.
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+    'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'keygen',
+    'menuitem', 'nextid', 'spacer',
+}
+
+# How an element is handled, decided by its parent when the element starts.
+_IGNORE = 0  # Not part of the output, and neither is anything inside it.
+_SEARCH = 1  # Only looked through, for the elements its search root is looking for.
+_STD_TEXT = 2  # <div class="std-text">, every line of the passage.
+_HEADER = 3  # <h3> or <h4>, the first <span> inside is the header text.
+_PARAGRAPH = 4  # <p>, made of the <span> children.
+_POETRY = 5  # <div class="poetry">, the first <p> inside is the poetry.
+_POETRY_LINES = 6  # <p> of a poetry, made of the <span> children and line breaks.
+_CONTAINER = 7  # Other <div>, every <p> inside is a paragraph.
+_SPAN = 8  # <span>, the text with its verse numbers, footnote markers and italics.
+_SUP = 9  # <sup>, a verse number or a footnote marker.
+_ITALIC = 10  # <i>
+_TEXT = 11  # Inside <sup>, <i> or a footnote link, only the text is kept.
+_BREAK = 12  # <br> of a poetry.
+_FOOTNOTES = 13  # <div class="footnotes">, the first <ol> inside is the footnotes list.
+_FOOTNOTE_LIST = 14  # <ol>, every <li> inside is a footnote.
+_FOOTNOTE = 15  # <li>, the first <a> inside is the verse and the first <span> is the footnote.
+_FOOTNOTE_VERSE = 16  # <a> of a footnote.
+_CHAPTER = 17  # <span class="chapternum">, the chapter number.
+
+
+class _Frame:
+    """An element that has started but not ended yet. Its output is collected in `parts`, and given
+    to `owner` when the element ends.
+    """
+    __slots__ = ('tag', 'mode', 'owner', 'classes', 'parts',
+                 'children', 'last_is_text', 'found', 'verse', 'footnote_id')
+
+    def __init__(self, tag: str, mode: int, owner: Optional['_Frame'], classes: List[str]) -> None:
+        self.tag = tag
+        self.mode = mode
+        self.owner = owner
+        self.classes = classes
+        self.parts = []
+
+        # For <span>, how many child nodes it has and whether the last one is text.
+        self.children = 0
+        self.last_is_text = False
+
+        # For search roots that only use their first match.
+        self.found = False
+
+        # For <li> of a footnote.
+        self.verse = None
+
+        # For <sup> of a footnote letter and <li> of a footnote, the footnote's id.
+        self.footnote_id = None
+
+
+class _StopParsing(Exception):
+    """Raised once everything needed has been read, to skip the rest of the page."""
+
+
+class BibleGatewayStreamParser(HTMLParser):
+    """Extracts the passage and footnotes of a Bible Gateway page in a single pass over the HTML,
+    without building a document tree. Only the elements that are still open are kept, and reading
+    stops once both the passage text and the footnotes have been read.
+
+    The output is the same as the `BeautifulSoup` engine of `BibleGatewayParser`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self._stack: List[_Frame] = []
+
+        # Every line is a list of text pieces, see `Passage.from_lines`.
+        self.lines: Optional[List[List[str]]] = None
+        # The id, verse and text of every footnote.
+        self.footnotes: Optional[List[Tuple[Optional[str], str, str]]] = None
+
+    def parse(self, raw_html: str) -> 'BibleGatewayStreamParser':
+        try:
+            self.feed(raw_html)
+            self.close()
+
+            # End the elements that are never closed in the page.
+            while len(self._stack) > 0:
+                self._end_top()
+        except _StopParsing:
+            pass
+
+        return self
+
+    # ------------------------ Tokenizer callbacks
+    def handle_starttag(self, tag, attrs):
+        if self._start(tag, attrs) and tag in VOID_ELEMENTS:
+            self._end_top()
+
+    def handle_startendtag(self, tag, attrs):
+        if self._start(tag, attrs):
+            self._end_top()
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+
+        # Close everything up to the matching element, like an unclosed tag would be. Unmatched end
+        # tags are ignored.
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].tag == tag:
+                while len(self._stack) > i:
+                    self._end_top()
+
+                return
+
+    def handle_data(self, data):
+        if len(self._stack) == 0:
+            return
+
+        frame = self._stack[-1]
+
+        if frame.mode == _SPAN:
+            frame.parts.append(data)
+
+            # Consecutive text is a single text node.
+            if not frame.last_is_text:
+                frame.children += 1
+                frame.last_is_text = True
+        elif frame.mode in (_SUP, _ITALIC, _TEXT, _FOOTNOTE_VERSE, _CHAPTER):
+            frame.parts.append(data)
+
+    def handle_entityref(self, name):
+        character = html5.get(name + ';')
+        self.handle_data(character if character is not None else f'&{name}')
+
+    def handle_charref(self, name):
+        if name[0] in 'xX':
+            number = int(name[1:], 16)
+        else:
+            number = int(name)
+
+        # Numbers below 256 are sometimes meant as Windows-1252, e.g. &#147; for a curly quote.
+        character = None
+        if number < 256:
+            try:
+                character = bytes([number]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+
+        if character is None:
+            try:
+                character = chr(number)
+            except (ValueError, OverflowError):
+                character = '\N{REPLACEMENT CHARACTER}'
+
+        self.handle_data(character)
+
+    def handle_comment(self, data):
+        # A comment is a node of its own, but has no text.
+        if len(self._stack) > 0 and self._stack[-1].mode == _SPAN:
+            self._stack[-1].children += 1
+            self._stack[-1].last_is_text = False
+
+    # ------------------------ Element handling
+    def _start(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        """Starts an element. Returns whether it is open, i.e. inside the passage or footnotes."""
+        classes = []
+        footnote_id = None
+        for name, value in attrs:
+            if name == 'class' and value is not None:
+                classes = value.split()
+            elif name == 'data-fn' and tag == 'sup':
+                footnote_id = parse_footnote_id(value)
+            elif name == 'id' and tag == 'li':
+                footnote_id = value
+
+        if len(self._stack) == 0:
+            frame = self._start_section(tag, classes)
+
+            if frame is None:
+                return False
+
+            self._stack.append(frame)
+            return True
+
+        frame = self._start_child(self._stack[-1], tag, classes)
+        frame.footnote_id = footnote_id
+        self._stack.append(frame)
+        return True
+
+    def _start_section(self, tag: str, classes: List[str]) -> Optional[_Frame]:
+        """Starts the passage text or the footnotes section, only the first of each is used."""
+        if tag != 'div':
+            return None
+
+        if 'std-text' in classes and self.lines is None:
+            return _Frame(tag, _STD_TEXT, None, classes)
+
+        if 'footnotes' in classes and self.footnotes is None:
+            return _Frame(tag, _FOOTNOTES, None, classes)
+
+        return None
+
+    def _start_child(self, parent: _Frame, tag: str, classes: List[str]) -> _Frame:
+        mode = parent.mode
+
+        if mode == _IGNORE:
+            return _Frame(tag, _IGNORE, None, classes)
+
+        if mode in (_SUP, _ITALIC, _TEXT, _FOOTNOTE_VERSE, _CHAPTER):
+            return _Frame(tag, _TEXT, parent, classes)
+
+        if mode == _SPAN:
+            parent.children += 1
+            parent.last_is_text = False
+
+            if tag == 'sup':
+                return _Frame(tag, _SUP, parent, classes)
+            elif tag == 'span' and 'chapternum' in classes:
+                return _Frame(tag, _CHAPTER, parent, classes)
+            elif tag == 'span':
+                return _Frame(tag, _SPAN, parent, classes)
+            elif tag == 'i':
+                return _Frame(tag, _ITALIC, parent, classes)
+
+            return _Frame(tag, _IGNORE, None, classes)
+
+        if mode == _STD_TEXT:
+            if tag == 'h3' or tag == 'h4':
+                return _Frame(tag, _HEADER, parent, classes)
+            elif tag == 'p':
+                return _Frame(tag, _PARAGRAPH, parent, classes)
+            elif tag == 'div' and 'poetry' in classes:
+                return _Frame(tag, _POETRY, parent, classes)
+            elif tag == 'div':
+                return _Frame(tag, _CONTAINER, parent, classes)
+
+            return _Frame(tag, _IGNORE, None, classes)
+
+        if mode == _PARAGRAPH or mode == _POETRY_LINES:
+            if tag == 'span':
+                return _Frame(tag, _SPAN, parent, classes)
+            elif tag == 'br' and mode == _POETRY_LINES:
+                return _Frame(tag, _BREAK, parent, classes)
+
+            return _Frame(tag, _IGNORE, None, classes)
+
+        # The remaining elements look for some elements anywhere inside them.
+        root = parent.owner if mode == _SEARCH else parent
+        return self._start_search_match(root, tag, classes)
+
+    def _start_search_match(self, root: _Frame, tag: str, classes: List[str]) -> _Frame:
+        """Starts an element inside a search root, which is either what the root is looking for, or
+        is only looked through.
+        """
+        mode = root.mode
+
+        if mode == _HEADER and tag == 'span' and not root.found:
+            root.found = True
+            return _Frame(tag, _SPAN, root, classes)
+
+        if mode == _POETRY and tag == 'p' and not root.found:
+            root.found = True
+            return _Frame(tag, _POETRY_LINES, root, classes)
+
+        if mode == _CONTAINER and tag == 'p':
+            # Every paragraph is a line of the passage.
+            return _Frame(tag, _PARAGRAPH, root.owner, classes)
+
+        if mode == _FOOTNOTES and tag == 'ol' and not root.found:
+            root.found = True
+            return _Frame(tag, _FOOTNOTE_LIST, root, classes)
+
+        if mode == _FOOTNOTE_LIST and tag == 'li':
+            # Every footnote is added to the footnotes section.
+            return _Frame(tag, _FOOTNOTE, root.owner, classes)
+
+        if mode == _FOOTNOTE and tag == 'a' and root.verse is None:
+            root.verse = ''
+            return _Frame(tag, _FOOTNOTE_VERSE, root, classes)
+
+        if mode == _FOOTNOTE and tag == 'span' and not root.found:
+            root.found = True
+            return _Frame(tag, _SPAN, root, classes)
+
+        return _Frame(tag, _SEARCH, root, classes)
+
+    def _end_top(self):
+        """Ends the innermost open element, giving its output to its owner."""
+        frame = self._stack.pop()
+        mode = frame.mode
+        owner = frame.owner
+
+        if mode == _SPAN:
+            # A small caps span is only uppercased when its only content is text.
+            if frame.children == 1 and frame.last_is_text and 'small-caps' in frame.classes:
+                owner.parts.append(''.join(frame.parts).upper())
+            else:
+                owner.parts.extend(frame.parts)
+        elif mode == _SUP:
+            text = ''.join(frame.parts)
+
+            if 'versenum' in frame.classes:
+                owner.parts.append(VerseMarker(text))
+            elif 'footnote' in frame.classes:
+                owner.parts.append(FootnoteMarker(text, frame.footnote_id))
+        elif mode == _CHAPTER:
+            owner.parts.append(ChapterMarker(''.join(frame.parts)))
+        elif mode == _ITALIC:
+            owner.parts.append(f'<i>{"".join(frame.parts)}</i>')
+        elif mode == _TEXT:
+            owner.parts.append(''.join(frame.parts))
+        elif mode == _BREAK:
+            owner.parts.append('\n')
+        elif mode == _HEADER:
+            owner.parts.append([HeadingMarker(), '<b>', *frame.parts, '</b>'])
+        elif mode == _PARAGRAPH or mode == _POETRY:
+            # A line of the passage.
+            owner.parts.append(frame.parts)
+        elif mode == _POETRY_LINES:
+            owner.parts.extend(frame.parts)
+        elif mode == _FOOTNOTE_VERSE:
+            owner.verse = ''.join(frame.parts)
+        elif mode == _FOOTNOTE:
+            owner.parts.append((frame.footnote_id, frame.verse or '', ''.join(frame.parts)))
+        elif mode == _STD_TEXT:
+            self.lines = frame.parts
+            self._stop_if_done()
+        elif mode == _FOOTNOTES:
+            self.footnotes = frame.parts
+            self._stop_if_done()
+
+    def _stop_if_done(self):
+        if self.lines is not None and self.footnotes is not None:
+            raise _StopParsing()
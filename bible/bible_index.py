@@ -0,0 +1,221 @@
+import mmap
+import os
+import struct
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, List, Tuple
+
+INDEX_EXTENSION = '.idx'
+
+_MAGIC = b'BIBIDX01'
+
+# Magic, book count, chapter count, verse count, size of the book names blob.
+_HEADER = struct.Struct('<8sIIII')
+
+# Book name offset, book name length, first chapter index, chapter count.
+_BOOK = struct.Struct('<IIII')
+
+_UINT = struct.Struct('<I')
+
+
+def get_index_path(xml_path: str) -> str:
+    """Returns the path of the compiled index for the given Bible XML file.
+
+    Args:
+        xml_path (str): Path to the Bible XML file (e.g. `assets/niv.xml`).
+
+    Returns:
+        str: The index path, which is next to the XML file (e.g. `assets/niv.idx`).
+    """
+    root, _ = os.path.splitext(xml_path)
+    return root + INDEX_EXTENSION
+
+
+def is_index_fresh(xml_path: str, index_path: str) -> bool:
+    """Checks whether the index exists and is not older than the XML it was built from.
+
+    Args:
+        xml_path (str): Path to the Bible XML file.
+        index_path (str): Path to the compiled index.
+
+    Returns:
+        bool: `True` if the index can be used instead of the XML file.
+    """
+    if not os.path.exists(index_path):
+        return False
+
+    if not os.path.exists(xml_path):
+        return True
+
+    return os.path.getmtime(index_path) >= os.path.getmtime(xml_path)
+
+
+def _read_xml(xml_path: str) -> List[Tuple[str, List[List[str]]]]:
+    """Reads the Bible XML into a list of books. Each book is a tuple of the lowercase book name
+    and its chapters, and each chapter is the list of verses ordered by the verse number.
+    """
+    tree = ElementTree.parse(xml_path)
+    root = tree.getroot()
+
+    books = []
+
+    for book in root.iterfind('book'):
+        chapters = {}
+
+        for chapter in book.iterfind('chapter'):
+            verses = {}
+
+            for verse in chapter.iterfind('verse'):
+                verses[int(verse.get('name'))] = verse.text or ''
+
+            chapters[int(chapter.get('name'))] = verses
+
+        # Chapters and verses are stored contiguously from 1, so fill any gap with empty entries.
+        chapter_list = []
+        for chapter_no in range(1, max(chapters.keys(), default=0) + 1):
+            verses = chapters.get(chapter_no, {})
+            last_verse = max(verses.keys(), default=0)
+            chapter_list.append([verses.get(i, '') for i in range(1, last_verse + 1)])
+
+        books.append((book.get('name').lower(), chapter_list))
+
+    return books
+
+
+def build_index(xml_path: str, index_path: str) -> None:
+    """Compiles the Bible XML file into the binary index format read by `BibleIndex`.
+
+    The file is laid out as a header, the book table, the chapter table (index of the first verse
+    of every chapter), the verse offsets into the verse blob, the book names, and finally the UTF-8
+    verse blob. All integers are unsigned 32-bit little endian.
+
+    Args:
+        xml_path (str): Path to the Bible XML file.
+        index_path (str): Where to write the index. The file is replaced atomically.
+    """
+    books = _read_xml(xml_path)
+
+    names_blob = bytearray()
+    book_table = bytearray()
+    chapter_table = bytearray()
+    verse_offsets = bytearray()
+    verse_blob = bytearray()
+
+    chapter_count = 0
+    verse_count = 0
+
+    for name, chapters in books:
+        encoded_name = name.encode('utf-8')
+        book_table += _BOOK.pack(len(names_blob), len(encoded_name),
+                                 chapter_count, len(chapters))
+        names_blob += encoded_name
+
+        for verses in chapters:
+            chapter_table += _UINT.pack(verse_count)
+            chapter_count += 1
+
+            for verse in verses:
+                verse_offsets += _UINT.pack(len(verse_blob))
+                verse_blob += verse.encode('utf-8')
+                verse_count += 1
+
+    # Sentinels, so that the size of the last chapter and verse can be computed.
+    chapter_table += _UINT.pack(verse_count)
+    verse_offsets += _UINT.pack(len(verse_blob))
+
+    header = _HEADER.pack(_MAGIC, len(books), chapter_count,
+                          verse_count, len(names_blob))
+
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        for part in [header, book_table, chapter_table, verse_offsets, names_blob, verse_blob]:
+            f.write(part)
+
+    os.replace(temp_path, index_path)
+
+
+class BibleIndex:
+    """Read-only view of a compiled Bible index. The file is memory mapped, so only the pages that
+    are actually read are loaded, and verses are decoded only when they are requested.
+    """
+
+    def __init__(self, index_path: str) -> None:
+        with open(index_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, book_count, chapter_count, verse_count,
+         names_size) = _HEADER.unpack_from(self._mm, 0)
+
+        if magic != _MAGIC:
+            raise ValueError(f'{index_path} is not a Bible index file!')
+
+        book_table_start = _HEADER.size
+        self._chapter_table_start = book_table_start + book_count * _BOOK.size
+        self._verse_offsets_start = self._chapter_table_start + \
+            (chapter_count + 1) * _UINT.size
+        names_start = self._verse_offsets_start + \
+            (verse_count + 1) * _UINT.size
+        self._verse_blob_start = names_start + names_size
+
+        # The book table is tiny, so keep it in memory for lookups.
+        self._books: Dict[str, Tuple[int, int]] = {}
+
+        for i in range(book_count):
+            (name_offset, name_length, first_chapter,
+             chapters) = _BOOK.unpack_from(self._mm, book_table_start + i * _BOOK.size)
+
+            start = names_start + name_offset
+            name = self._mm[start:start + name_length].decode('utf-8')
+            self._books[name] = (first_chapter, chapters)
+
+    @property
+    def book_names(self) -> List[str]:
+        """The lowercase book names, in the order they appear in the Bible."""
+        return list(self._books.keys())
+
+    @property
+    def memory_size(self) -> int:
+        """The size of the mapped file, in bytes. This is the most memory the index can use."""
+        return len(self._mm)
+
+    def chapter_count(self, book: str) -> int:
+        return self._books[book][1]
+
+    def _chapter_bounds(self, book: str, chapter: int) -> Tuple[int, int]:
+        """Returns the index of the first verse of the chapter and the index after its last verse."""
+        first_chapter, chapters = self._books[book]
+        chapter = int(chapter)
+
+        if chapter < 1 or chapter > chapters:
+            raise KeyError(f'{book} has no chapter {chapter}')
+
+        offset = self._chapter_table_start + \
+            (first_chapter + chapter - 1) * _UINT.size
+        return struct.unpack_from('<II', self._mm, offset)
+
+    def verse_count(self, book: str, chapter: int) -> int:
+        first_verse, end_verse = self._chapter_bounds(book, chapter)
+        return end_verse - first_verse
+
+    def get_verses(self, book: str, chapter: int, start: int, end: int) -> List[str]:
+        """Returns the verses from `start` to `end` (both inclusive, 1-indexed) of the chapter. The
+        range is clamped to the verses that exist in the chapter.
+        """
+        first_verse, end_verse = self._chapter_bounds(book, chapter)
+
+        start_index = first_verse + max(start, 1) - 1
+        end_index = min(first_verse + end, end_verse)
+
+        if end_index <= start_index:
+            return []
+
+        count = end_index - start_index
+        offsets = struct.unpack_from(
+            f'<{count + 1}I', self._mm,
+            self._verse_offsets_start + start_index * _UINT.size)
+
+        base = self._verse_blob_start
+        return [self._mm[base + offsets[i]:base + offsets[i + 1]].decode('utf-8')
+                for i in range(count)]
+
+    def close(self) -> None:
+        self._mm.close()
@@ -0,0 +1,184 @@
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, List, Tuple
+from assets import get_asset
+from bible.bible_index import BibleIndex, get_index_path, is_index_fresh
+from bible.book_resolver import BookResolver
+
+METADATA_EXTENSION = '.meta.json'
+
+
+def get_metadata_path(xml_path: str) -> str:
+    """Returns the path of the metadata file for the given Bible XML file.
+
+    Args:
+        xml_path (str): Path to the Bible XML file (e.g. `assets/niv.xml`).
+
+    Returns:
+        str: The metadata path, which is next to the XML file (e.g. `assets/niv.meta.json`).
+    """
+    root, _ = os.path.splitext(xml_path)
+    return root + METADATA_EXTENSION
+
+
+def scan_verse_counts(xml_path: str) -> Dict[str, List[int]]:
+    """Streams the Bible XML file and returns the verse count of every chapter, without keeping
+    the verses in memory.
+
+    Args:
+        xml_path (str): Path to the Bible XML file.
+
+    Returns:
+        Dict[str, List[int]]: Lowercase book name to the verse count of each chapter, in the order
+        the books appear in the file.
+    """
+    result = {}
+
+    with open(xml_path, 'rb') as f:
+        root = None
+        verse_counts = []
+
+        for event, elem in ElementTree.iterparse(f, events=('start', 'end')):
+            if root is None:
+                root = elem
+
+            if event == 'start':
+                if elem.tag == 'chapter':
+                    verse_counts.append(0)
+            elif elem.tag == 'verse':
+                verse_counts[-1] = max(verse_counts[-1], int(elem.get('name')))
+            elif elem.tag == 'book':
+                result[elem.get('name').lower()] = verse_counts
+                verse_counts = []
+
+                # Only the counts are needed, so free the book.
+                root.clear()
+
+    return result
+
+
+class BibleMetadata:
+    """The books of a Bible translation with their chapter and verse counts. This is enough to
+    resolve book names and validate verse ranges, without loading the text of the Bible.
+    """
+
+    def __init__(self, verse_counts: Dict[str, List[int]]) -> None:
+        """
+        Args:
+            verse_counts (Dict[str, List[int]]): Lowercase book name to the verse count of each
+                chapter, in the order of the books in the Bible.
+        """
+        self.verse_counts = verse_counts
+        self.resolver = BookResolver(self.book_names)
+
+    @property
+    def book_names(self) -> List[str]:
+        return list(self.verse_counts.keys())
+
+    def chapter_count(self, book: str) -> int:
+        return len(self.verse_counts[book])
+
+    def verse_count(self, book: str, chapter: int) -> int:
+        verse_counts = self.verse_counts[book]
+        chapter = int(chapter)
+
+        if chapter < 1 or chapter > len(verse_counts):
+            raise KeyError(f'{book} has no chapter {chapter}')
+
+        return verse_counts[chapter - 1]
+
+    def fuzzy_search_book(self, query: str) -> str:
+        '''
+        Returns the bible book name that best matches the query.
+        '''
+        return self.resolver.resolve(query)
+
+    def get_verse_range(self, book: str, chapter: int, start: int, end: int) -> Tuple[int, int]:
+        """Returns the verse range for the given book and chapter.
+
+        Args:
+            book (str): The book
+            chapter (int): The chapter number
+            start (int): Desired start verse number
+            end (int): Desired end verse number
+
+        Returns:
+            Tuple[int, int]: The valid start and end verse number
+        """
+        verses_count = self.verse_count(book, chapter)
+
+        result_start = start
+
+        if result_start < 1:
+            result_start = 1
+
+        result_end = end
+
+        if result_end > verses_count:
+            result_end = verses_count
+
+        return (result_start, result_end)
+
+    def save(self, path: str) -> None:
+        """Writes the metadata as JSON. The file is replaced atomically."""
+        temp_path = path + '.tmp'
+
+        with open(temp_path, 'w', encoding='utf8') as f:
+            json.dump({'books': [[book, counts] for book, counts in self.verse_counts.items()]}, f)
+
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path: str):
+        """Reads the metadata written by `save`.
+
+        Returns:
+            BibleMetadata: The metadata.
+        """
+        with open(path, encoding='utf8') as f:
+            content = json.load(f)
+
+        return BibleMetadata({book: counts for book, counts in content['books']})
+
+    @staticmethod
+    def from_text(text):
+        """Creates the metadata from a Bible text store (e.g. `BibleIndex`).
+
+        Returns:
+            BibleMetadata: The metadata.
+        """
+        verse_counts = {}
+
+        for book in text.book_names:
+            verse_counts[book] = [text.verse_count(book, chapter)
+                                  for chapter in range(1, text.chapter_count(book) + 1)]
+
+        return BibleMetadata(verse_counts)
+
+
+def load_metadata(asset_name: str = 'niv.xml') -> BibleMetadata:
+    """Loads the metadata of a Bible translation, from the cheapest source that is up to date: the
+    metadata file, then the compiled index, then the XML file itself.
+
+    Args:
+        asset_name (str, optional): The Bible XML asset. Defaults to 'niv.xml'.
+
+    Returns:
+        BibleMetadata: The metadata.
+    """
+    xml_path = get_asset(asset_name)
+
+    metadata_path = get_metadata_path(xml_path)
+    if is_index_fresh(xml_path, metadata_path):
+        return BibleMetadata.load(metadata_path)
+
+    index_path = get_index_path(xml_path)
+    if is_index_fresh(xml_path, index_path):
+        index = BibleIndex(index_path)
+        try:
+            return BibleMetadata.from_text(index)
+        finally:
+            index.close()
+
+    return BibleMetadata(scan_verse_counts(xml_path))
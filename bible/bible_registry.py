@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional
+from bible.bible import Bible
+from bible.bible_metadata import BibleMetadata, load_metadata
+
+# The Bible version used when a chat has not picked one.
+DEFAULT_VERSION = 'NIV'
+
+# Bible version -> the XML asset of its text. Versions without local text (None) are only fetched
+# from Bible Gateway, and fall back to the default version's text.
+DEFAULT_TRANSLATIONS = {DEFAULT_VERSION: 'niv.xml'}
+
+# How much memory the loaded Bible texts may use, in bytes.
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+class BibleRegistry:
+    """The Bible translations available to the bot. A translation's text is only loaded when it is
+    first needed, and the least recently used texts are dropped when the loaded texts exceed the
+    memory budget. Book names and verse ranges are resolved with the metadata of the default version,
+    which is shared by all translations.
+    """
+
+    def __init__(self,
+                 translations: Optional[Dict[str, Optional[str]]] = None,
+                 default_version: str = DEFAULT_VERSION,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 metadata: Optional[BibleMetadata] = None) -> None:
+        if translations is None:
+            translations = DEFAULT_TRANSLATIONS
+
+        self.translations = {version.upper(): asset
+                             for version, asset in translations.items()}
+        self.default_version = default_version.upper()
+        self.memory_budget = memory_budget
+
+        if self.translations.get(self.default_version) is None:
+            raise ValueError(
+                f'The default version {self.default_version} must have a local text!')
+
+        self._metadata = metadata
+
+        # Version -> loaded Bible, in least recently used order.
+        self._bibles: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def versions(self) -> List[str]:
+        """All versions that chats can pick."""
+        return list(self.translations.keys())
+
+    @property
+    def metadata(self) -> BibleMetadata:
+        """The metadata shared by all translations."""
+        if self._metadata is None:
+            self._metadata = load_metadata(
+                self.translations[self.default_version])
+
+        return self._metadata
+
+    def normalize_version(self, version: Optional[str]) -> str:
+        """Returns the version in its canonical form, or the default version if it is unknown."""
+        if version is None or version.upper() not in self.translations:
+            return self.default_version
+
+        return version.upper()
+
+    def has_text(self, version: str) -> bool:
+        """Whether the version has a local text."""
+        return self.translations.get(version.upper()) is not None
+
+    @property
+    def loaded_versions(self) -> List[str]:
+        """The versions whose text is loaded, from the least recently used."""
+        return list(self._bibles.keys())
+
+    @property
+    def memory_usage(self) -> int:
+        """An estimate of the memory used by the loaded texts, in bytes."""
+        return sum(bible.text.memory_size for bible in self._bibles.values())
+
+    def register(self, version: str, bible: Bible):
+        """Adds an already loaded Bible for the version."""
+        with self._lock:
+            self._bibles[version.upper()] = bible
+            self._evict(keep=version.upper())
+
+    def get(self, version: str) -> Bible:
+        """Returns the Bible text for the version, loading it if needed. Versions without a local
+        text get the default version's text.
+
+        Args:
+            version (str): The Bible version, e.g. NIV.
+
+        Returns:
+            Bible: The Bible.
+        """
+        version = version.upper()
+        if not self.has_text(version):
+            version = self.default_version
+
+        with self._lock:
+            bible = self._bibles.get(version)
+
+            if bible is None:
+                # Versification can differ between translations, so only the default version
+                # reuses the shared metadata for its text.
+                metadata = self.metadata if version == self.default_version else None
+                bible = Bible(self.translations[version], metadata=metadata)
+                self._bibles[version] = bible
+            else:
+                self._bibles.move_to_end(version)
+
+            self._evict(keep=version)
+            return bible
+
+    def _evict(self, keep: str):
+        """Drops the least recently used texts, except `keep`, until the budget is met."""
+        for version in list(self._bibles.keys()):
+            if self.memory_usage <= self.memory_budget:
+                return
+
+            if version != keep:
+                del self._bibles[version]
@@ -0,0 +1,187 @@
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Set
+from fuzzywuzzy import fuzz
+
+# The books of the Bible in order, with the common abbreviations of each book.
+_CANONICAL_BOOKS = [
+    ('genesis', ['gen', 'ge', 'gn']),
+    ('exodus', ['exod', 'exo', 'ex']),
+    ('leviticus', ['lev', 'le', 'lv']),
+    ('numbers', ['num', 'nu', 'nm', 'nb']),
+    ('deuteronomy', ['deut', 'de', 'dt']),
+    ('joshua', ['josh', 'jos', 'jsh']),
+    ('judges', ['judg', 'jdg', 'jg', 'jdgs']),
+    ('ruth', ['rth', 'ru']),
+    ('1 samuel', ['1 sam', '1 sa', '1 sm']),
+    ('2 samuel', ['2 sam', '2 sa', '2 sm']),
+    ('1 kings', ['1 kgs', '1 ki', '1 kin']),
+    ('2 kings', ['2 kgs', '2 ki', '2 kin']),
+    ('1 chronicles', ['1 chr', '1 chron', '1 ch']),
+    ('2 chronicles', ['2 chr', '2 chron', '2 ch']),
+    ('ezra', ['ezr']),
+    ('nehemiah', ['neh', 'ne']),
+    ('esther', ['esth', 'est', 'es']),
+    ('job', ['jb']),
+    ('psalms', ['psalm', 'ps', 'psa', 'psm', 'pss']),
+    ('proverbs', ['prov', 'pro', 'prv', 'pr']),
+    ('ecclesiastes', ['eccl', 'eccles', 'ecc', 'ec', 'qoh']),
+    ('song of songs', ['song of solomon', 'song', 'sos', 'canticles']),
+    ('isaiah', ['isa', 'is']),
+    ('jeremiah', ['jer', 'je', 'jr']),
+    ('lamentations', ['lam', 'la']),
+    ('ezekiel', ['ezek', 'eze', 'ezk']),
+    ('daniel', ['dan', 'da', 'dn']),
+    ('hosea', ['hos', 'ho']),
+    ('joel', ['jl']),
+    ('amos', ['am']),
+    ('obadiah', ['obad', 'ob']),
+    ('jonah', ['jon', 'jnh']),
+    ('micah', ['mic', 'mc']),
+    ('nahum', ['nah', 'na']),
+    ('habakkuk', ['hab', 'hb']),
+    ('zephaniah', ['zeph', 'zep', 'zp']),
+    ('haggai', ['hag', 'hg']),
+    ('zechariah', ['zech', 'zec', 'zc']),
+    ('malachi', ['mal', 'ml']),
+    ('matthew', ['matt', 'mt']),
+    ('mark', ['mrk', 'mk', 'mr']),
+    ('luke', ['luk', 'lk']),
+    ('john', ['jn', 'jhn']),
+    ('acts', ['ac']),
+    ('romans', ['rom', 'ro', 'rm']),
+    ('1 corinthians', ['1 cor', '1 co']),
+    ('2 corinthians', ['2 cor', '2 co']),
+    ('galatians', ['gal', 'ga']),
+    ('ephesians', ['eph', 'ephes']),
+    ('philippians', ['phil', 'php', 'pp']),
+    ('colossians', ['col']),
+    ('1 thessalonians', ['1 thess', '1 thes', '1 th']),
+    ('2 thessalonians', ['2 thess', '2 thes', '2 th']),
+    ('1 timothy', ['1 tim', '1 ti']),
+    ('2 timothy', ['2 tim', '2 ti']),
+    ('titus', ['tit']),
+    ('philemon', ['philem', 'phm', 'pm']),
+    ('hebrews', ['heb']),
+    ('james', ['jas', 'jm']),
+    ('1 peter', ['1 pet', '1 pe', '1 pt']),
+    ('2 peter', ['2 pet', '2 pe', '2 pt']),
+    ('1 john', ['1 jn', '1 jhn']),
+    ('2 john', ['2 jn', '2 jhn']),
+    ('3 john', ['3 jn', '3 jhn']),
+    ('jude', ['jud', 'jd']),
+    ('revelation', ['rev', 're', 'revelations']),
+]
+
+# How many books with the most shared trigrams are scored first.
+_CANDIDATE_COUNT = 8
+
+# How many query results are memoized.
+DEFAULT_CACHE_SIZE = 1024
+
+
+def _normalize_alias(text: str) -> str:
+    """Normalizes an abbreviation, so that e.g. "1Tim.", "1 tim" and " 1  TIM " are the same."""
+    text = text.lower().replace('.', ' ')
+    text = ' '.join(text.split())
+
+    # Numbered books can be written without the space, e.g. "1cor".
+    return re.sub(r'^([123]) ?', r'\1 ', text)
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class BookResolver:
+    """Resolves a user-written book name (e.g. "1 Tim", "gensis") to a book name of the Bible.
+
+    Exact book names and known abbreviations are looked up directly. Anything else is resolved by
+    `fuzz.ratio`, scoring only the books that could possibly be the best match, and the result is
+    the same as scoring every book: the best score wins, and ties go to the shortest book name,
+    then the lexicographically smallest one. Results are memoized.
+    """
+
+    def __init__(self, book_names: List[str], cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.book_names = list(book_names)
+        self._book_set = set(self.book_names)
+        self._aliases = self._build_aliases()
+
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)
+        for i, name in enumerate(self.book_names):
+            for trigram in _trigrams(name):
+                self._trigram_index[trigram].append(i)
+
+        self._char_counts = [Counter(name) for name in self.book_names]
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _build_aliases(self) -> Dict[str, str]:
+        if len(self.book_names) == len(_CANONICAL_BOOKS):
+            # Translations may name books differently (e.g. "Song of Solomon"), so match by order.
+            pairs = zip(self.book_names, _CANONICAL_BOOKS)
+        else:
+            pairs = [(name, book) for book in _CANONICAL_BOOKS
+                     for name in self.book_names if name == book[0]]
+
+        aliases = {}
+
+        for name, (canonical, abbreviations) in pairs:
+            for alias in [canonical, *abbreviations]:
+                aliases[_normalize_alias(alias)] = name
+
+        return aliases
+
+    def _resolve(self, query: str) -> str:
+        '''
+        Returns the bible book name that best matches the query.
+        '''
+        query = query.lower()
+
+        if query in self._book_set:
+            return query
+
+        alias = self._aliases.get(_normalize_alias(query))
+        if alias is not None:
+            return alias
+
+        return self._fuzzy_search(query)
+
+    def _fuzzy_search(self, query: str) -> str:
+        # Score the books that share the most trigrams with the query first.
+        shared_trigrams = Counter()
+        for trigram in _trigrams(query):
+            shared_trigrams.update(self._trigram_index.get(trigram, []))
+
+        scores = {}
+        for i, _ in shared_trigrams.most_common(_CANDIDATE_COUNT):
+            scores[i] = fuzz.ratio(self.book_names[i], query)
+
+        best_score = max(scores.values(), default=0)
+
+        # A book can only match as many characters as it shares with the query, so the remaining
+        # books only need to be scored if that upper bound can reach the best score.
+        query_counts = Counter(query)
+
+        for i, name in enumerate(self.book_names):
+            if i in scores:
+                continue
+
+            total_length = len(query) + len(name)
+            if 200 * min(len(query), len(name)) < (best_score - 1) * total_length:
+                continue
+
+            shared_chars = sum((query_counts & self._char_counts[i]).values())
+            if 200 * shared_chars < (best_score - 1) * total_length:
+                continue
+
+            scores[i] = fuzz.ratio(name, query)
+            best_score = max(best_score, scores[i])
+
+        books_with_best_score = [self.book_names[i]
+                                 for i, score in scores.items() if score == best_score]
+
+        # Sort the book by the title length first, then lexicographically
+        return min(books_with_best_score, key=lambda title: (len(title), title))
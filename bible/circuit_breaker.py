@@ -0,0 +1,242 @@
+import json
+import os
+import tempfile
+import time
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+# Calls go through, and their outcomes are tracked.
+STATE_CLOSED = 'closed'
+# Calls fail fast until the recovery is probed.
+STATE_OPEN = 'open'
+# The recovery is being probed, by the probe or by a single trial call.
+STATE_HALF_OPEN = 'half-open'
+
+# The circuit opens when at least this share of the recent calls failed.
+DEFAULT_FAILURE_RATE = 0.5
+
+# Fewer recent calls than this never open the circuit.
+DEFAULT_MIN_CALLS = 4
+
+# How many of the last calls, within how many seconds, are recent.
+DEFAULT_WINDOW_SIZE = 20
+DEFAULT_WINDOW_SECONDS = 10 * 60
+
+# A successful call slower than this counts as a failure.
+DEFAULT_SLOW_CALL_SECONDS = 8
+
+# How long the circuit stays open before the recovery is probed.
+DEFAULT_OPEN_SECONDS = 60
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while. The circuit is closed while the recent failure
+    rate is low, and opens when it is high. While it is open, calls fail fast. After `open_seconds`
+    it is half-open: the next call runs the probe first if one is given, and otherwise goes through
+    as the trial. The circuit closes if the probe or trial succeeds, and opens again if not. The
+    probe runs in the calling thread, since a background thread would be frozen as soon as an AWS
+    Lambda handler returns.
+
+    The state is saved to `state_path` if given, so that it survives between processes, e.g. warm
+    and cold AWS Lambda invocations.
+    """
+
+    def __init__(self,
+                 failure_rate: float = DEFAULT_FAILURE_RATE,
+                 min_calls: int = DEFAULT_MIN_CALLS,
+                 window_size: int = DEFAULT_WINDOW_SIZE,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+                 open_seconds: float = DEFAULT_OPEN_SECONDS,
+                 probe: Optional[Callable[[], None]] = None,
+                 state_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        Args:
+            failure_rate (float, optional): The share of failed recent calls that opens the
+                circuit. Defaults to 0.5.
+            min_calls (int, optional): The fewest recent calls that can open the circuit.
+            window_size (int, optional): How many of the last calls are recent.
+            window_seconds (float, optional): How many seconds a call is recent.
+            slow_call_seconds (float, optional): A call slower than this counts as failed.
+            open_seconds (float, optional): How long the circuit stays open before the recovery is
+                probed.
+            probe (Callable[[], None], optional): Calls the service once, raising if it fails. It is
+                run by the first call after the circuit has been open for `open_seconds`. Defaults
+                to letting that call through as the trial instead.
+            state_path (str, optional): The JSON file the state is saved to. Defaults to not saved.
+            clock (Callable[[], float], optional): Returns the current time in seconds.
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.probe = probe
+        self.state_path = state_path
+        self._clock = clock
+
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+
+        # The time and success of the recent calls.
+        self._outcomes: List[Tuple[float, bool]] = []
+
+        # The time, previous and new state of every state change since it was last taken.
+        self._transitions: List[Tuple[float, str, str]] = []
+
+        self._lock = Lock()
+
+        self._load()
+
+    def _load(self):
+        if self.state_path is None:
+            return
+
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                data = json.load(f)
+
+            self.state = data['state']
+            self.opened_at = data['opened_at']
+            self._outcomes = [(at, ok) for at, ok in data['outcomes']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+
+        # A probe or trial of the previous process never finished, so it is tried again.
+        if self.state == STATE_HALF_OPEN:
+            self.state = STATE_OPEN
+
+    def _save(self):
+        if self.state_path is None:
+            return
+
+        data = {
+            'state': self.state,
+            'opened_at': self.opened_at,
+            'outcomes': self._outcomes,
+        }
+
+        try:
+            directory = os.path.dirname(os.path.abspath(self.state_path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            print(f'Failed to save the circuit state: {e}')
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+
+        print(f'Circuit {self.state} -> {state}')
+        self._transitions.append((self._clock(), self.state, state))
+        self.state = state
+
+        if state == STATE_OPEN:
+            self.opened_at = self._clock()
+        elif state == STATE_CLOSED:
+            self._outcomes = []
+
+    def allow_request(self) -> bool:
+        """Returns whether a call may go through now. Every call that goes through must record its
+        outcome with `record_success`, `record_failure` or `record_ignored`.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+
+            # Wait for the running probe or trial call.
+            if self.state == STATE_HALF_OPEN:
+                return False
+
+            if self._clock() - self.opened_at < self.open_seconds:
+                return False
+
+            self._set_state(STATE_HALF_OPEN)
+            self._save()
+
+            # Without a probe, this call is the trial.
+            if self.probe is None:
+                return True
+
+        # The other calls fail fast while this one probes.
+        self._run_probe()
+
+        return self.state == STATE_CLOSED
+
+    def _run_probe(self):
+        try:
+            self.probe()
+        except Exception as e:
+            print(f'Circuit probe failed: {e}')
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self, seconds: float = 0):
+        """Records a successful call that took the seconds. A slow call counts as failed."""
+        if seconds > self.slow_call_seconds:
+            self.record_failure()
+            return
+
+        self._record(True)
+
+    def record_failure(self):
+        """Records a failed call."""
+        self._record(False)
+
+    def record_ignored(self):
+        """Records a call whose failure says nothing about the service, e.g. a bad request. If it
+        was the trial call, the next call is the trial instead.
+        """
+        with self._lock:
+            if self.state != STATE_HALF_OPEN or self.probe is not None:
+                return
+
+            # Open again, but without waiting for `open_seconds` again.
+            opened_at = self.opened_at
+            self._set_state(STATE_OPEN)
+            self.opened_at = opened_at
+            self._save()
+
+    def _record(self, ok: bool):
+        with self._lock:
+            now = self._clock()
+
+            if self.state == STATE_HALF_OPEN:
+                self._set_state(STATE_CLOSED if ok else STATE_OPEN)
+                self._save()
+                return
+
+            # Keep only the recent calls.
+            self._outcomes.append((now, ok))
+            self._outcomes = [(at, success) for at, success in self._outcomes[-self.window_size:]
+                              if now - at <= self.window_seconds]
+
+            failures = sum(1 for _, success in self._outcomes if not success)
+            if self.state == STATE_CLOSED and len(self._outcomes) >= self.min_calls \
+                    and failures >= self.failure_rate * len(self._outcomes):
+                self._set_state(STATE_OPEN)
+
+            self._save()
+
+    def pop_transitions(self) -> List[Tuple[float, str, str]]:
+        """Returns the state changes since this was last called, and forgets them.
+
+        Returns:
+            List[Tuple[float, str, str]]: The time, previous and new state of every change.
+        """
+        with self._lock:
+            transitions = self._transitions
+            self._transitions = []
+
+        return transitions
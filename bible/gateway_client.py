@@ -0,0 +1,208 @@
+import random
+import time
+from threading import Lock
+from typing import Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for the connection, and between bytes of the response.
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+
+# Seconds a whole call may take, including every retry and the waits between them.
+TOTAL_TIMEOUT = 20
+
+# Attempts after the first one, for retryable statuses and connection errors.
+MAX_RETRIES = 3
+
+# The wait before a retry is random, up to BACKOFF_BASE * 2^retry seconds but at most BACKOFF_MAX.
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4
+
+# Statuses that may succeed if requested again.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# The expected seconds of a fetch, until fetches have been timed. It is then the moving average of
+# the fetch times, weighted by LATENCY_WEIGHT for the latest one.
+EXPECTED_LATENCY = 1.0
+LATENCY_WEIGHT = 0.2
+
+# Connections kept alive per host.
+POOL_SIZE = 10
+
+USER_AGENT = 'bible-reading-plan-daily-reminder'
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when there is not enough time left before the deadline."""
+
+
+def create_session() -> requests.Session:
+    """Returns a session that keeps connections alive and reuses them between calls."""
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+class RateLimiter:
+    """Spaces out requests so that at most `rate` start per second, across all threads."""
+
+    def __init__(self, rate: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.interval = 1 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+        self._lock = Lock()
+
+    def acquire(self):
+        """Waits until the next request may start."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next)
+            self._next = start + self.interval
+
+        if start > now:
+            self._sleep(start - now)
+
+
+class GatewayClient:
+    """HTTP client for Bible Gateway. Requests share a pooled session, have connect and read
+    timeouts, and are retried with jittered exponential backoff on connection errors and retryable
+    statuses. A call never takes longer than its deadline. With a rate limiter, every attempt waits
+    for its turn first.
+    """
+
+    def __init__(self,
+                 session: Optional[requests.Session] = None,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT,
+                 total_timeout: float = TOTAL_TIMEOUT,
+                 max_retries: int = MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rate_limiter: Optional[RateLimiter] = None) -> None:
+        self.session = create_session() if session is None else session
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self.rate_limiter = rate_limiter
+
+        # The expected seconds of a fetch.
+        self.expected_latency = EXPECTED_LATENCY
+
+    def _backoff(self, retry: int, response: Optional[requests.Response]) -> float:
+        """Returns how long to wait before the retry. A `Retry-After` in seconds is respected."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+
+            if retry_after.isdigit():
+                return float(retry_after)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    def can_fetch_by(self, deadline: Optional[float]) -> bool:
+        """Returns whether a fetch is expected to end before the deadline, a `time.monotonic()`."""
+        return deadline is None or deadline - time.monotonic() >= self.expected_latency
+
+    def get(self, url: str, deadline: Optional[float] = None) -> requests.Response:
+        """Sends a GET request, retrying it if it may succeed on another attempt.
+
+        Args:
+            url (str): The URL.
+            deadline (float, optional): The `time.monotonic()` by which the call must end. Defaults
+                to `total_timeout` seconds from now.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before an attempt, or an attempt times out
+                because its timeout was shortened to the time left.
+            requests.Timeout: If an attempt times out within its full timeout.
+            requests.RequestException: If the last attempt fails.
+
+        Returns:
+            requests.Response: The successful response.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.total_timeout
+
+        retry = 0
+
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                raise DeadlineExceeded(f'Deadline exceeded for {url}')
+
+            response = None
+            error = None
+
+            start = time.monotonic()
+
+            try:
+                response = self.session.get(url, timeout=(
+                    min(self.connect_timeout, remaining),
+                    min(self.read_timeout, remaining)
+                ))
+
+                self.expected_latency += LATENCY_WEIGHT * \
+                    (time.monotonic() - start - self.expected_latency)
+            except requests.Timeout as e:
+                # A timeout shortened to the time left says nothing about Bible Gateway.
+                timeout = self.connect_timeout if isinstance(e, requests.ConnectTimeout) \
+                    else self.read_timeout
+
+                if remaining < timeout:
+                    raise DeadlineExceeded(f'Deadline exceeded while waiting for {url}') from e
+
+                error = e
+            except requests.ConnectionError as e:
+                error = e
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                # Throw error if not successful
+                response.raise_for_status()
+                return response
+
+            wait = self._backoff(retry, response)
+            out_of_time = time.monotonic() + wait >= deadline
+
+            # Give up with the last error.
+            if retry >= self.max_retries or out_of_time:
+                if error is not None:
+                    raise error
+
+                response.raise_for_status()
+
+            print(f'Retrying {url} in {wait:.2f}s: '
+                  f'{error or response.status_code}')
+            self._sleep(wait)
+            retry += 1
+
+
+_default_client: Optional[GatewayClient] = None
+_default_client_lock = Lock()
+
+
+def get_default_client() -> GatewayClient:
+    """Returns the client shared by the process, so that its connections are reused."""
+    global _default_client
+
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GatewayClient()
+
+        return _default_client
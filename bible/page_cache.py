@@ -0,0 +1,172 @@
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from threading import Lock
+from typing import List, Optional, Tuple
+
+# How long a cached page is used, in seconds.
+DEFAULT_TTL = 24 * 60 * 60
+
+# The most disk space the cached pages may use, in bytes.
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+
+_EXTENSION = '.html'
+_COMPRESSED_EXTENSION = '.html.z'
+
+
+def page_key(book: str, chapter: int, version: str, end_chapter: Optional[int] = None) -> str:
+    """Returns the cache key of the page of a chapter, or of the chapters up to `end_chapter`."""
+    key = f'{version.upper()}\n{book.lower()}\n{int(chapter)}'
+
+    if end_chapter is not None and end_chapter != chapter:
+        key += f'-{int(end_chapter)}'
+
+    return key
+
+
+def get_default_cache_dir() -> str:
+    """Returns where pages are cached by default. On AWS Lambda only `/tmp` is writable, so the
+    system's temporary directory is used everywhere.
+    """
+    return os.path.join(tempfile.gettempdir(), 'bible-gateway-cache')
+
+
+class PageCache:
+    """Bible Gateway pages cached on disk, keyed by (book, chapter, version, end chapter). Each page is a file
+    named by the hash of its key. Other text can be cached by any string key with `get_entry` and
+    `put_entry`. Pages expire after the TTL, and the least recently used pages are
+    removed when the cache grows over its maximum size. Writes are atomic, so a crash never leaves
+    a partial page behind.
+    """
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 ttl: float = DEFAULT_TTL,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 compress: bool = True) -> None:
+        """
+        Args:
+            cache_dir (str, optional): The cache directory. Created if missing. Defaults to
+                `get_default_cache_dir()`.
+            ttl (float, optional): Seconds a page is used after it is cached. Defaults to a day.
+            max_size (int, optional): The most bytes the cached pages may use. Defaults to 50 MB.
+            compress (bool, optional): Whether pages are compressed with zlib. Defaults to True.
+        """
+        self.cache_dir = get_default_cache_dir() if cache_dir is None else cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.compress = compress
+
+        self._lock = Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        extension = _COMPRESSED_EXTENSION if self.compress else _EXTENSION
+
+        return os.path.join(self.cache_dir, name + extension)
+
+    def get(self, book: str, chapter: int, version: str,
+            end_chapter: Optional[int] = None) -> Optional[str]:
+        """Returns the cached page, or None if it is not cached or has expired."""
+        return self.get_entry(page_key(book, chapter, version, end_chapter))
+
+    def put(self, book: str, chapter: int, version: str, html: str,
+            end_chapter: Optional[int] = None):
+        """Caches the page, then removes the least recently used pages if the cache is too big."""
+        self.put_entry(page_key(book, chapter, version, end_chapter), html)
+
+    def get_entry(self, key: str) -> Optional[str]:
+        """Returns the text cached by the key, or None if it is not cached or has expired."""
+        path = self._entry_path(key)
+
+        try:
+            stat = os.stat(path)
+
+            if time.time() - stat.st_mtime > self.ttl:
+                os.remove(path)
+                return None
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            # Mark as recently used. The modification time stays the time it was cached.
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+
+        if self.compress:
+            data = zlib.decompress(data)
+
+        return data.decode('utf-8')
+
+    def put_entry(self, key: str, text: str):
+        """Caches the text by the key, then removes the least recently used entries if the cache is
+        too big.
+        """
+        data = text.encode('utf-8')
+        if self.compress:
+            data = zlib.compress(data)
+
+        path = self._entry_path(key)
+
+        # Write to a temporary file in the same directory, then move it in place atomically.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Returns the last access time, size and path of every cached page."""
+        entries = []
+
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith((_EXTENSION, _COMPRESSED_EXTENSION)):
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        return entries
+
+    @property
+    def size(self) -> int:
+        """The bytes used by the cached pages."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+
+            # Remove from the least recently used.
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+                total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
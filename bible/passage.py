@@ -0,0 +1,282 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+from . import utils
+
+_VERSE_NUMBERS_PATTERN = re.compile(r'(\d+)(?:\D+(\d+))?')
+
+
+def parse_verse_numbers(num: str) -> Tuple[int, int]:
+    """Returns the first and last verse of a verse number, e.g. `5` is (5, 5) and `16-17` for
+    combined verses is (16, 17).
+    """
+    match = _VERSE_NUMBERS_PATTERN.search(num)
+    first = int(match.group(1))
+    last = int(match.group(2)) if match.group(2) is not None else first
+
+    return (first, max(first, last))
+
+
+class VerseMarker(str):
+    """The formatted verse number at the start of a verse. It is a string, so it can be joined with
+    the rest of the passage, but it also remembers the verses it starts.
+    """
+
+    def __new__(cls, num: str) -> 'VerseMarker':
+        marker = super().__new__(cls, utils.format_verse_num(num))
+        marker.first, marker.last = parse_verse_numbers(num)
+
+        return marker
+
+
+class ChapterMarker(str):
+    """Marks where a chapter starts, at its chapter number. It is empty, so the passage text is the
+    same with or without it, but it remembers the chapter.
+    """
+
+    def __new__(cls, num: str) -> 'ChapterMarker':
+        marker = super().__new__(cls, '')
+        marker.chapter = parse_verse_numbers(num)[0]
+
+        return marker
+
+
+class FootnoteMarker(str):
+    """The footnote letter in the passage text, e.g. `<i>[a]</i>`. It also remembers the id of its
+    footnote, so the footnotes can be matched to the verses that are shown.
+    """
+
+    def __new__(cls, text: str, footnote_id: Optional[str] = None) -> 'FootnoteMarker':
+        marker = super().__new__(cls, format_footnote_marker(text))
+        marker.footnote_id = footnote_id
+
+        return marker
+
+
+def format_footnote_marker(text: str) -> str:
+    """Returns the footnote letter as shown in the passage, e.g. `[a]` to `<i>[a]</i>`."""
+    return f'<i>{text}</i>'
+
+
+def parse_footnote_id(data_fn: Optional[str]) -> Optional[str]:
+    """Returns the footnote id of a footnote letter's `data-fn`, e.g. `#fen-NIV-22590a` to
+    `fen-NIV-22590a`, which is the id of the footnote's list item.
+    """
+    if data_fn is None or data_fn.strip('#') == '':
+        return None
+
+    return data_fn.strip().lstrip('#')
+
+
+class HeadingMarker(str):
+    """Marks a line as a heading. It is empty, so the passage text is the same with or without it."""
+
+    def __new__(cls) -> 'HeadingMarker':
+        return super().__new__(cls, '')
+
+
+class Passage:
+    """The formatted text of a chapter, with where each verse starts in it. Any verse range is cut
+    with a lookup and a slice, so several ranges can be taken from one parse.
+
+    The text before the first verse number (the chapter's headers and first verse) belongs to the
+    start of the chapter.
+
+    A passage of several chapters also knows where each chapter starts, including the headings just
+    before its chapter number, and can be split back into chapters with `get_chapter`.
+    """
+
+    def __init__(self, text: str, verse_starts: List[Tuple[int, int, int]],
+                 chapter_starts: Optional[List[Tuple[int, int]]] = None,
+                 separator: str = '\n\n',
+                 footnote_starts: Optional[List[Tuple[str, int, int]]] = None) -> None:
+        """
+        Args:
+            text (str): The formatted passage.
+            verse_starts (List[Tuple[int, int, int]]): The first verse, last verse, and offset in
+                the text of every verse number, in order.
+            chapter_starts (List[Tuple[int, int]], optional): The chapter and offset in the text of
+                every chapter, in order. Defaults to none.
+            separator (str, optional): The separator between lines. Defaults to '\\n\\n'.
+            footnote_starts (List[Tuple[str, int, int]], optional): The footnote id, offset and
+                length in the text of every footnote letter, in order. Defaults to none.
+        """
+        self.text = text
+        self.verse_starts = verse_starts
+        self.chapter_starts = [] if chapter_starts is None else chapter_starts
+        self.separator = separator
+        self.footnote_starts = [] if footnote_starts is None else footnote_starts
+        self._firsts = [first for first, _, _ in verse_starts]
+        self._lasts = [last for _, last, _ in verse_starts]
+        self._offsets = [offset for _, _, offset in verse_starts]
+
+    @staticmethod
+    def from_lines(lines: List[List[str]], separator: str = '\n\n') -> 'Passage':
+        """Joins the lines of a passage, recording the offset of every `VerseMarker` and
+        `FootnoteMarker`. A chapter starts at the line of its `ChapterMarker`, or at the headings
+        (lines starting with a `HeadingMarker`) just before it.
+
+        Args:
+            lines (List[List[str]]): Every line is a list of text pieces.
+            separator (str, optional): The separator between lines. Defaults to '\\n\\n'.
+
+        Returns:
+            Passage: The passage.
+        """
+        pieces = []
+        verse_starts = []
+        chapter_starts = []
+        footnote_starts = []
+        offset = 0
+
+        # Where the headings just before the current line start, if any.
+        headings_offset = None
+
+        for i, line in enumerate(lines):
+            if i > 0:
+                pieces.append(separator)
+                offset += len(separator)
+
+            line_offset = offset
+            is_heading = len(line) > 0 and isinstance(line[0], HeadingMarker)
+
+            if is_heading and headings_offset is None:
+                headings_offset = line_offset
+
+            for piece in line:
+                if isinstance(piece, VerseMarker):
+                    verse_starts.append((piece.first, piece.last, offset))
+                elif isinstance(piece, ChapterMarker):
+                    chapter_start = line_offset if headings_offset is None else headings_offset
+                    chapter_starts.append((piece.chapter, chapter_start))
+                elif isinstance(piece, FootnoteMarker) and piece.footnote_id is not None:
+                    footnote_starts.append((piece.footnote_id, offset, len(piece)))
+
+                pieces.append(piece)
+                offset += len(piece)
+
+            if not is_heading:
+                headings_offset = None
+
+        return Passage(''.join(pieces), verse_starts, chapter_starts, separator, footnote_starts)
+
+    @property
+    def chapters(self) -> List[int]:
+        """The chapters that have a chapter number, in order."""
+        return [chapter for chapter, _ in self.chapter_starts]
+
+    def get_chapter(self, chapter: int) -> 'Passage':
+        """Returns one chapter of a passage of several chapters. The passage itself is returned if it
+        is only this chapter.
+
+        Args:
+            chapter (int): The chapter.
+
+        Raises:
+            KeyError: If the passage does not have the chapter number of this chapter, e.g. a page
+                without chapter numbers, which cannot be split into chapters.
+
+        Returns:
+            Passage: The chapter.
+        """
+        if self.chapter_starts == [(chapter, 0)]:
+            return self
+
+        for i, (start_chapter, start) in enumerate(self.chapter_starts):
+            if start_chapter != chapter:
+                continue
+
+            end = len(self.text)
+            if i + 1 < len(self.chapter_starts):
+                # The chapter ends before the separator of the next chapter's first line.
+                end = self.chapter_starts[i + 1][1] - len(self.separator)
+
+            verse_starts = [(first, last, offset - start)
+                            for first, last, offset in self.verse_starts
+                            if start <= offset < end]
+
+            footnote_starts = [(footnote_id, offset - start, length)
+                               for footnote_id, offset, length in self.footnote_starts
+                               if start <= offset < end]
+
+            return Passage(self.text[start:end], verse_starts, [(chapter, 0)], self.separator,
+                           footnote_starts)
+
+        raise KeyError(f'The passage has no chapter {chapter}')
+
+    @property
+    def verse_numbers(self) -> List[int]:
+        """The verses that have a verse number, in order. The chapter's first verse usually has
+        none, because the chapter number is shown instead.
+        """
+        return list(self._firsts)
+
+    def get_range(self, from_verse: int = 1, to_verse: int = -1) -> str:
+        """Returns the text from the start of `from_verse` to the end of `to_verse`. A missing verse
+        (e.g. one that the translation omits) starts or ends the range at the next verse that exists.
+
+        Args:
+            from_verse (int, optional): Which verse number to start from. Defaults to 1, meaning the
+                start of the chapter, including its headers.
+            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end.
+                It is ignored if it is smaller than `from_verse`.
+
+        Returns:
+            str: The verses.
+        """
+        (start, end) = self._get_bounds(from_verse, to_verse)
+
+        return self.text[start:end]
+
+    def get_range_with_footnotes(self, from_verse: int = 1, to_verse: int = -1,
+                                 first_footnote: int = 0) -> Tuple[str, List[str]]:
+        """Returns the text like `get_range`, and the ids of the footnotes whose letters are in it.
+        The letters are relettered in order, so that the footnotes of a partial range still start
+        at `a`.
+
+        Args:
+            from_verse (int, optional): Which verse number to start from. Defaults to 1.
+            to_verse (int, optional): Which verse number to end. Defaults to -1, meaning until end.
+            first_footnote (int, optional): The index of the first letter, e.g. to continue the
+                letters of a previous chapter. Defaults to 0, meaning `a`.
+
+        Returns:
+            Tuple[str, List[str]]: The verses, and the footnote ids in the order of their letters.
+        """
+        (start, end) = self._get_bounds(from_verse, to_verse)
+
+        pieces = []
+        footnote_ids = []
+        position = start
+
+        for footnote_id, offset, length in self.footnote_starts:
+            if offset < start or offset >= end:
+                continue
+
+            letter = utils.get_footnote_letter(first_footnote + len(footnote_ids))
+            pieces.append(self.text[position:offset])
+            pieces.append(format_footnote_marker(f'[{letter}]'))
+            footnote_ids.append(footnote_id)
+            position = offset + length
+
+        pieces.append(self.text[position:end])
+
+        return (''.join(pieces), footnote_ids)
+
+    def _get_bounds(self, from_verse: int, to_verse: int) -> Tuple[int, int]:
+        """Returns the start and end offset in the text of the verse range, see `get_range`."""
+        start = 0
+        end = len(self.text)
+
+        if from_verse > 1:
+            # The first verse number that covers `from_verse` or is after it.
+            i = bisect_left(self._lasts, from_verse)
+            start = self._offsets[i] if i < len(self._offsets) else end
+
+        if to_verse != -1 and to_verse >= from_verse:
+            # The first verse number after `to_verse`.
+            i = bisect_right(self._firsts, to_verse)
+            if i < len(self._offsets):
+                end = self._offsets[i]
+
+        return (start, end)
@@ -1,4 +1,5 @@
-from typing import List
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 from datetime import date, datetime
 from time import strftime, strptime
 
@@ -36,19 +37,70 @@ def parse_csv_date(date_str: str) -> date:
         day=parsed_date.tm_mday).date()
 
 
-# Data class that contains information about the reading task for a particular day.
+def as_date(value: Union[date, datetime]) -> date:
+    """Returns the date of a date or datetime, e.g. for comparing them."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+# Value type that contains information about the reading task for a particular day.
+# The passage starts at `start_verse` of `chapter` and ends at `end_verse` of `end_chapter`.
+# It is immutable and hashable, and has no per-instance `__dict__`, so that a plan of several years
+# stays small.
 class ReadingTask:
-    def __init__(self, book: str, chapter: int, start_verse: int, end_verse: int, date: date) -> None:
-        self.book = book
-        self.chapter = chapter
-        self.start_verse = start_verse
-        self.end_verse = end_verse
-        self.date = date
+    __slots__ = ('book', 'chapter', 'start_verse', 'end_verse', 'date', 'end_chapter')
+
+    def __init__(self, book: str, chapter: int, start_verse: int, end_verse: int, date: date,
+                 end_chapter: Optional[int] = None) -> None:
+        set_field = object.__setattr__
+        set_field(self, 'book', book)
+        set_field(self, 'chapter', chapter)
+        set_field(self, 'start_verse', start_verse)
+        set_field(self, 'end_verse', end_verse)
+        set_field(self, 'date', date)
+        set_field(self, 'end_chapter', chapter if end_chapter is None else end_chapter)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'ReadingTask is immutable, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'ReadingTask is immutable, cannot delete {name}')
+
+    def _key(self) -> tuple:
+        return (self.book, self.chapter, self.start_verse, self.end_chapter, self.end_verse,
+                self.date)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ReadingTask):
+            return NotImplemented
+
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __reduce__(self):
+        # The fields cannot be set by pickle, so it calls the constructor instead.
+        return (ReadingTask, (self.book, self.chapter, self.start_verse, self.end_verse, self.date,
+                              self.end_chapter))
+
+    @property
+    def chapters(self) -> List[int]:
+        """Every chapter of the passage, in order."""
+        return list(range(self.chapter, self.end_chapter + 1))
+
+    @property
+    def chapter_label(self) -> str:
+        """The chapters of the passage, e.g. `17` or `17-18`."""
+        if self.end_chapter == self.chapter:
+            return str(self.chapter)
+
+        return f'{self.chapter}-{self.end_chapter}'
 
     def to_dict(self) -> dict:
         return {
             'book': self.book,
             'chapter': self.chapter,
+            'end_chapter': self.end_chapter,
             'start_verse': self.start_verse,
             'end_verse': self.end_verse,
             'date': to_csv_date(self.date)
@@ -71,7 +123,9 @@ class ReadingTask:
             content['chapter'],
             content['start_verse'],
             content['end_verse'],
-            parse_csv_date(content['date'])
+            parse_csv_date(content['date']),
+            # Plans saved before passages could span chapters have no end chapter.
+            content.get('end_chapter')
         )
 
     def __str__(self) -> str:
@@ -81,9 +135,65 @@ class ReadingTask:
         return str(self.to_dict())
 
 
+class PlanIndex:
+    """Reading tasks in date order, at most one for each date. A date is looked up with a dict, and
+    a date range with a binary search over the sorted dates, so that plans of several years stay
+    cheap to query.
+    """
+
+    def __init__(self, tasks: Iterable[ReadingTask] = ()) -> None:
+        """
+        Args:
+            tasks (Iterable[ReadingTask], optional): The tasks. A later task replaces an earlier one
+                of the same date. Defaults to none.
+        """
+        self._tasks: Dict[date, ReadingTask] = {}
+
+        for task in tasks:
+            self._tasks[as_date(task.date)] = task
+
+        # The dates of the tasks, sorted.
+        self._dates: List[date] = sorted(self._tasks.keys())
+
+    def add(self, task: ReadingTask):
+        """Adds the task, replacing the task of the same date if any."""
+        task_date = as_date(task.date)
+
+        if task_date not in self._tasks:
+            insort(self._dates, task_date)
+
+        self._tasks[task_date] = task
+
+    def get_task_at(self, date: Union[date, datetime]) -> Optional[ReadingTask]:
+        """Returns the task of the date, if any."""
+        return self._tasks.get(as_date(date))
+
+    def get_tasks(self, start_date: Optional[Union[date, datetime]] = None,
+                  end_date: Optional[Union[date, datetime]] = None) -> List[ReadingTask]:
+        """Returns the tasks from `start_date` to `end_date` (both inclusive), in date order.
+
+        Args:
+            start_date (date, optional): The first date. Defaults to the first task.
+            end_date (date, optional): The last date. Defaults to the last task.
+
+        Returns:
+            List[ReadingTask]: The tasks.
+        """
+        start = 0 if start_date is None else bisect_left(self._dates, as_date(start_date))
+        end = len(self._dates) if end_date is None else bisect_right(self._dates, as_date(end_date))
+
+        return [self._tasks[task_date] for task_date in self._dates[start:end]]
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __iter__(self) -> Iterator[ReadingTask]:
+        return (self._tasks[task_date] for task_date in self._dates)
+
+
 class PlanManager:
     def __init__(self, plans: List[List[str]]) -> None:
-        self.reading_tasks = {}
+        self.plan_index = PlanIndex()
 
         for plan in plans:
             # Parse the date
@@ -92,23 +202,25 @@ class PlanManager:
             # Book
             book = plan[1]
 
-            # Chapter number
-            chapter = int(plan[2])
+            # Chapter number, or chapter range (e.g. 17-18)
+            (chapter, _, end_chapter) = plan[2].partition('-')
+            chapter = int(chapter)
+            end_chapter = chapter if end_chapter == '' else int(end_chapter)
 
             # Verse range
             # If both are empty string -> all the verse
             start_verse = -1 if plan[3] == '' else int(plan[3])
             end_verse = 1000 if plan[4] == '' else int(plan[4])
 
-            self.reading_tasks[plan_date] = ReadingTask(
-                book, chapter, start_verse, end_verse, plan_date
-            )
+            self.plan_index.add(ReadingTask(
+                book, chapter, start_verse, end_verse, plan_date, end_chapter
+            ))
 
     def get_task_at(self, date: date) -> ReadingTask:
         '''
         Returns the reading task for the given date.
         '''
-        return self.reading_tasks.get(date)
+        return self.plan_index.get_task_at(date)
 
     def get_task_today(self) -> ReadingTask:
         '''
@@ -118,9 +230,9 @@ class PlanManager:
         return self.get_task_at(current_date)
 
     def get_tasks(self) -> List[ReadingTask]:
-        """Returns all reading tasks.
+        """Returns all reading tasks, in date order.
 
         Returns:
             List[ReadingTask]: All reading tasks.
         """
-        return list(self.reading_tasks.values())
+        return self.plan_index.get_tasks()
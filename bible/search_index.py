@@ -0,0 +1,382 @@
+import heapq
+import math
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from assets import get_asset
+from bible.bible_index import is_index_fresh
+from bible.bible_metadata import BibleMetadata
+
+SEARCH_INDEX_EXTENSION = '.search'
+
+_MAGIC = b'BIBSRC01'
+
+# Magic, term count, document (verse) count, size of the terms blob, size of the postings blob.
+_HEADER = struct.Struct('<8sIIII')
+
+# Term offset, term length, postings offset, postings length, document frequency, skips offset,
+# skip count.
+_TERM = struct.Struct('<IIIIIII')
+
+# A skip entry is written every this many postings. Each is the document id before the block and
+# the offset of the block in the term's postings, so intersections can jump over whole blocks.
+_SKIP_INTERVAL = 64
+
+# BM25 parameters.
+_K1 = 1.2
+_B = 0.75
+
+_WORD_PATTERN = re.compile(r'[^\W_]+')
+_PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+
+def get_search_index_path(xml_path: str) -> str:
+    """Returns the path of the search index for the given Bible XML file (e.g. `assets/niv.search`)."""
+    root, _ = os.path.splitext(xml_path)
+    return root + SEARCH_INDEX_EXTENSION
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits the text into lowercase words, ignoring punctuation."""
+    return _WORD_PATTERN.findall(text.lower().replace('’', '').replace("'", ''))
+
+
+def _encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Returns the decoded value and the position after it."""
+    result = 0
+    shift = 0
+
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+
+        if byte < 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def build_search_index(text, index_path: str) -> None:
+    """Builds the inverted index of every verse of a Bible text store (e.g. `BibleIndex`).
+
+    Verses are numbered in Bible order, which is the same order as `BibleMetadata`. Every term has
+    a postings list of (verse delta, term frequency, positions size, position deltas), all encoded
+    as varints. Position sizes let readers skip the positions of verses they do not need, and the skip
+    table of every term lets them skip whole blocks of verses. Terms are sorted, so they can be binary
+    searched from the memory mapped file.
+
+    Args:
+        text: The Bible text store.
+        index_path (str): Where to write the index. The file is replaced atomically.
+    """
+    postings: Dict[str, List[Tuple[int, List[int]]]] = defaultdict(list)
+    doc_lengths = []
+
+    for book in text.book_names:
+        for chapter in range(1, text.chapter_count(book) + 1):
+            for verse in text.get_verses(book, chapter, 1, text.verse_count(book, chapter)):
+                doc_id = len(doc_lengths)
+                words = tokenize(verse)
+                doc_lengths.append(len(words))
+
+                positions: Dict[str, List[int]] = defaultdict(list)
+                for position, word in enumerate(words):
+                    positions[word].append(position)
+
+                for word, word_positions in positions.items():
+                    postings[word].append((doc_id, word_positions))
+
+    terms_blob = bytearray()
+    term_table = bytearray()
+    postings_blob = bytearray()
+    skips_blob = bytearray()
+
+    for term in sorted(postings.keys(), key=lambda t: t.encode('utf-8')):
+        encoded_term = term.encode('utf-8')
+        postings_start = len(postings_blob)
+        skips_start = len(skips_blob)
+
+        last_doc = 0
+        for i, (doc_id, positions) in enumerate(postings[term]):
+            if i > 0 and i % _SKIP_INTERVAL == 0:
+                skips_blob += struct.pack('<II', last_doc, len(postings_blob) - postings_start)
+
+            encoded_positions = bytearray()
+            last_position = 0
+
+            for position in positions:
+                _encode_varint(position - last_position, encoded_positions)
+                last_position = position
+
+            _encode_varint(doc_id - last_doc, postings_blob)
+            _encode_varint(len(positions), postings_blob)
+            _encode_varint(len(encoded_positions), postings_blob)
+            postings_blob += encoded_positions
+            last_doc = doc_id
+
+        term_table += _TERM.pack(len(terms_blob), len(encoded_term), postings_start,
+                                 len(postings_blob) - postings_start, len(postings[term]),
+                                 skips_start, (len(skips_blob) - skips_start) // 8)
+        terms_blob += encoded_term
+
+    header = _HEADER.pack(_MAGIC, len(postings), len(doc_lengths), len(terms_blob),
+                          len(postings_blob))
+    lengths = struct.pack(f'<{len(doc_lengths)}H', *doc_lengths)
+
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        for part in [header, term_table, lengths, terms_blob, postings_blob, skips_blob]:
+            f.write(part)
+
+    os.replace(temp_path, index_path)
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    book: str
+    chapter: int
+    verse: int
+    score: float
+
+
+class SearchIndex:
+    """Full-text search over the verses of a Bible, read from the memory mapped index written by
+    `build_search_index`. Every word of the query must be in the verse, and quoted phrases must
+    appear in order. Results are ranked with BM25.
+    """
+
+    def __init__(self, index_path: str, metadata: BibleMetadata) -> None:
+        with open(index_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self._term_count, self._doc_count, terms_size,
+         postings_size) = _HEADER.unpack_from(self._mm, 0)
+
+        if magic != _MAGIC:
+            raise ValueError(f'{index_path} is not a search index file!')
+
+        self._term_table_start = _HEADER.size
+        self._lengths_start = self._term_table_start + self._term_count * _TERM.size
+        self._terms_start = self._lengths_start + self._doc_count * 2
+        self._postings_start = self._terms_start + terms_size
+        self._skips_start = self._postings_start + postings_size
+
+        # Verse numbers are in Bible order, so references are found by the first verse of each chapter.
+        self._chapters: List[Tuple[str, int]] = []
+        self._chapter_starts: List[int] = []
+
+        doc_id = 0
+        for book in metadata.book_names:
+            for chapter, verse_count in enumerate(metadata.verse_counts[book], start=1):
+                self._chapters.append((book, chapter))
+                self._chapter_starts.append(doc_id)
+                doc_id += verse_count
+
+        if doc_id != self._doc_count:
+            raise ValueError(f'{index_path} was not built from the same Bible as the metadata!')
+
+        self._average_length = self._total_length() / max(self._doc_count, 1)
+
+    def _total_length(self) -> int:
+        lengths = struct.unpack_from(f'<{self._doc_count}H', self._mm, self._lengths_start)
+        return sum(lengths)
+
+    def _doc_length(self, doc_id: int) -> int:
+        return struct.unpack_from('<H', self._mm, self._lengths_start + doc_id * 2)[0]
+
+    def _find_term(self, term: str) -> Optional[Tuple[int, int, int, int, int]]:
+        """Returns the postings offset, postings length, document frequency, skips offset, and skip
+        count of the term.
+        """
+        target = term.encode('utf-8')
+        low, high = 0, self._term_count
+
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, term_length, *term_info = _TERM.unpack_from(
+                self._mm, self._term_table_start + middle * _TERM.size)
+
+            start = self._terms_start + term_offset
+            current = self._mm[start:start + term_length]
+
+            if current == target:
+                return tuple(term_info)
+            elif current < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def _postings(self, term_info: Tuple[int, int, int, int, int], docs: Optional[set] = None,
+                  with_positions: bool = False) -> Dict[int, Tuple[int, List[int]]]:
+        """Decodes the postings of a term as document id -> (term frequency, positions). Only the
+        documents in `docs` are returned if it is given, and positions are only decoded if needed.
+        """
+        postings_offset, postings_length, _, skips_offset, skip_count = term_info
+        start = self._postings_start + postings_offset
+        data = self._mm[start:start + postings_length]
+
+        skips = struct.unpack_from(f'<{skip_count * 2}I', self._mm,
+                                   self._skips_start + skips_offset)
+        skip_docs = skips[0::2]
+        skip_positions = skips[1::2]
+
+        targets = [len(data)] if docs is None else sorted(docs)
+
+        result = {}
+        pos = 0
+        doc_id = 0
+
+        for target in targets:
+            if docs is not None:
+                # Jump to the last block starting before the target, if it is ahead of the decoder.
+                block = bisect_left(skip_docs, target) - 1
+                if block >= 0 and skip_positions[block] > pos:
+                    pos, doc_id = skip_positions[block], skip_docs[block]
+
+            while pos < len(data):
+                delta, next_pos = _decode_varint(data, pos)
+
+                # Stop before the documents after the target, they are needed by the next target.
+                if docs is not None and doc_id + delta > target:
+                    break
+
+                doc_id += delta
+                tf, pos = _decode_varint(data, next_pos)
+                positions_size, pos = _decode_varint(data, pos)
+                positions_end = pos + positions_size
+
+                if docs is None or doc_id == target:
+                    positions = []
+
+                    if with_positions:
+                        position = 0
+                        while pos < positions_end:
+                            gap, pos = _decode_varint(data, pos)
+                            position += gap
+                            positions.append(position)
+
+                    result[doc_id] = (tf, positions)
+
+                # Skip the positions that are not needed
+                pos = positions_end
+
+        return result
+
+    def reference(self, doc_id: int) -> Tuple[str, int, int]:
+        """Returns the book, chapter, and verse number of the verse."""
+        i = bisect_right(self._chapter_starts, doc_id) - 1
+        book, chapter = self._chapters[i]
+
+        return (book, chapter, doc_id - self._chapter_starts[i] + 1)
+
+    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
+        """Returns the best matching verses for the query.
+
+        Args:
+            query (str): The words to search. Words in double quotes are searched as a phrase.
+            limit (int, optional): The maximum number of results. Defaults to 10.
+
+        Returns:
+            List[SearchResult]: The verses, best match first.
+        """
+        phrases = [tokenize(phrase) for phrase in _PHRASE_PATTERN.findall(query)]
+        phrases = [phrase for phrase in phrases if len(phrase) > 1]
+        terms = list(dict.fromkeys(tokenize(query)))
+
+        if len(terms) == 0:
+            return []
+
+        term_infos = {}
+        for term in terms:
+            info = self._find_term(term)
+
+            # Every term must match
+            if info is None:
+                return []
+
+            term_infos[term] = info
+
+        # Intersect from the rarest term, so fewer documents need to be looked at.
+        terms.sort(key=lambda t: term_infos[t][2])
+        phrase_terms = {term for phrase in phrases for term in phrase}
+
+        docs = None
+        postings = {}
+
+        for term in terms:
+            postings[term] = self._postings(term_infos[term], docs,
+                                            with_positions=term in phrase_terms)
+            docs = set(postings[term].keys())
+
+            if len(docs) == 0:
+                return []
+
+        for phrase in phrases:
+            docs = {doc_id for doc_id in docs if self._has_phrase(doc_id, phrase, postings)}
+
+        scores = [(self._score(doc_id, terms, term_infos, postings), doc_id) for doc_id in docs]
+        best = heapq.nlargest(limit, scores, key=lambda item: (item[0], -item[1]))
+
+        return [SearchResult(*self.reference(doc_id), score=score) for score, doc_id in best]
+
+    def _has_phrase(self, doc_id: int, phrase: List[str], postings: dict) -> bool:
+        first_positions = postings[phrase[0]][doc_id][1]
+
+        for start in first_positions:
+            if all(start + offset in postings[term][doc_id][1]
+                   for offset, term in enumerate(phrase[1:], start=1)):
+                return True
+
+        return False
+
+    def _score(self, doc_id: int, terms: List[str], term_infos: dict, postings: dict) -> float:
+        doc_length = self._doc_length(doc_id)
+        score = 0.0
+
+        for term in terms:
+            df = term_infos[term][2]
+            tf = postings[term][doc_id][0]
+
+            idf = math.log(1 + (self._doc_count - df + 0.5) / (df + 0.5))
+            norm = tf + _K1 * (1 - _B + _B * doc_length / self._average_length)
+            score += idf * tf * (_K1 + 1) / norm
+
+        return score
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def load_search_index(metadata: BibleMetadata, asset_name: str = 'niv.xml') -> Optional[SearchIndex]:
+    """Opens the search index built from the Bible XML asset by `build_bible_index.py`.
+
+    Args:
+        metadata (BibleMetadata): The metadata of the same Bible, to map verses to references.
+        asset_name (str, optional): The Bible XML asset. Defaults to 'niv.xml'.
+
+    Returns:
+        Optional[SearchIndex]: The search index, or None if it is missing or older than the XML.
+    """
+    xml_path = get_asset(asset_name)
+    index_path = get_search_index_path(xml_path)
+
+    if not is_index_fresh(xml_path, index_path):
+        return None
+
+    return SearchIndex(index_path, metadata)
@@ -31,3 +31,36 @@ def get_superscript(num: int) -> str:
     superscripts = map(lambda digit: superscript[digit], digits)
 
     return ''.join(superscripts)
+
+
+def get_book_title(book: str) -> str:
+    '''
+    Returns the book name for display, e.g. `song of songs` to `Song of Songs`.
+    '''
+    words = [word if word == 'of' else word.capitalize() for word in book.split()]
+
+    return ' '.join(words)
+
+
+def format_verse_num(num: str) -> str:
+    '''
+    Returns the verse number as shown in the message, e.g. `3` to ` <b>³</b> `. Anything that is not a
+    digit, like the non-breaking space after Bible Gateway's verse numbers, is dropped.
+    '''
+    num_chars = filter(lambda c: c.isnumeric(), num)
+    number = int(''.join(num_chars))
+    return f' <b>{get_superscript(number)}</b> '
+
+
+def get_footnote_letter(index: int) -> str:
+    '''
+    Returns the letter of the footnote at the index, like Bible Gateway: `a` to `z`, then `aa`, `ab`...
+    '''
+    letters = ''
+
+    while True:
+        letters = chr(ord('a') + index % 26) + letters
+        index = index // 26 - 1
+
+        if index < 0:
+            return letters
@@ -6,6 +6,7 @@ from config.env import TOKEN, USE_WEBHOOK
 from telegram_bot.const import WEBHOOK_SETTINGS
 from telegram_bot.bot_manager import BotManager
 from telegram_bot.handler import commands, on_message, on_subscription_change
+from telegram_bot.handler_utils import start_subscriber_cache
 
 
 def create_command_handlers(item) -> CommandHandler:
@@ -24,16 +25,18 @@ def main():
     keyboard_handler = CallbackQueryHandler(on_subscription_change)
     bot_manager.add_handlers(keyboard_handler)
 
-    # Text messages to respond to, this is mainly for telegram channels
-    texts_to_respond = list(
-        map(lambda command: f'/{command}', commands.keys())
-    )
+    # Text messages to respond to, this is mainly for telegram channels.
+    # Commands can have arguments, e.g. /version ESV
+    commands_pattern = '|'.join(commands.keys())
     message_handler = MessageHandler(
-        Filters.text(texts_to_respond),
+        Filters.regex(rf'^/({commands_pattern})(@\w+)?(\s|$)'),
         on_message
     )
     bot_manager.add_handlers(message_handler)
 
+    # Serve /start from memory, kept up to date by listening to the subscribers
+    start_subscriber_cache()
+
     print('Starting bot')
     bot_manager.start_bot(USE_WEBHOOK, WEBHOOK_SETTINGS)
 
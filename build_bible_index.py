@@ -0,0 +1,38 @@
+import sys
+from assets import get_asset
+from bible.bible_index import BibleIndex, build_index, get_index_path
+from bible.bible_metadata import BibleMetadata, get_metadata_path
+from bible.search_index import build_search_index, get_search_index_path
+
+# How to use:
+# 1. Make sure the Bible XML file (e.g. niv.xml) is in assets/
+# 2. Run this python file, optionally with the XML asset names (defaults to niv.xml)
+
+
+def main(asset_names):
+    for asset_name in asset_names:
+        xml_path = get_asset(asset_name)
+        index_path = get_index_path(xml_path)
+
+        print(f'Compiling {xml_path} to {index_path}')
+        build_index(xml_path, index_path)
+
+        # The metadata is read from the index, so both always agree.
+        metadata_path = get_metadata_path(xml_path)
+        print(f'Writing metadata to {metadata_path}')
+
+        index = BibleIndex(index_path)
+        BibleMetadata.from_text(index).save(metadata_path)
+
+        # The search index numbers verses in the same order as the metadata.
+        search_index_path = get_search_index_path(xml_path)
+        print(f'Building search index {search_index_path}')
+        build_search_index(index, search_index_path)
+
+        index.close()
+
+    print('Bible index build complete!')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or ['niv.xml'])
@@ -29,6 +29,68 @@ if GOOGLE_SHEET_TASK_HEADERS is None:
 else:
     GOOGLE_SHEET_TASK_HEADERS = GOOGLE_SHEET_TASK_HEADERS.split(",")
 
+# Bible versions that chats can pick, as comma separated VERSION:asset pairs (e.g. NIV:niv.xml,ESV:).
+# A version without an asset is only fetched from Bible Gateway. The first version is the default.
+BIBLE_TRANSLATIONS = {}
+for _translation in os.environ.get('BIBLE_TRANSLATIONS', 'NIV:niv.xml').split(','):
+    _version, _, _asset = _translation.partition(':')
+    BIBLE_TRANSLATIONS[_version.strip().upper()] = _asset.strip() or None
+
+BIBLE_DEFAULT_VERSION = next(iter(BIBLE_TRANSLATIONS))
+
+# How much memory the loaded Bible texts may use, in megabytes
+BIBLE_MEMORY_BUDGET_MB = int(os.environ.get('BIBLE_MEMORY_BUDGET_MB', 64))
+
+# How many days of reading tasks are prefetched, including today
+PREFETCH_DAYS = int(os.environ.get('PREFETCH_DAYS', 7))
+
+# How many passages are prefetched at the same time
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 4))
+
+# How many requests per second are sent to Bible Gateway when prefetching
+PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', 2))
+
+# Where Bible Gateway pages are cached. On AWS Lambda only /tmp is writable.
+GATEWAY_CACHE_DIR = os.environ.get('GATEWAY_CACHE_DIR') or None
+
+# How long a cached Bible Gateway page is used, in hours. By default, prefetched pages are kept until
+# the last prefetched day has passed.
+GATEWAY_CACHE_TTL_HOURS = float(os.environ.get('GATEWAY_CACHE_TTL_HOURS', 24 * (PREFETCH_DAYS + 1)))
+
+# How much disk space the cached Bible Gateway pages may use, in megabytes
+GATEWAY_CACHE_MAX_MB = int(os.environ.get('GATEWAY_CACHE_MAX_MB', 50))
+
+# Whether the cached Bible Gateway pages are compressed
+GATEWAY_CACHE_COMPRESS = os.environ.get('GATEWAY_CACHE_COMPRESS', 'true').lower() not in ('0', 'false', 'no')
+
+# How many rendered messages are kept in memory
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 256))
+
+# Whether rendered messages are also cached on disk, next to the Bible Gateway pages
+RENDER_CACHE_PERSIST = os.environ.get('RENDER_CACHE_PERSIST', 'true').lower() not in ('0', 'false', 'no')
+
+# How much disk space the rendered messages cached on disk may use, in megabytes. It is separate from
+# the Bible Gateway pages' space.
+RENDER_CACHE_MAX_MB = int(os.environ.get('RENDER_CACHE_MAX_MB', 10))
+
+# Whether rendered messages are also cached in Firestore, so that every AWS Lambda container can
+# send what the prefetch rendered
+RENDER_CACHE_SHARED = os.environ.get('RENDER_CACHE_SHARED', 'true').lower() not in ('0', 'false', 'no')
+
+# Whether reading plans that are not keyed by their date yet are looked up by a query on the date.
+# Turn it off once `migrate_plans.py` has run.
+PLAN_LEGACY_LOOKUP = os.environ.get('PLAN_LEGACY_LOOKUP', 'true').lower() not in ('0', 'false', 'no')
+
+# Whether subscribers that are not keyed by their chat id yet are looked up by a query on the chat id.
+# Turn it off once `migrate_subscribers.py` has run.
+SUBSCRIBER_LEGACY_LOOKUP = os.environ.get('SUBSCRIBER_LEGACY_LOOKUP', 'true').lower() not in ('0', 'false', 'no')
+
+# How many subscribers the bot keeps in memory
+SUBSCRIBER_CACHE_SIZE = int(os.environ.get('SUBSCRIBER_CACHE_SIZE', 1024))
+
+# How many subscribers are read from the database at a time when sending to all of them
+SUBSCRIBER_PAGE_SIZE = int(os.environ.get('SUBSCRIBER_PAGE_SIZE', 300))
+
 # Firebase admin SDK credentials
 _CREDENTIALS_JSON = json.loads(
     os.environ['GOOGLE_APPLICATION_CREDENTIALS_JSON'])
@@ -1,4 +1,18 @@
 from google.cloud import firestore
-from config.env import CREDENTIALS
 
-db = firestore.Client(credentials=CREDENTIALS)
+_db = None
+
+
+def __getattr__(name: str):
+    # The client is created when `db` is first used, so that the repositories can be imported
+    # without the credentials, e.g. by the tests.
+    global _db
+
+    if name != 'db':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if _db is None:
+        from config.env import CREDENTIALS
+        _db = firestore.Client(credentials=CREDENTIALS)
+
+    return _db
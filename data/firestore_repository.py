@@ -1,4 +1,66 @@
+from typing import Callable, Iterator, List, Optional, Tuple
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import DocumentSnapshot
+from google.cloud.firestore_v1.base_query import BaseQuery
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# Firestore commits at most this many writes in a batch.
+MAX_BATCH_SIZE = 500
+
+# Firestore compares a field with at most this many values in an `in` filter.
+MAX_IN_VALUES = 10
+
+# How many documents are read in a page when iterating.
+DEFAULT_PAGE_SIZE = 300
+
+# A write of a batch: the document id, and the data to set, or None to delete the document.
+Write = Tuple[str, Optional[dict]]
+
+
+def write_in_batches(db: firestore.Client, collection: CollectionReference,
+                     groups: List[List[Write]],
+                     on_progress: Optional[Callable[[int, int], None]] = None,
+                     batch_size: int = MAX_BATCH_SIZE):
+    """Commits the writes to the collection in batches of at most `batch_size` writes. The writes of
+    a group are always in the same batch, so they are applied together.
+
+    Args:
+        db (firestore.Client): The database client.
+        collection (CollectionReference): The collection of the documents.
+        groups (List[List[Write]]): The groups of writes.
+        on_progress (Callable[[int, int], None], optional): Called after every batch with how many
+            groups are written so far, and how many there are.
+        batch_size (int, optional): The most writes in a batch. Defaults to Firestore's limit.
+    """
+    if len(groups) == 0:
+        return
+
+    batch = db.batch()
+    count = 0
+
+    for i, writes in enumerate(groups):
+        if count > 0 and count + len(writes) > batch_size:
+            batch.commit()
+
+            if on_progress is not None:
+                on_progress(i, len(groups))
+
+            batch = db.batch()
+            count = 0
+
+        for doc_id, data in writes:
+            if data is None:
+                batch.delete(collection.document(doc_id))
+            else:
+                batch.set(collection.document(doc_id), data)
+
+        count += len(writes)
+
+    batch.commit()
+
+    if on_progress is not None:
+        on_progress(len(groups), len(groups))
 
 
 class FirestoreRepository:
@@ -8,6 +70,7 @@ class FirestoreRepository:
     """
 
     def __init__(self, collection_name, client: firestore.Client) -> None:
+        self.db = client
         self.collection = client.collection(collection_name)
 
     def _data_class(self):
@@ -30,10 +93,41 @@ class FirestoreRepository:
         Returns:
             list: All items in the database.
         """
-        snapshots = self.collection.get()
-        items = map(lambda doc: self._create_from_doc(doc.id, doc.to_dict()),
-                    snapshots)
-        return list(items)
+        return list(self.iter())
+
+    def iter(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator:
+        """Yields all the items in the database, reading a page at a time.
+
+        Args:
+            page_size (int, optional): How many items are read in a page. Defaults to 300.
+        """
+        for doc in self._iter_docs(self.collection, page_size):
+            yield self._create_from_doc(doc.id, doc.to_dict())
+
+    def _iter_docs(self, query: BaseQuery, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[DocumentSnapshot]:
+        """Yields the documents of the query in order of their ids. Only a page of documents is read
+        and held at a time, and the next page starts after the last document of the page, so the
+        first documents can be used before the rest are read.
+
+        Args:
+            query (BaseQuery): The query, or a collection for all of its documents.
+            page_size (int, optional): How many documents are read in a page. Defaults to 300.
+        """
+        query = query.order_by(FieldPath.document_id()).limit(page_size)
+        last = None
+
+        while True:
+            page_query = query if last is None else query.start_after(last)
+
+            # Read the whole page first, so that the stream is not kept open while it is used.
+            page = list(page_query.stream())
+
+            yield from page
+
+            if len(page) < page_size:
+                return
+
+            last = page[-1]
 
     def save(self, data):
         """Persists the given data to the database. This operation can be insert or update.
@@ -52,9 +146,9 @@ class FirestoreRepository:
         doc_id = firestore_data.pop('id')
 
         if (doc_id == ''):
-            # Insert
-            inserted = self.collection.add(firestore_data)[1].get()
-            return self._create_from_doc(inserted.id, inserted.to_dict())
+            # Insert, the saved data is already known so it is not read back
+            (_, inserted) = self.collection.add(firestore_data)
+            return self._create_from_doc(inserted.id, firestore_data)
         else:
             # Update
             self.collection.document(doc_id).set(firestore_data)
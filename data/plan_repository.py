@@ -1,39 +1,151 @@
 import datetime
-from typing import List, Optional
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from google.api_core.exceptions import DeadlineExceeded
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_document import DocumentSnapshot
-from google.cloud.firestore_v1.document import DocumentReference
 
-from bible.plan_manager import ReadingTask, to_csv_date
+from bible.plan_manager import ReadingTask, as_date, parse_csv_date, to_csv_date
+from data.firestore_repository import MAX_BATCH_SIZE, MAX_IN_VALUES, write_in_batches
+
+
+def get_plan_id(date: datetime.date) -> str:
+    """Returns the document id of the plan for the date, which is the ISO date, e.g. `2022-01-03`."""
+    return as_date(date).isoformat()
 
 
 class PlanRepository:
-    def __init__(self, db: firestore.Client) -> None:
+    def __init__(self, db: firestore.Client, legacy_lookup: bool = True) -> None:
+        """
+        Args:
+            db (firestore.Client): The database client.
+            legacy_lookup (bool, optional): Whether a plan that is not in the document of its date
+                is looked up by a query on its date, like plans saved before the documents were
+                keyed by date. Turn it off once `migrate_plan_ids` has run. Defaults to True.
+        """
         self.db = db
         self.collection = db.collection('reading_plans')
+        self.legacy_lookup = legacy_lookup
 
     def upsert_plan(self, task: ReadingTask):
-        # Try to get an existing plan for the date
-        existing = self._get_plan(task.date)
+        """Saves the plan for its date, replacing the existing plan of the date.
 
-        # Convert the object to dictionary
-        data = task.to_dict()
+        Args:
+            task (ReadingTask): The plan.
+        """
+        self.upsert_plans([task])
 
-        if existing is None:
-            # If there is no plan for the given date, add to database
-            self.collection.add(data)
-        else:
-            # If there is a plan for the given date, update the data
-            ref: DocumentReference = existing.reference
-            ref.set(data)
+    def upsert_plans(self, tasks: Iterable[ReadingTask],
+                     on_progress: Optional[Callable[[int, int], None]] = None,
+                     batch_size: int = MAX_BATCH_SIZE) -> int:
+        """Saves the plans, replacing the existing plans of their dates. Every plan is saved to the
+        document of its date (see `get_plan_id`). While `legacy_lookup` is on, older documents of
+        the same dates, saved with random ids, are also deleted. The writes are committed in
+        batches, so that a year of plans takes a few requests.
+
+        Args:
+            tasks (Iterable[ReadingTask]): The plans.
+            on_progress (Callable[[int, int], None], optional): Called after every batch with how
+                many plans are saved so far, and how many there are.
+            batch_size (int, optional): The most writes in a batch. Defaults to Firestore's limit.
+
+        Returns:
+            int: How many plans are saved.
+        """
+        tasks = list(tasks)
+
+        if len(tasks) == 0:
+            return 0
+
+        # Older documents are only looked for until `migrate_plan_ids` has run.
+        other_ids = self._get_other_ids_by_date(task.date for task in tasks) if self.legacy_lookup else {}
+
+        # The plan and the deletes of its older documents are in the same batch.
+        groups = []
+        for task in tasks:
+            plan_id = get_plan_id(task.date)
+            writes = [(plan_id, task.to_dict())]
+            writes.extend((other_id, None) for other_id in other_ids.get(plan_id, []))
+            groups.append(writes)
+
+        write_in_batches(self.db, self.collection, groups, on_progress, batch_size)
+
+        return len(tasks)
+
+    def migrate_plan_ids(self, on_progress: Optional[Callable[[int, int], None]] = None,
+                         batch_size: int = MAX_BATCH_SIZE) -> int:
+        """Moves the plans saved with random ids to the document of their date (see `get_plan_id`).
+        If a date has several plans, the document of the date is kept if it exists, and otherwise
+        the last updated plan is kept. The other documents are deleted. It can be run again, e.g.
+        after it is interrupted.
+
+        Args:
+            on_progress (Callable[[int, int], None], optional): Called after every batch with how
+                many dates are moved so far, and how many there are.
+            batch_size (int, optional): The most writes in a batch. Defaults to Firestore's limit.
+
+        Returns:
+            int: How many dates are moved.
+        """
+        keyed_ids = set()
+        others: Dict[str, List[DocumentSnapshot]] = {}
+
+        for doc in self.collection.stream():
+            date_str = (doc.to_dict() or {}).get('date')
+
+            try:
+                plan_id = get_plan_id(parse_csv_date(date_str))
+            except (TypeError, ValueError):
+                print(f'Skipping plan {doc.id} with invalid date {date_str}')
+                continue
+
+            if doc.id == plan_id:
+                keyed_ids.add(plan_id)
+            else:
+                others.setdefault(plan_id, []).append(doc)
+
+        groups = []
+        for plan_id, docs in sorted(others.items()):
+            writes = []
+
+            if plan_id not in keyed_ids:
+                latest = max(docs, key=lambda doc: 0 if doc.update_time is None
+                             else doc.update_time.timestamp())
+                writes.append((plan_id, latest.to_dict()))
+
+            writes.extend((doc.id, None) for doc in docs)
+            groups.append(writes)
+
+        write_in_batches(self.db, self.collection, groups, on_progress, batch_size)
+
+        return len(groups)
+
+    def _get_other_ids_by_date(self, dates: Iterable[datetime.date]) -> Dict[str, List[str]]:
+        """Returns the ids of the documents of the dates that are not the document of their date, by
+        the document id of their date. Only the documents of the dates are read, a few dates per
+        query.
+        """
+        result: Dict[str, List[str]] = {}
+        date_strs = sorted({to_csv_date(date) for date in dates})
+
+        for i in range(0, len(date_strs), MAX_IN_VALUES):
+            query = self.collection.where('date', 'in', date_strs[i:i + MAX_IN_VALUES])
+
+            for doc in query.select(['date']).stream():
+                plan_id = get_plan_id(parse_csv_date(doc.to_dict()['date']))
+
+                if doc.id != plan_id:
+                    result.setdefault(plan_id, []).append(doc.id)
+
+        return result
 
     def get_plans(self) -> List[ReadingTask]:
         docs = self.collection.get()
 
         return list(map(lambda x: ReadingTask.from_doc(x), docs))
 
-    def _get_plan(self, date: datetime.date) -> Optional[DocumentSnapshot]:
-        result = self.collection.where('date', '==', to_csv_date(date)).get()
+    def _get_legacy_plan(self, date: datetime.date, timeout: Optional[float] = None) -> Optional[DocumentSnapshot]:
+        result = self.collection.where('date', '==', to_csv_date(date)).get(timeout=timeout)
         result = list(result)
 
         if len(result) == 0:
@@ -41,8 +153,40 @@ class PlanRepository:
         else:
             return result[0]
 
-    def get_plan_at(self, date: datetime.date) -> Optional[ReadingTask]:
-        result = self._get_plan(date)
+    def _get_plan(self, date: datetime.date, timeout: Optional[float] = None) -> Optional[DocumentSnapshot]:
+        start = time.monotonic()
+        doc = self.collection.document(get_plan_id(date)).get(timeout=timeout)
+
+        if doc.exists:
+            return doc
+
+        if not self.legacy_lookup:
+            return None
+
+        # Not migrated yet, see `migrate_plan_ids`
+        if timeout is not None:
+            timeout = timeout - (time.monotonic() - start)
+
+            if timeout <= 0:
+                raise DeadlineExceeded(f'No time left to look up the plan of {date} by its date')
+
+        return self._get_legacy_plan(date, timeout)
+
+    def get_plan_at(self, date: datetime.date, timeout: Optional[float] = None) -> Optional[ReadingTask]:
+        """Returns the plan for the date, or None if there is none. It is a single read of the
+        document of the date, and a query on the date if that is missing and `legacy_lookup` is on.
+
+        Args:
+            date (datetime.date): The date.
+            timeout (float, optional): The seconds the lookup may take. Defaults to no timeout.
+
+        Raises:
+            DeadlineExceeded: If the plan cannot be read before the timeout.
+
+        Returns:
+            Optional[ReadingTask]: The plan.
+        """
+        result = self._get_plan(date, timeout)
 
         if result is None:
             return None
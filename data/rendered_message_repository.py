@@ -0,0 +1,74 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from google.cloud import firestore
+
+# How long a rendered message is used, in seconds.
+DEFAULT_TTL = 24 * 60 * 60
+
+# Seconds a read or write may take, so that a slow database does not hold up sending.
+DEFAULT_TIMEOUT = 5
+
+
+class RenderedMessageRepository:
+    """Rendered message bodies in Firestore, shared by every process, so that a passage prefetched
+    by one AWS Lambda container is sent by any other without fetching Bible Gateway. It has the
+    `get_entry` and `put_entry` of a `PageCache`, so that it can be the shared tier of a
+    `RenderCache`.
+
+    Each body is the document named by the hash of its key. Expired bodies are not used, and can be
+    deleted by a Firestore TTL policy on `expires_at`.
+    """
+
+    def __init__(self, db: firestore.Client,
+                 ttl: float = DEFAULT_TTL,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        Args:
+            db (firestore.Client): The database client.
+            ttl (float, optional): Seconds a body is used after it is rendered. Defaults to a day.
+            timeout (float, optional): Seconds a read or write may take. Defaults to 5.
+            clock (Callable[[], float], optional): Returns the current time in seconds.
+        """
+        self.collection = db.collection('rendered_messages')
+        self.ttl = ttl
+        self.timeout = timeout
+        self._clock = clock
+
+    @staticmethod
+    def _doc_id(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_entry(self, key: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Returns the body rendered for the key, or None if there is none or it has expired.
+
+        Args:
+            key (str): The key of the body.
+            timeout (float, optional): Seconds the read may take, if shorter than the repository's.
+        """
+        if timeout is None or (self.timeout is not None and self.timeout < timeout):
+            timeout = self.timeout
+
+        doc = self.collection.document(self._doc_id(key)).get(timeout=timeout)
+
+        if not doc.exists:
+            return None
+
+        data = doc.to_dict()
+
+        if data.get('key') != key or data['expires_at'].timestamp() <= self._clock():
+            return None
+
+        return data['body']
+
+    def put_entry(self, key: str, text: str):
+        """Saves the body rendered for the key, replacing the previous one."""
+        expires_at = datetime.fromtimestamp(self._clock() + self.ttl, timezone.utc)
+
+        self.collection.document(self._doc_id(key)).set({
+            'key': key,
+            'body': text,
+            'expires_at': expires_at,
+        }, timeout=self.timeout)
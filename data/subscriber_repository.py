@@ -1,9 +1,22 @@
-from typing import List, Optional, Set
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import DocumentSnapshot
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.transaction import Transaction
 from enum import Enum, auto, unique
 from dataclasses import dataclass, asdict
 
-from data.firestore_repository import FirestoreRepository
+from data.firestore_repository import DEFAULT_PAGE_SIZE, MAX_BATCH_SIZE, FirestoreRepository, write_in_batches
+
+
+def get_subscriber_id(chat_id) -> str:
+    """Returns the document id of the chat's subscriber, which is the chat id, e.g. `-1001234`."""
+    return str(chat_id)
+
+
+# Changes a subscriber in a transaction, given the document of its chat id, its data if it exists,
+# and the documents it has to be moved from. Returns the result of the change.
+SubscriberUpdate = Callable[[Transaction, DocumentReference, Optional[dict], List[DocumentReference]], bool]
 
 
 @unique
@@ -44,6 +57,8 @@ class Subscriber:
     id: str
     chat_id: str
     sub_items: Set[SubscriptionItem]
+    version: Optional[str] = None
+    """The Bible version the chat reads, or None for the default version."""
 
     def is_subscribed_to(self, item: SubscriptionItem) -> bool:
         return item in self.sub_items
@@ -60,7 +75,8 @@ class Subscriber:
             id=json['id'],
             chat_id=json['chat_id'],
             sub_items=set(
-                map(lambda value: SubscriptionItem(value), json['sub_items']))
+                map(lambda value: SubscriptionItem(value), json.get('sub_items', []))),
+            version=json.get('version')
         )
 
     def to_json(self):
@@ -75,45 +91,207 @@ class Subscriber:
 class SubscriberRepository(FirestoreRepository):
     """
     This class is used to retrieve and persists subscriber data to the firestore database.
+    The subscriber of a chat is the document keyed by its chat id, see `get_subscriber_id`.
     """
 
-    def __init__(self, db: firestore.Client) -> None:
+    def __init__(self, db: firestore.Client, legacy_lookup: bool = True) -> None:
+        """
+        Args:
+            db (firestore.Client): The database client.
+            legacy_lookup (bool, optional): Whether a subscriber that is not in the document of its
+                chat id is looked up by a query on the chat id, like subscribers saved before the
+                documents were keyed by chat id. Such a subscriber is moved to the document of its
+                chat id when it is changed. Turn it off once `migrate_ids` has run. Defaults to
+                True.
+        """
         super().__init__('subscribers', db)
+        self.legacy_lookup = legacy_lookup
 
     def _data_class(self):
         return Subscriber
 
+    def from_doc(self, doc: DocumentSnapshot) -> Subscriber:
+        """Returns the subscriber of the document, e.g. of a snapshot listener."""
+        return super()._create_from_doc(doc.id, doc.to_dict())
+
     def list_by_subscription(self, item: SubscriptionItem):
-        snapshots = self.collection.where(
-            'sub_items', 'array_contains', item.value).get()
+        return list(self.iter_by_subscription(item))
+
+    def iter_by_subscription(self, item: SubscriptionItem,
+                             page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Subscriber]:
+        """Yields the subscribers of the item, reading a page at a time, so that they can be used
+        before all of them are read. A chat is only yielded once, even if it has several documents
+        that are not migrated yet, see `migrate_ids`.
+
+        Args:
+            item (SubscriptionItem): The subscription.
+            page_size (int, optional): How many subscribers are read in a page. Defaults to 300.
+        """
+        query = self.collection.where('sub_items', 'array_contains', item.value)
+
+        # Only the chat ids are remembered, not the subscribers.
+        seen_ids = set()
+
+        for doc in self._iter_docs(query, page_size):
+            subscriber = self.from_doc(doc)
+            subscriber_id = get_subscriber_id(subscriber.chat_id)
+
+            if subscriber_id in seen_ids:
+                continue
 
-        items = map(lambda doc: self._create_from_doc(doc.id, doc.to_dict()),
-                    snapshots)
-        return list(items)
+            seen_ids.add(subscriber_id)
+            yield subscriber
 
     def get(self, id: str):
-        doc = self.collection.where('chat_id', '==', id).get()
-        if len(doc) == 0:
-            return None
+        doc = self.collection.document(get_subscriber_id(id)).get()
+
+        if not doc.exists:
+            if not self.legacy_lookup:
+                return None
+
+            # Not migrated yet, see `migrate_ids`
+            docs = self.collection.where('chat_id', '==', id).get()
+            if len(docs) == 0:
+                return None
+
+            doc = docs[0]
 
-        doc = doc[0]
         return super()._create_from_doc(doc.id, doc.to_dict())
 
     def is_subscribed(self, chat_id: str, item: SubscriptionItem) -> bool:
         doc = self.get(chat_id)
         return (doc is not None) and (item in doc.sub_items)
 
-    def toggle_subscription(self, chat_id: str, item: SubscriptionItem):
-        subscriber = self.get(chat_id)
+    def _get_for_update(self, transaction: Transaction,
+                        chat_id: str) -> Tuple[DocumentReference, Optional[dict], List[DocumentReference]]:
+        """Reads the chat's subscriber in the transaction.
 
-        # Create a new subscriber if doesn't exist in database.
-        if subscriber is None:
-            subscriber = Subscriber(id='', chat_id=chat_id, sub_items=set())
+        Returns:
+            Tuple[DocumentReference, Optional[dict], List[DocumentReference]]: The document of the
+                chat id, the subscriber's data if it exists, and the documents the subscriber has to
+                be moved from, if it is not in the document of its chat id yet.
+        """
+        ref = self.collection.document(get_subscriber_id(chat_id))
+        snapshot = ref.get(transaction=transaction)
 
-        is_subbed = subscriber.is_subscribed_to(item)
-        if is_subbed:
-            subscriber.unsubscribe(item)
-        else:
-            subscriber.subscribe(item)
+        if snapshot.exists:
+            return (ref, snapshot.to_dict(), [])
+
+        if self.legacy_lookup:
+            docs = list(transaction.get(self.collection.where('chat_id', '==', chat_id)))
+
+            if len(docs) > 0:
+                return (ref, docs[0].to_dict(), [doc.reference for doc in docs])
+
+        return (ref, None, [])
+
+    def _update(self, chat_id: str, update: SubscriberUpdate) -> bool:
+        """Runs the update of the chat's subscriber in a transaction, which is retried if the
+        subscriber changes at the same time, e.g. when two admins press a button together.
+        """
+        @firestore.transactional
+        def run(transaction: Transaction) -> bool:
+            (ref, data, legacy_refs) = self._get_for_update(transaction, chat_id)
+            return update(transaction, ref, data, legacy_refs)
+
+        return run(self.db.transaction())
+
+    def _move(self, transaction: Transaction, ref: DocumentReference, chat_id: str,
+              data: Optional[dict], legacy_refs: List[DocumentReference]):
+        """Writes the whole subscriber to the document of its chat id, and deletes its old
+        documents.
+        """
+        transaction.set(ref, {'chat_id': chat_id, 'sub_items': [], 'version': None,
+                              **(data or {})})
+
+        for legacy_ref in legacy_refs:
+            transaction.delete(legacy_ref)
+
+    def toggle_subscription(self, chat_id: str, item: SubscriptionItem) -> bool:
+        """Subscribes the chat to the item, or unsubscribes it if it is subscribed. It is a single
+        transactional write.
+
+        Args:
+            chat_id (str): The chat id.
+            item (SubscriptionItem): The subscription.
+
+        Returns:
+            bool: Whether the chat is subscribed to the item now.
+        """
+        def update(transaction, ref, data, legacy_refs) -> bool:
+            sub_items = [] if data is None else data.get('sub_items', [])
+            subscribed = item.value in sub_items
+
+            if data is not None and len(legacy_refs) == 0:
+                change = firestore.ArrayRemove if subscribed else firestore.ArrayUnion
+                transaction.update(ref, {'sub_items': change([item.value])})
+            else:
+                sub_items = [value for value in sub_items if value != item.value]
+                if not subscribed:
+                    sub_items.append(item.value)
+
+                self._move(transaction, ref, chat_id, {**(data or {}), 'sub_items': sub_items},
+                           legacy_refs)
+
+            return not subscribed
+
+        return self._update(chat_id, update)
+
+    def set_version(self, chat_id: str, version: str):
+        def update(transaction, ref, data, legacy_refs) -> bool:
+            if data is not None and len(legacy_refs) == 0:
+                transaction.update(ref, {'version': version})
+            else:
+                self._move(transaction, ref, chat_id, {**(data or {}), 'version': version},
+                           legacy_refs)
+
+            return True
+
+        self._update(chat_id, update)
+
+    def migrate_ids(self, on_progress: Optional[Callable[[int, int], None]] = None,
+                    batch_size: int = MAX_BATCH_SIZE) -> int:
+        """Moves the subscribers saved with random ids to the document of their chat id (see
+        `get_subscriber_id`). If a chat has several subscribers, the document of the chat id is kept
+        if it exists, and otherwise the first by document id, which is the one that was read before.
+        The other documents are deleted. It can be run again, e.g. after it is interrupted.
+
+        Args:
+            on_progress (Callable[[int, int], None], optional): Called after every batch with how
+                many chats are moved so far, and how many there are.
+            batch_size (int, optional): The most writes in a batch. Defaults to Firestore's limit.
+
+        Returns:
+            int: How many chats are moved.
+        """
+        keyed_ids = set()
+        others: Dict[str, List[DocumentSnapshot]] = {}
+
+        for doc in self.collection.stream():
+            chat_id = (doc.to_dict() or {}).get('chat_id')
+
+            if chat_id is None:
+                print(f'Skipping subscriber {doc.id} without chat id')
+                continue
+
+            subscriber_id = get_subscriber_id(chat_id)
+
+            if doc.id == subscriber_id:
+                keyed_ids.add(subscriber_id)
+            else:
+                others.setdefault(subscriber_id, []).append(doc)
+
+        groups = []
+        for subscriber_id, docs in sorted(others.items()):
+            writes = []
+
+            if subscriber_id not in keyed_ids:
+                first = min(docs, key=lambda doc: doc.id)
+                writes.append((subscriber_id, first.to_dict()))
+
+            writes.extend((doc.id, None) for doc in docs)
+            groups.append(writes)
+
+        write_in_batches(self.db, self.collection, groups, on_progress, batch_size)
 
-        return super().save(subscriber)
+        return len(groups)
@@ -1,12 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import requests
 import csv
 from io import StringIO
-from google.cloud import firestore
-from bible.bible import Bible
+from bible.bible_metadata import load_metadata
 from data import db
 from data.plan_repository import PlanRepository
-from config.env import GOOGLE_SHEET_TASK_URL, GOOGLE_SHEET_TASK_HEADERS, CREDENTIALS
+from config.env import GOOGLE_SHEET_TASK_URL, GOOGLE_SHEET_TASK_HEADERS, PLAN_LEGACY_LOOKUP, PREFETCH_DAYS
+from prefetch import main as run_prefetch
 
 from schedule.schedule_parser import ScheduleParser
 
@@ -26,25 +26,32 @@ def main():
     csv_data = list(reader)
 
     current_date = datetime(START_YEAR, 1, 3)
-    bible = Bible()
+    bible = load_metadata()
     schedule_parser = ScheduleParser(csv_data, current_date, bible,
                                      expected_headers=GOOGLE_SHEET_TASK_HEADERS)
     print('Successfully parsed tasks from google sheet!')
 
+    # Every task of the schedule, by date
+    plan_index = schedule_parser.schedule
+
     today = datetime.now()
     print(f'Retrieving tasks from {today.date()} onwards.')
-    tasks = schedule_parser.get_tasks(start_date=today)
+    tasks = plan_index.get_tasks(start_date=today)
 
     print(f'Uploading {len(tasks)} tasks.')
 
-    task_repo = PlanRepository(db)
-    for task in tasks:
-        task_repo.upsert_plan(task)
-        print(task)
+    task_repo = PlanRepository(db, legacy_lookup=PLAN_LEGACY_LOOKUP)
+    task_repo.upsert_plans(
+        tasks, on_progress=lambda done, total: print(f'Uploaded {done} / {total} tasks.'))
 
     print()
     print('Upload task complete!')
 
+    # Warm the caches with the upcoming passages, so that sending them needs no fetch
+    upcoming_tasks = plan_index.get_tasks(
+        start_date=today, end_date=today + timedelta(days=PREFETCH_DAYS - 1))
+    run_prefetch(upcoming_tasks)
+
 
 if __name__ == '__main__':
     main()
@@ -1,5 +1,6 @@
 from send_reading import main as run_send_reading
 from fetch_schedule import main as run_fetch_schedule
+from prefetch import main as run_prefetch
 
 
 def lambda_handler(event: dict, context):  # NOSONAR
@@ -11,6 +12,9 @@ def lambda_handler(event: dict, context):  # NOSONAR
     elif task == 'UPDATE_SCHEDULE':
         print('Running UPDATE_SCHEDULE task.')
         run_fetch_schedule()
+    elif task == 'PREFETCH':
+        print('Running PREFETCH task.')
+        run_prefetch()
     else:
         raise ValueError(
             f'No task named {task}! Please check your LAMBDA_TASK environment variable configuration.')
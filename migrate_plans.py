@@ -0,0 +1,21 @@
+from data import db
+from data.plan_repository import PlanRepository
+
+# How to use:
+# 1. Run this python file once, after deploying the version that keys reading plans by date
+# 2. Set PLAN_LEGACY_LOOKUP=false, so that plans are only read from the documents of their dates
+
+
+def main():
+    repo = PlanRepository(db)
+
+    print('Moving reading plans to the documents of their dates.')
+    moved = repo.migrate_plan_ids(
+        on_progress=lambda done, total: print(f'\r{done} / {total}', end=''))
+
+    print()
+    print(f'Moved {moved} dates!')
+
+
+if __name__ == '__main__':
+    main()
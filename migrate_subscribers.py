@@ -0,0 +1,22 @@
+from data import db
+from data.subscriber_repository import SubscriberRepository
+
+# How to use:
+# 1. Run this python file once, after deploying the version that keys subscribers by chat id
+# 2. Set SUBSCRIBER_LEGACY_LOOKUP=false, so that subscribers are only read from the documents of
+#    their chat ids
+
+
+def main():
+    repo = SubscriberRepository(db)
+
+    print('Moving subscribers to the documents of their chat ids.')
+    moved = repo.migrate_ids(
+        on_progress=lambda done, total: print(f'\r{done} / {total}', end=''))
+
+    print()
+    print(f'Moved {moved} chats!')
+
+
+if __name__ == '__main__':
+    main()
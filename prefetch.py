@@ -0,0 +1,55 @@
+from datetime import timedelta
+from typing import List, Optional
+from bible.bible_gateway import BibleGateway
+from bible.gateway_client import GatewayClient, RateLimiter
+from bible.plan_manager import ReadingTask
+from config.env import PLAN_LEGACY_LOOKUP, PREFETCH_DAYS, PREFETCH_RATE, PREFETCH_WORKERS
+from data import db
+from data.plan_repository import PlanRepository
+from telegram_bot.daily_message_manager import TaskMessageManager
+from telegram_bot.prefetch import prefetch_messages
+from telegram_bot.utils import create_render_cache, get_bible_registry, get_circuit_breaker, get_date_today, \
+    get_page_cache
+
+
+def get_upcoming_tasks(days: int) -> List[ReadingTask]:
+    """Returns the reading tasks from the database for today and the following days.
+
+    Args:
+        days (int): How many days, including today.
+
+    Returns:
+        List[ReadingTask]: The reading tasks, in order of date.
+    """
+    plan_repo = PlanRepository(db, legacy_lookup=PLAN_LEGACY_LOOKUP)
+    today = get_date_today()
+
+    tasks = [plan_repo.get_plan_at(today + timedelta(days=i)) for i in range(days)]
+
+    return [task for task in tasks if task is not None]
+
+
+def main(tasks: Optional[List[ReadingTask]] = None):
+    # Get the upcoming tasks from the database if they are not given
+    if tasks is None:
+        tasks = get_upcoming_tasks(PREFETCH_DAYS)
+
+    registry = get_bible_registry()
+
+    # Fetch politely, with a rate limit shared by all workers
+    client = GatewayClient(rate_limiter=RateLimiter(PREFETCH_RATE))
+    message_manager = TaskMessageManager(
+        gateway=BibleGateway(client=client, cache=get_page_cache(), breaker=get_circuit_breaker()),
+        registry=registry,
+        render_cache=create_render_cache()
+    )
+
+    print(f'Prefetching {len(tasks)} task(s) in {", ".join(registry.versions)}.')
+    result = prefetch_messages(tasks, registry.versions, message_manager,
+                               max_workers=PREFETCH_WORKERS)
+
+    print(f'Prefetch complete: {result}')
+
+
+if __name__ == '__main__':
+    main()
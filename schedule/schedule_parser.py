@@ -1,13 +1,61 @@
+import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import List, Optional, Tuple
 
-from bible.plan_manager import ReadingTask
-from bible.bible import Bible
+from bible.plan_manager import PlanIndex, ReadingTask
+from bible.bible_metadata import BibleMetadata
+
+
+# A passage of a schedule cell, e.g. `17`, `17-18`, `119:1-88` or `3:16-4:5`.
+PASSAGE_PATTERN = re.compile(r'^(\d+)(?::(\d+))?(?:-(\d+)(?::(\d+))?)?$')
+
+# Any dash between the start and the end of a passage, with or without spaces around it.
+DASH_PATTERN = re.compile(r'\s*[-\u2010-\u2015]\s*')
+
+
+def parse_passage(passage: str) -> Tuple[int, int, int, int]:
+    """Parses the passage of a schedule cell. Without verses, the passage is whole chapters.
+
+    Args:
+        passage (str): The passage, e.g. `17`, `17-18`, `119:1-88` or `3:16-4:5`.
+
+    Raises:
+        ValueError: If the passage is not valid.
+
+    Returns:
+        Tuple[int, int, int, int]: The start chapter, start verse, end chapter and end verse.
+    """
+    match = PASSAGE_PATTERN.match(DASH_PATTERN.sub('-', passage.strip()))
+
+    if match is None:
+        raise ValueError(f'Invalid passage {passage}')
+
+    (chapter, verse, end, end_verse) = match.groups()
+    chapter = int(chapter)
+
+    if verse is None:
+        # Whole chapters, e.g. 17 or 17-18
+        end_chapter = chapter if end is None else int(end)
+        return (chapter, 1, end_chapter, 1000)
+
+    verse = int(verse)
+
+    if end is None:
+        # A single verse, e.g. 3:16
+        return (chapter, verse, chapter, verse)
+
+    if end_verse is None:
+        # Verses of a chapter, e.g. 119:1-88
+        return (chapter, verse, chapter, int(end))
+
+    # Across chapters, e.g. 3:16-4:5
+    return (chapter, verse, int(end), int(end_verse))
 
 
 class ScheduleParser:
-    def __init__(self, csv_data: List[List[str]], start_date: datetime, bible: Bible, expected_headers: List[str] = []) -> None:
-        self.schedule = {}
+    def __init__(self, csv_data: List[List[str]], start_date: datetime, bible: BibleMetadata,
+                 expected_headers: List[str] = []) -> None:
+        self.schedule = PlanIndex()
 
         # Validate the header
         if len(expected_headers) != 0:
@@ -28,9 +76,9 @@ class ScheduleParser:
             csv_data[row] = csv_data[row][:7]  # Remove remarks
 
             for col in range(len(csv_data[row])):
-                cell_data = csv_data[row][col].strip()
+                # Join the start and end of a passage range, e.g. John 17 - 18 to John 17-18
+                cell_data = DASH_PATTERN.sub('-', csv_data[row][col].strip())
                 space_index = cell_data.rfind(" ")
-                chapter_no = None
 
                 if cell_data != '':
                     # If a new book is introduced
@@ -38,30 +86,27 @@ class ScheduleParser:
                         book = cell_data[:space_index].strip()
                         book = bible.fuzzy_search_book(book)
                         current_book = book
-                        chapter_no = int(cell_data[space_index+1:])
+                        passage = cell_data[space_index+1:]
                     else:
-                        chapter_no = int(cell_data)
+                        passage = cell_data
+
+                    (chapter, start_verse, end_chapter, end_verse) = parse_passage(passage)
 
                     date = current_date.date()
-                    self.schedule[date] = ReadingTask(
-                        book=current_book, chapter=chapter_no, date=date,
-                        start_verse=1, end_verse=1000)
+                    self.schedule.add(ReadingTask(
+                        book=current_book, chapter=chapter, date=date,
+                        start_verse=start_verse, end_verse=end_verse, end_chapter=end_chapter))
 
                 current_date = current_date + timedelta(days=1)
 
     def get_tasks(self, start_date: datetime, end_date: Optional[datetime] = None) -> List[ReadingTask]:
-        result = []
-        start = start_date.date()
-        end = None if end_date is None else end_date.date()
-
-        for date in self.schedule.keys():
-            task = self.schedule[date]
+        """Returns the tasks from `start_date` to `end_date` (both inclusive), in date order.
 
-            if end is None:
-                if date >= start:
-                    result.append(task)
-            else:
-                if date >= start and date <= end:
-                    result.append(task)
+        Args:
+            start_date (datetime): The first date.
+            end_date (datetime, optional): The last date. Defaults to the last task.
 
-        return result
+        Returns:
+            List[ReadingTask]: The tasks.
+        """
+        return self.schedule.get_tasks(start_date, end_date)
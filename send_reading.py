@@ -1,51 +1,71 @@
+import time
 import telegram
 from data import db
 from data.subscriber_repository import SubscriptionItem
 from config.env import TOKEN, DISCORD_BOT_TOKEN
 from telegram_bot.message import split_html_message
-from telegram_bot.utils import get_message_for_today, get_subscribers_chat_ids
+from telegram_bot.utils import get_bible_registry, get_circuit_report, get_message_for_task, \
+    get_today_reading_plan, iter_subscribers
 from discord_bot import ReportBot
 
 
+# Seconds that getting today's plan, and rendering each version's message, may take.
+PLAN_TIMEOUT = 10
+MESSAGE_TIMEOUT = 30
+
+
 def report_to_discord(success: bool, message: str):
+    # Show when Bible Gateway was failing, so that degraded days can be seen
+    circuit_report = get_circuit_report()
+    if circuit_report is not None:
+        message = f'{message}\n\n{circuit_report}'
+
     bot = ReportBot(success=success, message=message)
     bot.run(DISCORD_BOT_TOKEN)
 
 
 def main():
-    # Get today's message
-    telegram_message = get_message_for_today(db)
+    # Get today's task
+    task_today = get_today_reading_plan(db, deadline=time.monotonic() + PLAN_TIMEOUT)
 
-    if telegram_message is None:
+    if task_today is None:
         print('No reading task for today.')
         report_to_discord(True, 'No reading task.')
         return
 
-    # Get all subscribers
-    subscribers = get_subscribers_chat_ids(
-        SubscriptionItem.PULSE_BIBLE_READING_PLAN)
-
-    # Exit if there are no subscribers
-    if len(subscribers) == 0:
-        print('No subscribers to send')
-        return
-
     # Get access to the bot
     bot = telegram.Bot(token=TOKEN)
+    registry = get_bible_registry()
+
+    # The message parts of each Bible version, rendered once for everyone reading the version
+    message_parts_by_version = {}
+    subscriber_count = 0
 
-    # Send the message to all subscribers
-    message_parts = split_html_message(telegram_message)
     try:
-        for chat_id in subscribers:
-            for part in message_parts:
+        # Send as the subscribers are read, a page at a time
+        for subscriber in iter_subscribers(SubscriptionItem.PULSE_BIBLE_READING_PLAN):
+            version = registry.normalize_version(subscriber.version)
+
+            if version not in message_parts_by_version:
+                telegram_message = get_message_for_task(
+                    task_today, version=version, deadline=time.monotonic() + MESSAGE_TIMEOUT)
+                message_parts_by_version[version] = split_html_message(telegram_message)
+
+            for part in message_parts_by_version[version]:
                 bot.send_message(
-                    chat_id=chat_id,
+                    chat_id=subscriber.chat_id,
                     text=part,
                     parse_mode=telegram.ParseMode.HTML
                 )
 
+            subscriber_count += 1
+
+        if subscriber_count == 0:
+            print('No subscribers to send')
+            return
+
         print(
-            f'Successfully sent messages to {len(subscribers)} subscriber(s)')
+            f'Successfully sent messages to {subscriber_count} subscriber(s)')
         report_to_discord(True, "Reading task successfully sent.")
     except Exception as e:
         report_to_discord(False, f"Error in sending reading task: {e}")
@@ -4,7 +4,7 @@ from data.subscriber_repository import SubscriptionItem
 from eventbrite import get_next_jcc_service
 from config.env import TOKEN
 from telegram_bot.const import build_service_reminder_message
-from telegram_bot.utils import get_subscribers_chat_ids
+from telegram_bot.utils import iter_subscribers
 
 
 def is_saturday(datetime: datetime) -> bool:
@@ -25,26 +25,26 @@ def main():
     else:
         message = build_service_reminder_message(event.url)
 
-    # Get all subscribers
-    subscribers = get_subscribers_chat_ids(SubscriptionItem.SUNDAY_SERVICE)
-
-    # Exit if there are no subscribers
-    if len(subscribers) == 0:
-        print('No subscribers to send')
-        return
-
     # Get access to the bot
     bot = telegram.Bot(token=TOKEN)
+    subscriber_count = 0
 
-    # Send the message to all subscribers
-    for chat_id in subscribers:
+    # Send the message to all subscribers, as they are read a page at a time
+    for subscriber in iter_subscribers(SubscriptionItem.SUNDAY_SERVICE):
         bot.send_message(
-            chat_id=chat_id,
+            chat_id=subscriber.chat_id,
             text=message,
             parse_mode=telegram.ParseMode.HTML
         )
 
-    print(f'Successfully sent messages to {len(subscribers)} subscriber(s)')
+        subscriber_count += 1
+
+    # Exit if there are no subscribers
+    if subscriber_count == 0:
+        print('No subscribers to send')
+        return
+
+    print(f'Successfully sent messages to {subscriber_count} subscriber(s)')
 
 
 if __name__ == "__main__":
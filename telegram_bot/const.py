@@ -1,4 +1,5 @@
-from typing import Optional
+from html import escape
+from typing import List, Optional, Tuple
 from data.subscriber_repository import Subscriber, SubscriptionItem
 from eventbrite import FALLBACK_URL
 from config.env import BASE_URL, PORT
@@ -85,6 +86,65 @@ def build_start_message(subscriber: Subscriber, authorized: bool) -> str:
     return '\n'.join(lines)
 
 
+# ------------------------ Today
+# Seconds that `/today` may take to get today's plan.
+TODAY_TIMEOUT = 2
+
+# Seconds that `/today` may take to fetch the passage from Bible Gateway, after it has replied with
+# the local Bible. The reply is then edited in place.
+TODAY_ENRICH_TIMEOUT = 20
+
+LABEL_NO_READING_TODAY = 'There is no reading plan for today.'
+LABEL_READING_TODAY_UNAVAILABLE = "Today's reading plan could not be loaded. Please try /today again."
+
+
+# ------------------------ Bible Version
+LABEL_VERSION_STATUS = '''This chat reads the Bible in <b>{}</b>.
+
+Available versions: {}
+Change it with /version &lt;version&gt;, for example /version {}.'''
+LABEL_VERSION_CHANGED = 'This chat now reads the Bible in <b>{}</b>.'
+LABEL_VERSION_UNKNOWN = '<b>{}</b> is not available. Available versions: {}'
+
+
+def build_version_status_message(current: str, versions: List[str]) -> str:
+    return LABEL_VERSION_STATUS.format(current, ', '.join(versions), versions[-1])
+
+
+def build_version_unknown_message(version: str, versions: List[str]) -> str:
+    return LABEL_VERSION_UNKNOWN.format(version, ', '.join(versions))
+
+
+# ------------------------ Search
+SEARCH_RESULT_LIMIT = 10
+SEARCH_SNIPPET_LENGTH = 80
+
+LABEL_SEARCH_USAGE = '''Search the Bible with /search &lt;words&gt;, for example /search living water.
+Put words in double quotes to search for the exact phrase, for example /search "living water".'''
+LABEL_SEARCH_UNAVAILABLE = 'Search is not available right now.'
+LABEL_SEARCH_NO_RESULT = 'No verse has all of <b>{}</b>.'
+LABEL_SEARCH_RESULT = '''🔎 Verses with <b>{}</b>
+
+{}'''
+
+
+def build_search_result_message(query: str, results: List[Tuple[str, str]]) -> str:
+    """Builds the reply to a search. Each result is a verse reference and the start of the verse."""
+    query = escape(query)
+
+    if len(results) == 0:
+        return LABEL_SEARCH_NO_RESULT.format(query)
+
+    lines = []
+    for reference, verse in results:
+        if len(verse) > SEARCH_SNIPPET_LENGTH:
+            verse = verse[:SEARCH_SNIPPET_LENGTH].rsplit(' ', 1)[0] + '…'
+
+        lines.append(f'• <b>{escape(reference)}</b> {escape(verse)}')
+
+    return LABEL_SEARCH_RESULT.format(query, '\n'.join(lines))
+
+
 # ------------------------ Service Reminder
 _SERVICE_REMINDER_MESSAGE_TEMPLATE = '''⏰ Gentle reminder to register for this week\'s service!
 
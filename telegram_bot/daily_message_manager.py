@@ -1,19 +1,29 @@
 from datetime import date, datetime
+import time
 from time import strftime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from bible.bible import Bible
+from bible.bible_metadata import BibleMetadata
+from bible.bible_registry import DEFAULT_VERSION, BibleRegistry
 from bible.bible_gateway import BibleGateway, BibleGatewayParser
+from bible.gateway_client import DeadlineExceeded
 from bible.plan_manager import ReadingTask
-from bible.utils import get_superscript
+from bible.utils import get_book_title, get_footnote_letter, get_superscript
+from telegram_bot.render_cache import RenderCache
 
+# The version of how messages are rendered. Bump it when the rendering changes, so that messages
+# rendered before are not used from the persistent cache.
+RENDERER_VERSION = 3
 
-def _beautify_verses(verses: List[str], separator: str = '\n') -> str:
+
+def _beautify_verses(verses: List[str], separator: str = '\n', start: int = 1) -> str:
     """Formats the Bible verses. This adds the verse number before the verse, and then separate
     the verses using the separator.
 
     Args:
         verses (List[str]): The Bible verses.
         separator (str, optional): The separator between verses. Defaults to '\n'.
+        start (int, optional): The number of the first verse. Defaults to 1.
 
     Returns:
         str: The neatly formatted Bible verses.
@@ -22,7 +32,7 @@ def _beautify_verses(verses: List[str], separator: str = '\n') -> str:
 
     # Add the verse numbers to each verse.
     for i in range(0, len(verses)):
-        verse_no = get_superscript(i + 1)
+        verse_no = get_superscript(start + i)
 
         result[i] = f"{verse_no} {verses[i]}"
 
@@ -30,11 +40,35 @@ def _beautify_verses(verses: List[str], separator: str = '\n') -> str:
     return separator.join(result)
 
 
+def _format_chapter_title(book: str, chapter: int) -> str:
+    return f'<u><b>{get_book_title(book)} {chapter}</b></u>'
+
+
+def _join_chapters(book: str, chapters: List[Tuple[int, str]], separator: str = '\n\n') -> str:
+    """Joins the verses of several chapters, each after its title.
+
+    Args:
+        book (str): The book name.
+        chapters (List[Tuple[int, str]]): The chapter number and verses of every chapter.
+        separator (str, optional): The separator between titles and chapters. Defaults to '\\n\\n'.
+
+    Returns:
+        str: The chapters.
+    """
+    sections = []
+
+    for (chapter, verses) in chapters:
+        sections.append(_format_chapter_title(book, chapter))
+        sections.append(verses)
+
+    return separator.join(sections)
+
+
 def _format_footnotes(footnotes: List[Tuple[str, str]]) -> str:
     result = []
 
     for i in range(len(footnotes)):
-        alphabet = chr(ord('a') + i)
+        alphabet = get_footnote_letter(i)
 
         (verse, footnote) = footnotes[i]
         result.append(f'{alphabet}. {verse} - {footnote}')
@@ -58,69 +92,228 @@ def _format_verse_footnote(verses: str, footnotes: List[Tuple[str, str]]) -> str
 
 class TaskMessageManager:
     def __init__(self,
-                 bible: Bible = Bible(),
-                 gateway: BibleGateway = BibleGateway()) -> None:
-        self.bible = bible
-        self.gateway = gateway
+                 bible: Optional[Bible] = None,
+                 gateway: Optional[BibleGateway] = None,
+                 metadata: Optional[BibleMetadata] = None,
+                 registry: Optional[BibleRegistry] = None,
+                 render_cache: Optional[RenderCache] = None) -> None:
+        """
+        Args:
+            bible (Bible, optional): The local Bible of the default version. Loaded from the
+                registry when needed if not given.
+            gateway (BibleGateway, optional): The Bible Gateway client.
+            metadata (BibleMetadata, optional): The metadata shared by all versions. Loaded from
+                the registry when needed if not given.
+            registry (BibleRegistry, optional): The available Bible versions. Defaults to only the
+                default version.
+            render_cache (RenderCache, optional): The messages rendered from Bible Gateway.
+                Defaults to an in-memory cache.
+        """
+        if registry is None:
+            if metadata is None and bible is not None:
+                metadata = bible.metadata
+
+            registry = BibleRegistry(metadata=metadata)
 
-    def _get_data_from_bible_gateway(self, task: ReadingTask) -> Tuple[str, List[Tuple[str, str]]]:
+        if bible is not None:
+            registry.register(registry.default_version, bible)
+
+        self.registry = registry
+        self.gateway = BibleGateway() if gateway is None else gateway
+
+        # Messages rendered from Bible Gateway, so that every chat reading the same passage in the
+        # same version shares one fetch and render.
+        self.render_cache = RenderCache() if render_cache is None else render_cache
+
+    @property
+    def metadata(self) -> BibleMetadata:
+        """The books, chapter and verse counts of the local Bible. This is all that is needed to
+        fetch from Bible Gateway, so it is loaded without the Bible text.
+        """
+        return self.registry.metadata
+
+    @property
+    def bible(self) -> Bible:
+        """The local Bible of the default version. It is only loaded when the fallback is needed,
+        not when the module is imported.
+        """
+        return self.registry.get(self.registry.default_version)
+
+    def _resolve_task(self, task: ReadingTask) -> Tuple[str, int, int, int, int]:
+        """Returns the book name, start chapter, valid start verse, end chapter and valid end verse
+        of the task.
+        """
         # Get the book name
-        book = self.bible.fuzzy_search_book(task.book)
+        book = self.metadata.fuzzy_search_book(task.book)
 
-        # Get the chapter number
+        # Get the chapter numbers, up to the last chapter of the book
         chapter = task.chapter
+        end_chapter = max(chapter, min(task.end_chapter, self.metadata.chapter_count(book)))
 
         # Get the verse range
-        (start, end) = self.bible.get_verse_range(
-            book, chapter,
-            task.start_verse, task.end_verse
-        )
+        if end_chapter == chapter:
+            (start, end) = self.metadata.get_verse_range(
+                book, chapter,
+                task.start_verse, task.end_verse
+            )
+        else:
+            (start, _) = self.metadata.get_verse_range(book, chapter, task.start_verse, 1)
+            (_, end) = self.metadata.get_verse_range(book, end_chapter, 1, task.end_verse)
 
-        # Call bible gateway to get the html source
-        raw = self.gateway.get_html(book, chapter)
+        return (book, chapter, start, end_chapter, end)
+
+    def _get_data_from_bible_gateway(self, task: ReadingTask, version: str = DEFAULT_VERSION,
+                                     deadline: Optional[float] = None) -> Tuple[str, List[Tuple[str, str]]]:
+        (book, chapter, start, end_chapter, end) = self._resolve_task(task)
+
+        # Call bible gateway to get the html source, once for all the chapters
+        raw = self.gateway.get_html(book, chapter, version, deadline=deadline,
+                                    end_chapter=end_chapter)
+
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded('No time left to parse the Bible Gateway page')
 
         # Parse the HTML source
         parser = BibleGatewayParser(raw)
 
-        # Get the verses
-        verses = parser.extract_verses(from_verse=start, to_verse=end)
-
-        # Get the footnotes
-        footnotes = parser.get_footnotes()
+        # Get the verses, with only their footnotes
+        if end_chapter == chapter:
+            (verses, footnotes) = parser.extract_verses_with_footnotes(
+                from_verse=start, to_verse=end)
+        else:
+            # Split the page back into chapters, continuing the footnote letters
+            chapters = []
+            footnotes = []
+
+            for current in range(chapter, end_chapter + 1):
+                (chapter_verses, chapter_footnotes) = parser.extract_verses_with_footnotes(
+                    from_verse=start if current == chapter else 1,
+                    to_verse=end if current == end_chapter else -1,
+                    chapter=current,
+                    first_footnote=len(footnotes))
+                chapters.append((current, chapter_verses))
+                footnotes.extend(chapter_footnotes)
+
+            verses = _join_chapters(book, chapters)
 
         return (verses, footnotes)
 
-    def _get_verses_from_fallback(self, task: ReadingTask) -> str:
+    def _get_verses_from_fallback(self, task: ReadingTask, version: str = DEFAULT_VERSION) -> str:
         """Returns the Bible verses from a `ReadingTask` object.
 
         Args:
-            bible (Bible): The Bible.
             task_today (ReadingTask): The reading task for today.
+            version (str, optional): The Bible version. Versions without a local text use the
+                default version instead.
 
         Returns:
             List[str]: The Bible verses.
         """
-        # Get verses for today from local bible.
-        today_verses = self.bible.get_verses_from_chapter(
-            task.book,
-            task.chapter,
-            task.start_verse,
-            task.end_verse
-        )
-
-        # Format the verses nicely
-        return _beautify_verses(today_verses)
-
-    def get_task_message(self, task: ReadingTask) -> str:
+        bible = self.registry.get(version)
+
+        if task.end_chapter == task.chapter:
+            # Get verses for today from local bible.
+            today_verses = bible.get_verses_from_chapter(
+                task.book,
+                task.chapter,
+                task.start_verse,
+                task.end_verse
+            )
+
+            # Format the verses nicely, numbered from the first verse of the passage
+            return _beautify_verses(today_verses, start=max(task.start_verse, 1))
+
+        (book, chapter, start, end_chapter, end) = self._resolve_task(task)
+
+        chapters = []
+
+        for current in range(chapter, end_chapter + 1):
+            from_verse = start if current == chapter else 1
+            to_verse = end if current == end_chapter else self.metadata.verse_count(book, current)
+            verses = bible.get_verses_from_chapter(book, current, from_verse, to_verse)
+
+            chapters.append((current, _beautify_verses(verses, start=from_verse)))
+
+        return _join_chapters(book, chapters)
+
+    def _get_render_key(self, task: ReadingTask, version: str) -> tuple:
+        return (*self._resolve_task(task), version, RENDERER_VERSION)
+
+    def get_cached_message(self, task: ReadingTask, version: Optional[str] = None) -> Optional[str]:
+        """Returns the message body for the task rendered from Bible Gateway if it is cached in this
+        process or on its disk, or None if it is not. Nothing is fetched, and the shared tier is not
+        read, so this never waits on the network.
+        """
+        version = self.registry.normalize_version(version)
+
+        try:
+            return self.render_cache.get(self._get_render_key(task, version), shared=False)
+        except Exception as e:
+            print(f'Failed to look up the rendered message for task: {task}, {e}')
+            return None
+
+    def get_local_message(self, task: ReadingTask, version: Optional[str] = None) -> str:
+        """Returns the message body for the task from the local Bible, without footnotes."""
+        version = self.registry.normalize_version(version)
+        verses = self._get_verses_from_fallback(task, version)
+
+        return _format_verse_footnote(verses=verses, footnotes=None)
+
+    def get_gateway_message(self, task: ReadingTask, version: Optional[str] = None,
+                            deadline: Optional[float] = None) -> str:
+        """Returns the message body for the task rendered from Bible Gateway. Rendered bodies are
+        cached, so this also warms the cache for `get_task_message`.
+
+        Args:
+            task (ReadingTask): The reading task.
+            version (str, optional): The Bible version. Defaults to the registry's default version.
+            deadline (float, optional): The `time.monotonic()` by which the body must be rendered.
+                Defaults to the Bible Gateway client's total timeout.
+
+        Raises:
+            DeadlineExceeded: If the passage cannot be fetched and parsed before the deadline.
+            Exception: If the passage cannot be fetched from Bible Gateway.
+
+        Returns:
+            str: The message body.
+        """
+        version = self.registry.normalize_version(version)
+        key = self._get_render_key(task, version)
+
+        rendered = self.render_cache.get(key, deadline=deadline)
+        if rendered is not None:
+            return rendered
+
+        (verses, footnotes) = self._get_data_from_bible_gateway(task, version, deadline)
+
+        rendered = _format_verse_footnote(verses=verses, footnotes=footnotes)
+        self.render_cache.put(key, rendered)
+
+        return rendered
+
+    def get_task_message(self, task: ReadingTask, version: Optional[str] = None,
+                         deadline: Optional[float] = None) -> str:
+        """Returns the message body for the task, with the verses and footnotes. The local Bible is
+        used if Bible Gateway fails, or if it cannot be fetched and parsed before the deadline.
+
+        Args:
+            task (ReadingTask): The reading task.
+            version (str, optional): The Bible version. Defaults to the registry's default version.
+            deadline (float, optional): The `time.monotonic()` by which the body must be rendered.
+                Defaults to the Bible Gateway client's total timeout.
+
+        Returns:
+            str: The message body.
+        """
+        version = self.registry.normalize_version(version)
+
         try:
             # Try to fetch from bible gateway first.
-            (verses, footnotes) = self._get_data_from_bible_gateway(task)
+            return self.get_gateway_message(task, version, deadline)
         except Exception as e:
             # If failed to fetch from bible gateway, use local Bible data.
             print(f'Failed to fetch BibleGateway for task: {task}, {e}')
             print('Using fallback instead')
 
-            verses = self._get_verses_from_fallback(task)
-            footnotes = None
-
-        return _format_verse_footnote(verses=verses, footnotes=footnotes)
+            # The fallback is not remembered, so Bible Gateway is retried on the next call.
+            return self.get_local_message(task, version)
@@ -1,13 +1,30 @@
 import json
+import time
+from typing import List, Optional
 from telegram.constants import PARSEMODE_HTML
 from data import db
 from data.subscriber_repository import SubscriptionItem
 from eventbrite import get_next_jcc_service
-from telegram_bot.const import CALLBACK_DATA_CANCEL, HELP_MESSAGE, LABEL_CANCEL_OPERATION, build_service_reminder_message, build_subscription_change_message
-from telegram import Update
+from telegram_bot.const import (
+    CALLBACK_DATA_CANCEL, HELP_MESSAGE, LABEL_CANCEL_OPERATION, LABEL_NO_READING_TODAY,
+    LABEL_READING_TODAY_UNAVAILABLE, LABEL_SEARCH_UNAVAILABLE, LABEL_SEARCH_USAGE, LABEL_VERSION_CHANGED, SEARCH_RESULT_LIMIT,
+    TODAY_ENRICH_TIMEOUT, TODAY_TIMEOUT,
+    build_search_result_message, build_service_reminder_message,
+    build_subscription_change_message, build_version_status_message,
+    build_version_unknown_message,
+)
+from telegram import Chat, Message, Update
 from telegram.ext import CallbackContext
-from telegram_bot.handler_utils import toggle_subscription, is_sender_authorized, reply_authorized_start, reply_unauthorized_start
-from telegram_bot.utils import get_message_for_today
+from telegram_bot.handler_utils import (
+    get_chat_version, get_command_args, set_chat_version, toggle_subscription,
+    is_sender_authorized, reply_authorized_start, reply_unauthorized_start,
+)
+from telegram_bot.message import edit_html_message, send_html_message
+from telegram_bot.utils import get_bible_registry, get_gateway_message_for_task, get_quick_message_for_task, \
+    get_search_index, get_today_reading_plan
+from bible.plan_manager import ReadingTask
+from bible.utils import get_book_title
+from google.api_core.exceptions import GoogleAPICallError, RetryError
 from google.cloud import firestore
 
 
@@ -28,21 +45,57 @@ def on_command_start(update: Update, _: CallbackContext):
         reply_unauthorized_start(chat_id, update)
 
 
-def on_command_today(update: Update, _: CallbackContext):
-    """Callback when the user calls `/today` command.
+def enrich_today_message(chat: Chat, messages: List[Message], task: ReadingTask,
+                         version: Optional[str]):
+    """Replaces the `/today` reply from the local Bible with the passage from Bible Gateway, which
+    has the headings and footnotes. The reply is kept if Bible Gateway fails.
+
+    Args:
+        chat (Chat): The chat.
+        messages (List[Message]): The reply, one message for each part.
+        task (ReadingTask): Today's reading task.
+        version (str, optional): The chat's Bible version.
+    """
+    try:
+        message = get_gateway_message_for_task(
+            task, version=version, deadline=time.monotonic() + TODAY_ENRICH_TIMEOUT)
+    except Exception as e:
+        print(f'Keeping the local Bible for task: {task}, {e}')
+        return
+
+    edit_html_message(chat, messages, message)
+
+
+def on_command_today(update: Update, context: CallbackContext):
+    """Callback when the user calls `/today` command. It replies right away, from the local Bible
+    if Bible Gateway is not cached, and then edits the reply with the passage from Bible Gateway.
 
     Args:
         update (Update): The update object
-        _ (CallbackContext): The context object.
+        context (CallbackContext): The context object.
     """
     if is_sender_authorized(update.effective_chat, update.effective_user):
-        todays_content = get_message_for_today(db)
+        chat = update.effective_chat
+        version = get_chat_version(chat.id)
+
+        try:
+            task_today = get_today_reading_plan(db, deadline=time.monotonic() + TODAY_TIMEOUT)
+        except (GoogleAPICallError, RetryError) as e:
+            # E.g. the plan could not be read before the timeout
+            print(f"Failed to get today's reading plan: {e}")
+            chat.send_message(LABEL_READING_TODAY_UNAVAILABLE)
+            return
 
-        for i in range(0, len(todays_content), 4000):
-            update.effective_chat.send_message(
-                text=todays_content[i:i+4000],
-                parse_mode=PARSEMODE_HTML
-            )
+        if task_today is None:
+            chat.send_message(LABEL_NO_READING_TODAY)
+            return
+
+        (todays_content, from_gateway) = get_quick_message_for_task(task_today, version=version)
+        messages = send_html_message(chat, todays_content)
+
+        if not from_gateway:
+            context.dispatcher.run_async(
+                enrich_today_message, chat, messages, task_today, version)
 
 
 def on_command_service(update: Update, _: CallbackContext):
@@ -60,6 +113,74 @@ def on_command_service(update: Update, _: CallbackContext):
         )
 
 
+def on_command_version(update: Update, _: CallbackContext):
+    """Callback when the user calls `/version` command. Without argument, it shows the chat's
+    Bible version. Otherwise, it changes the chat's Bible version, e.g. `/version ESV`.
+
+    Args:
+        update (Update): The update object
+        _ (CallbackContext): The context object.
+    """
+    if not is_sender_authorized(update.effective_chat, update.effective_user):
+        return
+
+    chat_id = update.effective_chat.id
+    registry = get_bible_registry()
+    args = get_command_args(update)
+
+    if len(args) == 0:
+        current = registry.normalize_version(get_chat_version(chat_id))
+        message = build_version_status_message(current, registry.versions)
+    elif args[0].upper() not in registry.versions:
+        message = build_version_unknown_message(args[0], registry.versions)
+    else:
+        version = args[0].upper()
+        set_chat_version(chat_id, version)
+        message = LABEL_VERSION_CHANGED.format(version)
+
+    update.effective_chat.send_message(
+        message,
+        parse_mode=PARSEMODE_HTML,
+    )
+
+
+def on_command_search(update: Update, _: CallbackContext):
+    """Callback when the user calls `/search` command, e.g. `/search living water`. It replies with
+    the verses that have all the words, best match first.
+
+    Args:
+        update (Update): The update object
+        _ (CallbackContext): The context object.
+    """
+    if not is_sender_authorized(update.effective_chat, update.effective_user):
+        return
+
+    query = ' '.join(get_command_args(update))
+    search_index = get_search_index()
+
+    if len(query) == 0:
+        message = LABEL_SEARCH_USAGE
+    elif search_index is None:
+        message = LABEL_SEARCH_UNAVAILABLE
+    else:
+        # Show the start of each verse from the default version, which the index was built from.
+        bible = get_bible_registry().get(get_bible_registry().default_version)
+        results = []
+
+        for result in search_index.search(query, limit=SEARCH_RESULT_LIMIT):
+            verse = bible.text.get_verses(result.book, result.chapter,
+                                          result.verse, result.verse)
+            reference = f'{get_book_title(result.book)} {result.chapter}:{result.verse}'
+            results.append((reference, ''.join(verse)))
+
+        message = build_search_result_message(query, results)
+
+    update.effective_chat.send_message(
+        message,
+        parse_mode=PARSEMODE_HTML,
+    )
+
+
 def on_command_help(update: Update, _: CallbackContext):
     if not is_sender_authorized(update.effective_chat, update.effective_user):
         return
@@ -74,6 +195,8 @@ commands = {
     'start': on_command_start,
     'today': on_command_today,
     'service': on_command_service,
+    'version': on_command_version,
+    'search': on_command_search,
     'help': on_command_help,
 }
 """Commands and the corresponding callback function."""
@@ -84,8 +207,8 @@ def on_message(update: Update, callback: CallbackContext):
 
     # Message must start with slash
     if text[0] == '/':
-        # Drop the slash for matching to command
-        text = text[1:]
+        # Drop the slash, the arguments, and the bot username (e.g. /today@bot) for matching to command
+        text = text[1:].split()[0].split('@')[0]
     else:
         return
 
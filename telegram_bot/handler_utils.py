@@ -5,21 +5,55 @@ from telegram.inline.inlinekeyboardbutton import InlineKeyboardButton
 from telegram.inline.inlinekeyboardmarkup import InlineKeyboardMarkup
 from telegram.user import User
 from telegram_bot.const import BUTTON_CANCEL, CALLBACK_DATA_CANCEL, build_button_label, build_start_message
+from telegram_bot.subscriber_cache import SubscriberCache
+from config.env import SUBSCRIBER_CACHE_SIZE, SUBSCRIBER_LEGACY_LOOKUP
 from data import db
 from data.subscriber_repository import Subscriber, SubscriberRepository, SubscriptionItem
 from telegram import Update
+from typing import List, Optional
 import json
 
-repo = SubscriberRepository(db)
+repo = SubscriberRepository(db, legacy_lookup=SUBSCRIBER_LEGACY_LOOKUP)
+
+# Only used once `start_subscriber_cache` is called, by the long-running bot.
+subscriber_cache = SubscriberCache(repo, max_entries=SUBSCRIBER_CACHE_SIZE)
+
+
+def start_subscriber_cache():
+    """Keeps the subscribers in memory, up to date with the changes in Firestore."""
+    subscriber_cache.start()
 
 
 def toggle_subscription(id: str, item: SubscriptionItem) -> bool:
-    updated = repo.toggle_subscription(id, item)
-    return updated.is_subscribed_to(item)
+    subscribed = repo.toggle_subscription(id, item)
+
+    # Read the change back at once, rather than when the listener receives it.
+    subscriber_cache.invalidate(id)
+
+    return subscribed
+
+
+def get_chat_version(chat_id: str) -> Optional[str]:
+    """Returns the Bible version picked by the chat, or None if it has not picked one."""
+    subscriber = subscriber_cache.get(chat_id)
+    return None if subscriber is None else subscriber.version
+
+
+def set_chat_version(chat_id: str, version: str):
+    repo.set_version(chat_id, version)
+    subscriber_cache.invalidate(chat_id)
+
+
+def get_command_args(update: Update) -> List[str]:
+    """Returns the words after the command, e.g. `['ESV']` for `/version ESV`. This works for both
+    commands and channel posts, which are handled as plain messages.
+    """
+    text = update.effective_message.text or ''
+    return text.split()[1:]
 
 
 def reply_unauthorized_start(chat_id: str, update: Update):
-    subscriber = repo.get(chat_id)
+    subscriber = subscriber_cache.get(chat_id)
     if subscriber is None:
         subscriber = Subscriber(id='', chat_id=chat_id, sub_items=set())
 
@@ -33,7 +67,7 @@ def reply_unauthorized_start(chat_id: str, update: Update):
 
 def reply_authorized_start(chat_id: str, update: Update):
     # Get subscriber data for the chat
-    subscriber = repo.get(chat_id)
+    subscriber = subscriber_cache.get(chat_id)
     if subscriber is None:
         subscriber = Subscriber(id='', chat_id=chat_id, sub_items=set())
 
@@ -1,5 +1,8 @@
 from typing import List
 import re
+from telegram import Chat, Message
+from telegram.constants import PARSEMODE_HTML
+from telegram.error import BadRequest
 
 VERSE_NO_PATTERN = r'<b>[¹²³⁴⁵⁶⁷⁸⁹⁰][¹²³⁴⁵⁶⁷⁸⁹⁰]{0,2}</b>'
 FOOTNOTE_HEADER_PATTERN = r'📝 <b>Footnotes</b>'
@@ -44,14 +47,35 @@ def split_to_parts(message: str) -> List[str]:
     return split_by_indexes(message, indexes)
 
 
+def split_long_part(part: str, length: int) -> List[str]:
+    """Splits a part that is longer than the length, at the last line break before the length if
+    any, e.g. between the verses of the local Bible, which have no bold verse numbers.
+    """
+    result = []
+
+    while len(part) > length:
+        index = part.rfind('\n', 0, length) + 1
+        if index == 0:
+            index = length
+
+        result.append(part[:index])
+        part = part[index:]
+
+    result.append(part)
+
+    return result
+
+
 def split_html_message(message: str, length: int = 4000) -> List[str]:
-    parts = split_to_parts(message)
+    parts = []
+    for part in split_to_parts(message):
+        parts.extend(split_long_part(part, length))
 
     result = []
     msg = ''
 
     for part in parts:
-        if len(msg) + len(part) > length:
+        if len(msg) + len(part) > length and len(msg) > 0:
             result.append(msg)
             msg = ''
 
@@ -61,3 +85,51 @@ def split_html_message(message: str, length: int = 4000) -> List[str]:
         result.append(msg)
 
     return result
+
+
+def send_html_message(chat: Chat, message: str) -> List[Message]:
+    """Sends the message to the chat, split into parts that fit in a telegram message.
+
+    Returns:
+        List[Message]: The sent messages, one for each part.
+    """
+    return [chat.send_message(text=part, parse_mode=PARSEMODE_HTML)
+            for part in split_html_message(message)]
+
+
+def edit_html_message(chat: Chat, messages: List[Message], message: str) -> List[Message]:
+    """Replaces the sent messages with the new message, split the same way as `send_html_message`.
+    The sent messages are edited in order, more are sent if the new message has more parts, and the
+    extra ones are deleted if it has fewer.
+
+    Args:
+        chat (Chat): The chat the messages were sent to.
+        messages (List[Message]): The sent messages, one for each part.
+        message (str): The new message.
+
+    Returns:
+        List[Message]: The messages for the new message, one for each part.
+    """
+    parts = split_html_message(message)
+    result = []
+
+    for i, part in enumerate(parts):
+        if i >= len(messages):
+            result.append(chat.send_message(text=part, parse_mode=PARSEMODE_HTML))
+            continue
+
+        try:
+            edited = messages[i].edit_text(text=part, parse_mode=PARSEMODE_HTML)
+        except BadRequest as e:
+            # The part did not change
+            if 'not modified' not in str(e):
+                raise
+
+            edited = messages[i]
+
+        result.append(edited if isinstance(edited, Message) else messages[i])
+
+    for extra in messages[len(parts):]:
+        extra.delete()
+
+    return result
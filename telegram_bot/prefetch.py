@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+from bible.plan_manager import ReadingTask
+from telegram_bot.daily_message_manager import TaskMessageManager
+
+# How many passages are fetched at the same time.
+DEFAULT_MAX_WORKERS = 4
+
+
+class PrefetchResult:
+    def __init__(self) -> None:
+        # The task and version of every passage that was rendered and cached.
+        self.succeeded: List[Tuple[ReadingTask, str]] = []
+
+        # The task, version and error of every passage that could not be fetched.
+        self.failed: List[Tuple[ReadingTask, str, Exception]] = []
+
+    def __str__(self) -> str:
+        return f'{len(self.succeeded)} passage(s) cached, {len(self.failed)} failed'
+
+
+def prefetch_messages(tasks: Iterable[ReadingTask],
+                      versions: Iterable[str],
+                      message_manager: TaskMessageManager,
+                      max_workers: int = DEFAULT_MAX_WORKERS) -> PrefetchResult:
+    """Fetches, parses and renders the passages of the tasks in every version concurrently, so that
+    they are in the message manager's caches when they are sent.
+
+    Args:
+        tasks (Iterable[ReadingTask]): The reading tasks.
+        versions (Iterable[str]): The Bible versions.
+        message_manager (TaskMessageManager): The task message manager whose caches are warmed.
+            Its Bible Gateway client should be rate limited.
+        max_workers (int, optional): How many passages are fetched at the same time. Defaults to 4.
+
+    Returns:
+        PrefetchResult: Which passages were cached and which failed.
+    """
+    jobs = [(task, version) for task in tasks for version in versions]
+    result = PrefetchResult()
+
+    def prefetch(job: Tuple[ReadingTask, str]):
+        (task, version) = job
+
+        try:
+            message_manager.get_gateway_message(task, version)
+            return None
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (task, version), error in zip(jobs, executor.map(prefetch, jobs)):
+            if error is None:
+                result.succeeded.append((task, version))
+            else:
+                print(f'Failed to prefetch {task} in {version}: {error}')
+                result.failed.append((task, version, error))
+
+    return result
@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional, Tuple
+from bible.page_cache import PageCache
+
+# How many rendered messages are kept in memory.
+DEFAULT_MAX_ENTRIES = 256
+
+# How long a rendered message is used, in seconds.
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class RenderCache:
+    """Rendered message bodies, keyed by a tuple such as (book, chapter, start, end, version,
+    renderer version). The most recently used bodies are kept in memory, and every body is also
+    kept in an optional `PageCache`, so that it survives a restart of the process, and in an
+    optional shared tier, so that every process can use it, e.g. a `RenderedMessageRepository`.
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl: float = DEFAULT_TTL,
+                 store: Optional[PageCache] = None,
+                 shared=None,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        Args:
+            max_entries (int, optional): How many bodies are kept in memory. Defaults to 256.
+            ttl (float, optional): Seconds a body is used after it is rendered. Defaults to a day.
+            store (PageCache, optional): The persistent tier. Defaults to memory only.
+            shared (RenderedMessageRepository, optional): The tier shared by every process, read
+                after the persistent tier. It is only a cache, so its failures are logged and
+                ignored. Defaults to none.
+            clock (Callable[[], float], optional): Returns the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.shared = shared
+        self._clock = clock
+
+        self._entries: 'OrderedDict[Tuple, Tuple[float, str]]' = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _store_key(key: Tuple) -> str:
+        return 'rendered\n' + '\n'.join(str(part) for part in key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple, shared: bool = True,
+            deadline: Optional[float] = None) -> Optional[str]:
+        """Returns the rendered body, or None if it is not cached or has expired.
+
+        Args:
+            key (Tuple): The key of the body.
+            shared (bool, optional): Whether the shared tier is read if the others miss. Defaults
+                to True.
+            deadline (float, optional): The `time.monotonic()` by which the shared tier must be
+                read. It is skipped if no time is left. Defaults to the shared tier's timeout.
+        """
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                (expires_at, rendered) = entry
+
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    return rendered
+
+                del self._entries[key]
+
+        store_key = self._store_key(key)
+        rendered = None
+
+        if self.store is not None:
+            rendered = self.store.get_entry(store_key)
+
+        if rendered is None and shared and self.shared is not None:
+            rendered = self._get_shared(store_key, deadline)
+
+            if rendered is not None and self.store is not None:
+                self.store.put_entry(store_key, rendered)
+
+        if rendered is not None:
+            # The tiers have their own TTL, so the body is kept in memory for the TTL from now.
+            self._remember(key, rendered, now)
+
+        return rendered
+
+    def put(self, key: Tuple, rendered: str):
+        """Caches the rendered body in memory, in the persistent tier and in the shared tier."""
+        self._remember(key, rendered, self._clock())
+        store_key = self._store_key(key)
+
+        if self.store is not None:
+            self.store.put_entry(store_key, rendered)
+
+        if self.shared is not None:
+            try:
+                self.shared.put_entry(store_key, rendered)
+            except Exception as e:
+                print(f'Failed to share the rendered message: {e}')
+
+    def _get_shared(self, store_key: str, deadline: Optional[float]) -> Optional[str]:
+        timeout = None
+
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+
+            if timeout <= 0:
+                return None
+
+        try:
+            return self.shared.get_entry(store_key, timeout=timeout)
+        except Exception as e:
+            print(f'Failed to read the shared rendered message: {e}')
+            return None
+
+    def _remember(self, key: Tuple, rendered: str, now: float):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, rendered)
+            self._entries.move_to_end(key)
+
+            # Drop the least recently used.
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forgets the bodies in memory. The persistent tier is kept."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+# How many subscribers are kept in memory.
+DEFAULT_MAX_ENTRIES = 1024
+
+# How long to wait before listening again after the listener stopped, in seconds.
+RESTART_SECONDS = 60
+
+# The type of a change of a document, see `DocumentChange.type`.
+CHANGE_REMOVED = 'REMOVED'
+
+
+class SubscriberCache:
+    """Subscribers of the chats, read through from a `SubscriberRepository` and kept in memory, the
+    most recently used first. It is kept up to date by listening to the changes of the subscribers
+    collection, so a subscriber is only read from Firestore once, however often the chat calls
+    `/start`.
+
+    The cache is only used while it is listening. Until `start` is called, or while the listener is
+    down, every subscriber is read from Firestore, so that it is never stale.
+    """
+
+    def __init__(self, repo,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Args:
+            repo (SubscriberRepository): Where the subscribers are read from.
+            max_entries (int, optional): How many subscribers are kept in memory. Defaults to 1024.
+            clock (Callable[[], float], optional): Returns the current time in seconds.
+        """
+        self.repo = repo
+        self.max_entries = max_entries
+        self._clock = clock
+
+        # The subscriber of every cached chat id, or None for a chat that has none.
+        self._entries: 'OrderedDict[str, Optional[object]]' = OrderedDict()
+        self._lock = Lock()
+
+        # Counts the changes, so that a read that raced with a change is not cached.
+        self._generation = 0
+
+        self._watch = None
+        self._synced = False
+        self._started_at: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(chat_id) -> str:
+        # Chat ids are numbers in updates and strings in callback data.
+        return str(chat_id)
+
+    def start(self):
+        """Starts listening to the changes of the subscribers. The cache is used from the first
+        snapshot on.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._synced = False
+            self._started_at = self._clock()
+
+        self._watch = self.repo.collection.on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        """Stops listening, and stops using the cache."""
+        watch = self._watch
+        self._watch = None
+
+        with self._lock:
+            self._entries.clear()
+            self._synced = False
+            self._started_at = None
+
+        if watch is not None:
+            watch.unsubscribe()
+
+    @property
+    def is_listening(self) -> bool:
+        """Whether the changes are being received, so that the cache is up to date."""
+        return self._watch is not None and self._synced and self._watch.is_active
+
+    def _restart_if_down(self):
+        if self._started_at is None or self._watch is None or self._watch.is_active:
+            return
+
+        if self._clock() - self._started_at < RESTART_SECONDS:
+            return
+
+        print('Subscriber listener is down, listening again')
+
+        try:
+            self.start()
+        except Exception as e:
+            print(f'Failed to listen to subscribers: {e}')
+
+    def _on_snapshot(self, _, changes, __):
+        with self._lock:
+            self._generation += 1
+
+            for change in changes:
+                doc = change.document
+                chat_id = (doc.to_dict() or {}).get('chat_id')
+
+                if chat_id is None:
+                    continue
+
+                key = self._key(chat_id)
+
+                if key not in self._entries:
+                    continue
+
+                if change.type.name != CHANGE_REMOVED and doc.id == key:
+                    self._entries[key] = self.repo.from_doc(doc)
+                else:
+                    # Removed, or a document not keyed by chat id yet, so read it again.
+                    del self._entries[key]
+                    self.invalidations += 1
+
+            self._synced = True
+
+    def get(self, chat_id):
+        """Returns the chat's subscriber, or None if it has none.
+
+        Args:
+            chat_id (str): The chat id.
+
+        Returns:
+            Optional[Subscriber]: The subscriber.
+        """
+        if not self.is_listening:
+            self._restart_if_down()
+
+            with self._lock:
+                self._entries.clear()
+                self.bypasses += 1
+
+            return self.repo.get(chat_id)
+
+        key = self._key(chat_id)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            self.misses += 1
+            generation = self._generation
+
+        subscriber = self.repo.get(chat_id)
+
+        with self._lock:
+            if self._generation == generation:
+                self._entries[key] = subscriber
+
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return subscriber
+
+    def invalidate(self, chat_id):
+        """Forgets the chat's subscriber, e.g. after changing it, so that it is read again."""
+        with self._lock:
+            self._generation += 1
+
+            key = self._key(chat_id)
+
+            if key in self._entries:
+                del self._entries[key]
+                self.invalidations += 1
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """The counts of cache hits, misses, reads while not listening, evictions and
+        invalidations, and the number of cached subscribers.
+        """
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def __str__(self) -> str:
+        return ', '.join(f'{name}: {value}' for name, value in self.metrics.items())
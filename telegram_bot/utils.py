@@ -1,14 +1,26 @@
+import os
+import time
 from time import strftime
 from datetime import date, datetime
-from typing import Optional, Set
+from typing import Iterator, Optional, Tuple
 from google.cloud import firestore
 
 from data import db
-from data.subscriber_repository import SubscriberRepository, SubscriptionItem
+from data.subscriber_repository import Subscriber, SubscriberRepository, SubscriptionItem
 from data.plan_repository import PlanRepository
+from data.rendered_message_repository import RenderedMessageRepository
 from bible.plan_manager import ReadingTask
 from bible.bible_gateway import BibleGateway
+from bible.bible_registry import BibleRegistry
+from bible.circuit_breaker import STATE_CLOSED, STATE_OPEN, CircuitBreaker
+from bible.page_cache import PageCache
+from bible.search_index import SearchIndex, load_search_index
+from config.env import BIBLE_DEFAULT_VERSION, BIBLE_MEMORY_BUDGET_MB, BIBLE_TRANSLATIONS, \
+    GATEWAY_CACHE_COMPRESS, GATEWAY_CACHE_DIR, GATEWAY_CACHE_MAX_MB, GATEWAY_CACHE_TTL_HOURS, \
+    PLAN_LEGACY_LOOKUP, RENDER_CACHE_MAX_MB, RENDER_CACHE_PERSIST, RENDER_CACHE_SHARED, \
+    RENDER_CACHE_SIZE, SUBSCRIBER_PAGE_SIZE
 from telegram_bot.daily_message_manager import TaskMessageManager
+from telegram_bot.render_cache import RenderCache
 
 
 def get_date_today() -> date:
@@ -35,11 +47,23 @@ def get_reading_plan_day_number() -> int:
     return num_of_days_from_first_jan - num_of_sundays
 
 
-def get_today_reading_plan(db: firestore.Client) -> Optional[ReadingTask]:
+def get_remaining_seconds(deadline: Optional[float]) -> Optional[float]:
+    """Returns the seconds left before the deadline, a `time.monotonic()`, or None if there is no
+    deadline.
+    """
+    if deadline is None:
+        return None
+
+    return max(0.0, deadline - time.monotonic())
+
+
+def get_today_reading_plan(db: firestore.Client, deadline: Optional[float] = None) -> Optional[ReadingTask]:
     """Returns the reading plan for today if any from firestore.
 
     Args:
         db (firestore.Client): The database client.
+        deadline (float, optional): The `time.monotonic()` by which the query must end. Defaults to
+            no deadline.
 
     Returns:
         Optional[ReadingTask]: The reading plan, or None if it does not exist.
@@ -48,37 +72,36 @@ def get_today_reading_plan(db: firestore.Client) -> Optional[ReadingTask]:
     today_date = get_date_today()
 
     # Query today's plan from the database
-    plan_repo = PlanRepository(db)
-    return plan_repo.get_plan_at(today_date)
+    plan_repo = PlanRepository(db, legacy_lookup=PLAN_LEGACY_LOOKUP)
+    return plan_repo.get_plan_at(today_date, timeout=get_remaining_seconds(deadline))
 
 
-def get_subscribers_chat_ids(item: SubscriptionItem) -> Set[str]:
-    """Returns subscriber ids from firestore for the given item..
+def iter_subscribers(item: SubscriptionItem) -> Iterator[Subscriber]:
+    """Yields the subscribers of the item from firestore, once for each chat. They are read a page
+    at a time, so that sending can start before all of them are read.
 
     Args:
         item (SubscriptionItem): Which subscription the chat should be subscribed to.
 
     Returns:
-        Set[str]: Subscribers' telegram chat ids.
+        Iterator[Subscriber]: The subscribers.
     """
     repo = SubscriberRepository(db)
-    subs = repo.list_by_subscription(item)
 
-    ids = map(lambda sub: sub.chat_id, subs)
+    return repo.iter_by_subscription(item, page_size=SUBSCRIBER_PAGE_SIZE)
 
-    return set(ids)
 
-
-def format_telegram_message(task: ReadingTask, body: str) -> str:
+def format_telegram_message(task: ReadingTask, body: str, version: Optional[str] = None) -> str:
     # Today's date, formatted
     today_date = f'📅 <b>{format_date_today(get_date_today())}</b>'
 
     # Reading plan, formatted
-    reading_chapter = f'{task.book.upper()} {task.chapter}'
+    reading_chapter = f'{task.book.upper()} {task.chapter_label}'
     reading_plan = f'📖 <b>{reading_chapter}</b>'
 
     # Credit link to Bible Gateway
-    source_url = BibleGateway().get_url(task.book, task.chapter)
+    version = get_bible_registry().normalize_version(version)
+    source_url = BibleGateway().get_url(task.book, task.chapter, version, task.end_chapter)
     credit_section = f'See from source: <a href="{source_url}">Bible Gateway</a>'
 
     # The message lines to be sent.
@@ -94,28 +117,238 @@ def format_telegram_message(task: ReadingTask, body: str) -> str:
     return '\n'.join(message_lines)
 
 
-def get_message_for_today(db: firestore.Client, message_manager: TaskMessageManager = TaskMessageManager()) -> Optional[str]:
+_bible_registry: Optional[BibleRegistry] = None
+_page_cache: Optional[PageCache] = None
+_circuit_breaker: Optional[CircuitBreaker] = None
+_message_manager: Optional[TaskMessageManager] = None
+_search_index: Optional[SearchIndex] = None
+
+
+def get_bible_registry() -> BibleRegistry:
+    """Returns the Bible versions shared by the process. It is created on first use."""
+    global _bible_registry
+
+    if _bible_registry is None:
+        _bible_registry = BibleRegistry(
+            translations=BIBLE_TRANSLATIONS,
+            default_version=BIBLE_DEFAULT_VERSION,
+            memory_budget=BIBLE_MEMORY_BUDGET_MB * 1024 * 1024
+        )
+
+    return _bible_registry
+
+
+def get_page_cache() -> PageCache:
+    """Returns the Bible Gateway page cache shared by the process. It is created on first use."""
+    global _page_cache
+
+    if _page_cache is None:
+        _page_cache = PageCache(
+            cache_dir=GATEWAY_CACHE_DIR,
+            ttl=GATEWAY_CACHE_TTL_HOURS * 60 * 60,
+            max_size=GATEWAY_CACHE_MAX_MB * 1024 * 1024,
+            compress=GATEWAY_CACHE_COMPRESS
+        )
+
+    return _page_cache
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Returns the Bible Gateway circuit breaker shared by the process. Its state is saved next to
+    the page cache, so that it is kept between invocations.
+    """
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker(
+            probe=BibleGateway().probe,
+            state_path=os.path.join(get_page_cache().cache_dir, 'circuit.json')
+        )
+
+    return _circuit_breaker
+
+
+def get_circuit_report() -> Optional[str]:
+    """Returns the Bible Gateway circuit breaker's state changes since this was last called, or
+    None if there were none and the circuit is closed.
+    """
+    breaker = get_circuit_breaker()
+    transitions = breaker.pop_transitions()
+
+    if len(transitions) == 0 and breaker.state == STATE_CLOSED:
+        return None
+
+    lines = [f'Bible Gateway circuit is {breaker.state}.']
+    for (at, previous, state) in transitions:
+        lines.append(f'{datetime.fromtimestamp(at):%H:%M:%S} {previous} -> {state}')
+
+    if breaker.state != STATE_CLOSED or any(state == STATE_OPEN for _, _, state in transitions):
+        lines.append('The local Bible was used while the circuit was open.')
+
+    return '\n'.join(lines)
+
+
+def create_render_cache() -> RenderCache:
+    """Returns a cache of rendered messages. If persisted, they are kept in a directory inside the
+    page cache, so they share its TTL, but have their own disk space of `RENDER_CACHE_MAX_MB`. If
+    shared, they are also kept in Firestore, so that a message prefetched by one process is sent by
+    any other.
+    """
+    store = None
+    shared = None
+    ttl = GATEWAY_CACHE_TTL_HOURS * 60 * 60
+
+    if RENDER_CACHE_PERSIST:
+        page_cache = get_page_cache()
+        store = PageCache(
+            cache_dir=os.path.join(page_cache.cache_dir, 'rendered'),
+            ttl=page_cache.ttl,
+            max_size=RENDER_CACHE_MAX_MB * 1024 * 1024,
+            compress=page_cache.compress
+        )
+
+    if RENDER_CACHE_SHARED:
+        shared = RenderedMessageRepository(db, ttl=ttl)
+
+    return RenderCache(
+        max_entries=RENDER_CACHE_SIZE,
+        ttl=ttl,
+        store=store,
+        shared=shared
+    )
+
+
+def get_message_manager() -> TaskMessageManager:
+    """Returns the task message manager shared by the process. It is created on first use."""
+    global _message_manager
+
+    if _message_manager is None:
+        _message_manager = TaskMessageManager(
+            gateway=BibleGateway(cache=get_page_cache(), breaker=get_circuit_breaker()),
+            registry=get_bible_registry(),
+            render_cache=create_render_cache()
+        )
+
+    return _message_manager
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """Returns the search index of the default Bible version shared by the process, or None if it
+    has not been built. It is memory mapped on first use.
+    """
+    global _search_index
+
+    if _search_index is None:
+        registry = get_bible_registry()
+        _search_index = load_search_index(
+            registry.metadata, registry.translations[registry.default_version])
+
+    return _search_index
+
+
+def get_message_for_task(task: ReadingTask, message_manager: Optional[TaskMessageManager] = None,
+                         version: Optional[str] = None, deadline: Optional[float] = None) -> str:
+    """Returns the telegram message for the given task.
+
+    Args:
+        task (ReadingTask): The reading task.
+        message_manager (TaskMessageManager, optional): The task message manager. Defaults to the
+            shared one from `get_message_manager()`.
+        version (str, optional): The Bible version. Defaults to the default version.
+        deadline (float, optional): The `time.monotonic()` by which the message must be ready. The
+            local Bible is used if Bible Gateway cannot make it. Defaults to no deadline.
+
+    Returns:
+        str: The telegram message for the task.
+    """
+    if message_manager is None:
+        message_manager = get_message_manager()
+
+    # Get the content for the task
+    body = message_manager.get_task_message(task, version, deadline)
+
+    # Format the message to be sent
+    return format_telegram_message(
+        task=task,
+        body=body,
+        version=version
+    )
+
+
+def get_quick_message_for_task(task: ReadingTask, message_manager: Optional[TaskMessageManager] = None,
+                               version: Optional[str] = None) -> Tuple[str, bool]:
+    """Returns the telegram message for the given task without waiting for Bible Gateway. It is
+    rendered from Bible Gateway if that is cached, and from the local Bible otherwise.
+
+    Args:
+        task (ReadingTask): The reading task.
+        message_manager (TaskMessageManager, optional): The task message manager. Defaults to the
+            shared one from `get_message_manager()`.
+        version (str, optional): The Bible version. Defaults to the default version.
+
+    Returns:
+        Tuple[str, bool]: The message, and whether it is from Bible Gateway. If not, it can be
+            replaced by `get_gateway_message_for_task` later.
+    """
+    if message_manager is None:
+        message_manager = get_message_manager()
+
+    body = message_manager.get_cached_message(task, version)
+    from_gateway = body is not None
+
+    if not from_gateway:
+        body = message_manager.get_local_message(task, version)
+
+    return (format_telegram_message(task=task, body=body, version=version), from_gateway)
+
+
+def get_gateway_message_for_task(task: ReadingTask, message_manager: Optional[TaskMessageManager] = None,
+                                 version: Optional[str] = None, deadline: Optional[float] = None) -> str:
+    """Returns the telegram message for the given task, rendered from Bible Gateway with the
+    headings and footnotes. There is no fallback to the local Bible.
+
+    Args:
+        task (ReadingTask): The reading task.
+        message_manager (TaskMessageManager, optional): The task message manager. Defaults to the
+            shared one from `get_message_manager()`.
+        version (str, optional): The Bible version. Defaults to the default version.
+        deadline (float, optional): The `time.monotonic()` by which the message must be ready.
+            Defaults to the Bible Gateway client's total timeout.
+
+    Raises:
+        Exception: If the passage cannot be fetched from Bible Gateway before the deadline.
+
+    Returns:
+        str: The telegram message for the task.
+    """
+    if message_manager is None:
+        message_manager = get_message_manager()
+
+    body = message_manager.get_gateway_message(task, version, deadline)
+
+    return format_telegram_message(task=task, body=body, version=version)
+
+
+def get_message_for_today(db: firestore.Client, message_manager: Optional[TaskMessageManager] = None,
+                          version: Optional[str] = None, deadline: Optional[float] = None) -> Optional[str]:
     """Returns the telegram message for today's task.
 
     Args:
         db (firestore.Client): The firestore client.
-        message_manager (TaskMessageManager, optional): The task message manager. Defaults to TaskMessageManager().
+        message_manager (TaskMessageManager, optional): The task message manager. Defaults to the
+            shared one from `get_message_manager()`.
+        version (str, optional): The Bible version. Defaults to the default version.
+        deadline (float, optional): The `time.monotonic()` by which the message must be ready. It
+            bounds the plan query and the Bible Gateway fetch and parse. Defaults to no deadline.
 
     Returns:
         Optional[str]: The telegram message for today's task.
     """
     # Get today's reading plan.
-    task_today = get_today_reading_plan(db)
+    task_today = get_today_reading_plan(db, deadline)
 
     # If there is no plan for today, the task ends
     if task_today is None:
         return None
 
-    # Get the content for today
-    body = message_manager.get_task_message(task_today)
-
-    # Format the message to be sent
-    return format_telegram_message(
-        task=task_today,
-        body=body
-    )
+    return get_message_for_task(task_today, message_manager, version, deadline)
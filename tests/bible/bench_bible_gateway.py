@@ -0,0 +1,79 @@
+"""Benchmarks `BibleGatewayParser` against the Bible Gateway pages in `tests/asset`.
+
+Run from the repository root with `python -m tests.bible.bench_bible_gateway`. Every page is parsed
+with the verses and footnotes extracted, like a daily message does, with each parser engine. The
+output is checked against the expected fixtures before it is timed, and the peak memory of one
+parse is measured with `tracemalloc`.
+"""
+import timeit
+import tracemalloc
+from bs4 import BeautifulSoup
+from bible.bible_gateway import ENGINES, BibleGatewayParser
+from ..utils import get_expected_footnotes, get_test_asset_content
+
+# Source page, expected verses, expected footnotes.
+FIXTURES = [
+    ('col-3.txt', 'col-3_expected.txt', 'col-3_footnotes.txt'),
+    ('1-timothy-3.txt', '1-timothy-3_expected.txt', '1-timothy-3_footnotes.txt'),
+    ('exodus-3.txt', 'exodus-3_expected.txt', 'exodus-3_footnotes.txt'),
+    ('psalm-1.txt', 'psalm-1_expected.txt', 'psalm-1_footnotes.txt'),
+    ('psalm-6.txt', 'psalm-6_expected.txt', 'psalm-6_footnotes.txt'),
+    ('john-17.txt', 'john-17_expected.txt', 'john-17_footnotes.txt'),
+]
+
+REPEAT = 5
+NUMBER = 5
+
+
+def render(raw: str, engine: str):
+    parser = BibleGatewayParser(raw, engine=engine)
+    return (parser.extract_verses(), parser.get_footnotes())
+
+
+def parse_full_page_twice(raw: str):
+    """What the parser used to do: a full tree of the page for the verses, and another for the
+    footnotes.
+    """
+    BeautifulSoup(raw, 'html.parser')
+    BeautifulSoup(raw, 'html.parser')
+
+
+def best_time(func, *args) -> float:
+    """Returns the fastest time of one call, in milliseconds."""
+    times = timeit.repeat(lambda: func(*args), repeat=REPEAT, number=NUMBER)
+    return min(times) / NUMBER * 1000
+
+
+def peak_memory(func, *args) -> float:
+    """Returns the peak memory allocated during one call, in KiB."""
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak / 1024
+
+
+def main():
+    print(f'{"Page":<16}{"Engine":<16}{"Time":>10}{"Peak memory":>16}')
+
+    for source, expected, footnotes in FIXTURES:
+        raw = get_test_asset_content(source)
+
+        rows = [('two full parses', parse_full_page_twice, (raw,))]
+
+        for engine in ENGINES:
+            verses, notes = render(raw, engine)
+            assert verses == get_test_asset_content(expected), f'{source} verses differ ({engine})'
+            assert notes == get_expected_footnotes(footnotes), f'{source} footnotes differ ({engine})'
+
+            rows.append((engine, render, (raw, engine)))
+
+        for name, func, args in rows:
+            time = best_time(func, *args)
+            memory = peak_memory(func, *args)
+            print(f'{source:<16}{name:<16}{time:>7.1f} ms{memory:>12.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,8 @@
-from bible.bible import Bible
+import os
+from array import array
+from bible.bible import Bible, ChapterText, LazyXmlBibleText, scan_books
+from bible.bible_metadata import scan_verse_counts
+from ..utils import test_asset_dir
 import pytest
 
 
@@ -17,3 +21,85 @@ import pytest
 def test_fuzzy_search(query, expected):
     actual = Bible().fuzzy_search_book(query)
     assert actual == expected
+
+
+def get_lazy_bible_text(max_loaded_books: int) -> LazyXmlBibleText:
+    xml_path = os.path.join(test_asset_dir, 'mini-bible.xml')
+    return LazyXmlBibleText(xml_path, max_loaded_books=max_loaded_books)
+
+
+def test_lazy_text_scans_counts_without_loading_books():
+    text = get_lazy_bible_text(max_loaded_books=2)
+
+    assert text.book_names == ['genesis', 'psalms', '1 john']
+    assert text.chapter_count('genesis') == 2
+    assert text.verse_count('1 john', 1) == 5
+    assert text.loaded_books == []
+
+
+def test_lazy_text_loads_requested_book_only():
+    text = get_lazy_bible_text(max_loaded_books=2)
+
+    verses = text.get_verses('1 john', 1, 4, 4)
+
+    assert verses == ['We write this to make our joy complete.']
+    assert text.loaded_books == ['1 john']
+
+
+def test_lazy_text_evicts_least_recently_used_book():
+    text = get_lazy_bible_text(max_loaded_books=2)
+
+    text.get_verses('genesis', 1, 1, 1)
+    text.get_verses('psalms', 1, 1, 1)
+    text.get_verses('genesis', 2, 1, 1)
+    text.get_verses('1 john', 1, 1, 1)
+
+    assert text.loaded_books == ['genesis', '1 john']
+
+
+def test_scan_books_finds_each_book_in_the_file():
+    xml_path = os.path.join(test_asset_dir, 'mini-bible.xml')
+    (verse_counts, book_ranges) = scan_books(xml_path)
+
+    assert verse_counts == scan_verse_counts(xml_path)
+    assert list(book_ranges.keys()) == ['genesis', 'psalms', '1 john']
+
+    with open(xml_path, 'rb') as f:
+        data = f.read()
+
+    for book, (start, end) in book_ranges.items():
+        assert data[start:end].strip().startswith(b'<book name=')
+        assert data[start:end].strip().endswith(b'</book>')
+
+
+def test_lazy_text_with_verse_counts_scans_on_first_read():
+    xml_path = os.path.join(test_asset_dir, 'mini-bible.xml')
+    text = LazyXmlBibleText(xml_path, verse_counts=scan_verse_counts(xml_path))
+
+    assert text._book_ranges is None
+    assert text.get_verses('1 john', 1, 4, 4) == ['We write this to make our joy complete.']
+    assert text.get_verses('genesis', 1, 1, 1) == \
+        ['In the beginning God created the heavens and the earth.']
+
+
+def test_lazy_text_reads_books_outside_the_lock(mocker):
+    text = get_lazy_bible_text(max_loaded_books=2)
+    read_book = text._read_book
+
+    def read_unlocked(book):
+        assert not text._lock.locked()
+        return read_book(book)
+
+    mocker.patch.object(text, '_read_book', side_effect=read_unlocked)
+
+    assert text.get_verses('psalms', 1, 1, 1) == text.get_verses('psalms', 1, 1, 1)
+    assert text._read_book.call_count == 1
+
+
+def test_chapter_text_range_is_sliced_from_shared_text():
+    chapter = ChapterText('abcdef', array('I', [0, 1, 3, 6]))
+
+    assert len(chapter) == 3
+    assert chapter.get_range(2, 3) == ['bc', 'def']
+    assert chapter.get_range(-1, 1000) == ['a', 'bc', 'def']
+    assert chapter.get_range(3, 2) == []
@@ -1,12 +1,14 @@
 from ..utils import get_test_asset_content, get_expected_footnotes
-from bible.bible_gateway import BibleGatewayParser, BibleGateway
+from bs4 import BeautifulSoup
+from bible.bible_gateway import ENGINE_SOUP, ENGINE_STREAM, ENGINES, BibleGatewayParser, BibleGateway
+import pytest
 import requests_mock
 
 
-def assert_footnotes_contents(source: str, expected: str, footnote: str):
+def assert_footnotes_contents(source: str, expected: str, footnote: str, engine: str):
     raw = get_test_asset_content(source)
 
-    parser = BibleGatewayParser(raw)
+    parser = BibleGatewayParser(raw, engine=engine)
 
     # Check footnotes
     footnotes = parser.get_footnotes()
@@ -21,10 +23,10 @@ def assert_footnotes_contents(source: str, expected: str, footnote: str):
     assert content == expected_content
 
 
-def assert_cut(source: str, expected: str, from_verse: int = 1, to_verse: int = -1):
+def assert_cut(source: str, expected: str, engine: str, from_verse: int = 1, to_verse: int = -1):
     raw = get_test_asset_content(source)
 
-    parser = BibleGatewayParser(raw)
+    parser = BibleGatewayParser(raw, engine=engine)
 
     expected_content = get_test_asset_content(expected)
     content = parser.extract_verses(from_verse=from_verse, to_verse=to_verse)
@@ -32,92 +34,197 @@ def assert_cut(source: str, expected: str, from_verse: int = 1, to_verse: int =
     assert content == expected_content
 
 
-def test_colossians_3():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_colossians_3(engine):
     assert_footnotes_contents(
         'col-3.txt',
         'col-3_expected.txt',
-        'col-3_footnotes.txt'
+        'col-3_footnotes.txt',
+        engine
     )
 
 
-def test_1_timothy_3():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_1_timothy_3(engine):
     assert_footnotes_contents(
         '1-timothy-3.txt',
         '1-timothy-3_expected.txt',
         '1-timothy-3_footnotes.txt',
+        engine
     )
 
 
-def test_exodus_3():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_exodus_3(engine):
     assert_footnotes_contents(
         'exodus-3.txt',
         'exodus-3_expected.txt',
-        'exodus-3_footnotes.txt'
+        'exodus-3_footnotes.txt',
+        engine
     )
 
 
-def test_psalm_1():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_psalm_1(engine):
     assert_footnotes_contents(
         'psalm-6.txt',
         'psalm-6_expected.txt',
-        'psalm-6_footnotes.txt'
+        'psalm-6_footnotes.txt',
+        engine
     )
 
 
-def test_psalm_6():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_psalm_6(engine):
     assert_footnotes_contents(
         'psalm-6.txt',
         'psalm-6_expected.txt',
-        'psalm-6_footnotes.txt'
+        'psalm-6_footnotes.txt',
+        engine
     )
 
 # https://github.com/SebastianLiando/bible-reading-plan-daily-reminder/issues/7
 
 
-def test_john_17():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_john_17(engine):
     assert_footnotes_contents(
         'john-17.txt',
         'john-17_expected.txt',
-        'john-17_footnotes.txt'
+        'john-17_footnotes.txt',
+        engine
     )
 
 
+def test_page_is_parsed_once(mocker):
+    spy = mocker.patch('bible.bible_gateway.BeautifulSoup', wraps=BeautifulSoup)
+    parser = BibleGatewayParser(get_test_asset_content('col-3.txt'), engine=ENGINE_SOUP)
+
+    # Nothing is parsed until it is needed
+    assert spy.call_count == 0
+
+    parser.extract_verses()
+    parser.get_footnotes()
+    parser.extract_verses(from_verse=2, to_verse=4)
+
+    assert spy.call_count == 1
+
+
+def test_stream_engine_does_not_build_a_tree(mocker):
+    spy = mocker.patch('bible.bible_gateway.BeautifulSoup', wraps=BeautifulSoup)
+    parser = BibleGatewayParser(get_test_asset_content('col-3.txt'), engine=ENGINE_STREAM)
+
+    parser.extract_verses()
+    parser.get_footnotes()
+
+    assert spy.call_count == 0
+
+
+def test_stream_engine_stops_after_footnotes():
+    raw = get_test_asset_content('col-3.txt')
+    parser = BibleGatewayParser(raw, engine=ENGINE_STREAM)
+
+    assert parser.extract_verses() == get_test_asset_content('col-3_expected.txt')
+
+    # The rest of the page after the footnotes is not read.
+    (line, _) = parser.stream.getpos()
+    assert line < raw.count('\n')
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        BibleGatewayParser('', engine='lxml')
+
+
 # File name that contains the source HTML file to test verse cutting
 CUT_TEST_SOURCE_FILE = 'partial.txt'
 
 
-def test_cutting_from_argument_only():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_cutting_from_argument_only(engine):
     assert_cut(
         CUT_TEST_SOURCE_FILE,
         'partial_from.txt',
+        engine,
         from_verse=15
     )
 
 
-def test_cutting_to_argument_only():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_cutting_to_argument_only(engine):
     assert_cut(
         CUT_TEST_SOURCE_FILE,
         'partial_to.txt',
+        engine,
         to_verse=3
     )
 
 
-def test_cutting_from_and_to_valid():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_cutting_from_and_to_valid(engine):
     assert_cut(
         CUT_TEST_SOURCE_FILE,
         'partial_from_to_valid.txt',
+        engine,
         from_verse=7, to_verse=8
     )
 
 
-def test_cutting_from_and_to_invalid():
+@pytest.mark.parametrize('engine', ENGINES)
+def test_cutting_from_and_to_invalid(engine):
     assert_cut(
         CUT_TEST_SOURCE_FILE,
         'partial_from_to_invalid.txt',
+        engine,
         from_verse=15, to_verse=1
     )
 
 
+@pytest.mark.parametrize('engine', ENGINES)
+def test_footnotes_of_range_are_relettered(engine):
+    parser = BibleGatewayParser(get_test_asset_content(CUT_TEST_SOURCE_FILE), engine=engine)
+
+    (verses, footnotes) = parser.extract_verses_with_footnotes(from_verse=11, to_verse=12)
+
+    assert footnotes == [
+        ('Micah 1:11', '<i>Shaphir</i> means <i>pleasant.</i>'),
+        ('Micah 1:11', '<i>Zaanan</i> sounds like the Hebrew for <i>come out.</i>'),
+        ('Micah 1:12', '<i>Maroth</i> sounds like the Hebrew for <i>bitter.</i>'),
+    ]
+    assert [verses.count(f'<i>[{letter}]</i>') for letter in 'abcd'] == [1, 1, 1, 0]
+    assert verses.index('<i>[a]</i>') < verses.index('<i>[b]</i>') < verses.index('<i>[c]</i>')
+
+    # Only the footnote letters change
+    assert verses == parser.extract_verses(11, 12) \
+        .replace('[c]', '[a]').replace('[d]', '[b]').replace('[e]', '[c]')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_range_without_footnotes(engine):
+    parser = BibleGatewayParser(get_test_asset_content(CUT_TEST_SOURCE_FILE), engine=engine)
+
+    assert parser.extract_verses_with_footnotes(from_verse=7, to_verse=8) == \
+        (get_test_asset_content('partial_from_to_valid.txt'), [])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_footnote_letters_continue(engine):
+    parser = BibleGatewayParser(get_test_asset_content(CUT_TEST_SOURCE_FILE), engine=engine)
+
+    (verses, footnotes) = parser.extract_verses_with_footnotes(from_verse=15, first_footnote=2)
+
+    assert footnotes == [('Micah 1:15', '<i>Mareshah</i> sounds like the Hebrew for <i>conqueror.</i>')]
+    assert '<i>[c]</i>' in verses and '<i>[g]</i>' not in verses
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_whole_chapter_keeps_every_footnote(engine):
+    parser = BibleGatewayParser(get_test_asset_content('col-3.txt'), engine=engine)
+
+    assert parser.extract_verses_with_footnotes() == \
+        (parser.extract_verses(), parser.get_footnotes())
+
+
 def assert_url(expected: str, book: str, chapter: int, version: str = 'NIV'):
     gateway = BibleGateway()
     url = gateway.get_url(book, chapter, version)
@@ -139,6 +246,14 @@ def test_get_url_for_multi_word_book():
     )
 
 
+def test_get_url_for_chapter_range():
+    gateway = BibleGateway()
+
+    assert gateway.get_url('john', 17, 'NIV', 18) == \
+        'https://www.biblegateway.com/passage/?search=john+17-18&version=NIV'
+    assert gateway.get_url('john', 17, 'NIV', 17) == gateway.get_url('john', 17)
+
+
 def test_get_html_calls_get_request_with_correct_url():
     book, chapter = 'colossians', 3
 
@@ -0,0 +1,78 @@
+import os
+import shutil
+from bible.bible import Bible
+from bible.bible_index import BibleIndex, build_index, get_index_path
+from ..utils import test_asset_dir
+import pytest
+
+XML_NAME = 'mini-bible.xml'
+
+
+@pytest.fixture
+def xml_path(tmp_path) -> str:
+    path = os.path.join(tmp_path, XML_NAME)
+    shutil.copy(os.path.join(test_asset_dir, XML_NAME), path)
+    return path
+
+
+@pytest.fixture
+def index(xml_path) -> BibleIndex:
+    index_path = get_index_path(xml_path)
+    build_index(xml_path, index_path)
+
+    index = BibleIndex(index_path)
+    yield index
+    index.close()
+
+
+def test_index_path_is_next_to_xml():
+    assert get_index_path('/a/b/niv.xml') == '/a/b/niv.idx'
+
+
+def test_book_names_are_lowercase_in_order(index: BibleIndex):
+    assert index.book_names == ['genesis', 'psalms', '1 john']
+
+
+def test_chapter_and_verse_counts(index: BibleIndex):
+    assert index.chapter_count('genesis') == 2
+    assert index.verse_count('genesis', 1) == 3
+    assert index.verse_count('genesis', 2) == 2
+    assert index.verse_count('1 john', 1) == 5
+
+
+def test_get_verses_range(index: BibleIndex):
+    verses = index.get_verses('1 john', 1, 2, 3)
+
+    assert len(verses) == 2
+    assert verses[0].startswith('The life appeared')
+    assert verses[1].startswith('We proclaim to you')
+
+
+def test_get_verses_clamps_range(index: BibleIndex):
+    assert len(index.get_verses('genesis', 1, -1, 1000)) == 3
+    assert index.get_verses('genesis', 1, 3, 2) == []
+
+
+def test_get_verses_decodes_unicode(index: BibleIndex):
+    assert index.get_verses('genesis', 1, 3, 3) == [
+        'And God said, “Let there be light,” and there was light.'
+    ]
+
+
+def test_missing_chapter_raises(index: BibleIndex):
+    with pytest.raises(KeyError):
+        index.get_verses('psalms', 2, 1, 1)
+
+
+def test_bible_reads_same_verses_from_index_and_xml(xml_path):
+    from_xml = Bible(xml_path)
+
+    build_index(xml_path, get_index_path(xml_path))
+    from_index = Bible(xml_path)
+
+    assert isinstance(from_index.text, BibleIndex)
+
+    for book in from_xml.text.book_names:
+        for chapter in range(1, from_xml.text.chapter_count(book) + 1):
+            assert from_index.get_verses_from_chapter(book, chapter, 1, 1000) == \
+                from_xml.get_verses_from_chapter(book, chapter, 1, 1000)
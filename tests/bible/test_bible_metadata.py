@@ -0,0 +1,55 @@
+import os
+from bible.bible_index import BibleIndex, build_index
+from bible.bible_metadata import BibleMetadata, scan_verse_counts
+from ..utils import test_asset_dir
+import pytest
+
+XML_PATH = os.path.join(test_asset_dir, 'mini-bible.xml')
+
+VERSE_COUNTS = {
+    'genesis': [3, 2],
+    'psalms': [2],
+    '1 john': [5],
+}
+
+
+def test_scan_verse_counts():
+    assert scan_verse_counts(XML_PATH) == VERSE_COUNTS
+
+
+def test_from_index_matches_scan(tmp_path):
+    index_path = os.path.join(tmp_path, 'mini-bible.idx')
+    build_index(XML_PATH, index_path)
+
+    index = BibleIndex(index_path)
+    metadata = BibleMetadata.from_text(index)
+    index.close()
+
+    assert metadata.verse_counts == VERSE_COUNTS
+
+
+def test_save_and_load(tmp_path):
+    path = os.path.join(tmp_path, 'mini-bible.meta.json')
+    BibleMetadata(VERSE_COUNTS).save(path)
+
+    loaded = BibleMetadata.load(path)
+
+    assert loaded.verse_counts == VERSE_COUNTS
+    assert loaded.book_names == ['genesis', 'psalms', '1 john']
+
+
+@pytest.mark.parametrize('start,end,expected', [
+    (1, 1000, (1, 5)),
+    (-1, 3, (1, 3)),
+    (2, 4, (2, 4)),
+])
+def test_get_verse_range(start, end, expected):
+    metadata = BibleMetadata(VERSE_COUNTS)
+    assert metadata.get_verse_range('1 john', 1, start, end) == expected
+
+
+def test_resolves_book_names():
+    metadata = BibleMetadata(VERSE_COUNTS)
+
+    assert metadata.fuzzy_search_book('1 jn') == '1 john'
+    assert metadata.fuzzy_search_book('gensis') == 'genesis'
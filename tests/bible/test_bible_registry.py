@@ -0,0 +1,62 @@
+import os
+from bible.bible_registry import BibleRegistry
+from ..utils import test_asset_dir
+import pytest
+
+XML_PATH = os.path.join(test_asset_dir, 'mini-bible.xml')
+
+
+def create_registry(memory_budget: int = 1024 * 1024) -> BibleRegistry:
+    return BibleRegistry(
+        translations={'TEST': XML_PATH, 'copy': XML_PATH, 'WEB': None},
+        default_version='test',
+        memory_budget=memory_budget
+    )
+
+
+def test_default_version_must_have_text():
+    with pytest.raises(ValueError):
+        BibleRegistry(translations={'NIV': None})
+
+
+def test_normalize_version():
+    registry = create_registry()
+
+    assert registry.versions == ['TEST', 'COPY', 'WEB']
+    assert registry.normalize_version('web') == 'WEB'
+    assert registry.normalize_version('unknown') == 'TEST'
+    assert registry.normalize_version(None) == 'TEST'
+
+
+def test_loads_text_on_demand():
+    registry = create_registry()
+    assert registry.loaded_versions == []
+
+    bible = registry.get('copy')
+
+    assert registry.loaded_versions == ['COPY']
+    assert registry.get('COPY') is bible
+
+
+def test_version_without_text_uses_default_text():
+    registry = create_registry()
+
+    registry.get('WEB')
+
+    assert registry.loaded_versions == ['TEST']
+
+
+def test_default_version_shares_metadata():
+    registry = create_registry()
+
+    assert registry.get('TEST').metadata is registry.metadata
+
+
+def test_evicts_least_recently_used_over_budget():
+    registry = create_registry(memory_budget=0)
+
+    registry.get('TEST').get_verses_from_chapter('genesis', 1, 1, 3)
+    registry.get('COPY').get_verses_from_chapter('genesis', 1, 1, 3)
+
+    # The requested version is always kept.
+    assert registry.loaded_versions == ['COPY']
@@ -0,0 +1,72 @@
+from fuzzywuzzy import fuzz
+from bible.book_resolver import BookResolver
+import pytest
+
+BOOKS = ['genesis', 'exodus', 'leviticus', 'numbers', 'deuteronomy', 'joshua', 'judges', 'ruth',
+         '1 samuel', '2 samuel', '1 kings', '2 kings', '1 chronicles', '2 chronicles', 'ezra',
+         'nehemiah', 'esther', 'job', 'psalm', 'proverbs', 'ecclesiastes', 'song of solomon',
+         'isaiah', 'jeremiah', 'lamentations', 'ezekiel', 'daniel', 'hosea', 'joel', 'amos',
+         'obadiah', 'jonah', 'micah', 'nahum', 'habakkuk', 'zephaniah', 'haggai', 'zechariah',
+         'malachi', 'matthew', 'mark', 'luke', 'john', 'acts', 'romans', '1 corinthians',
+         '2 corinthians', 'galatians', 'ephesians', 'philippians', 'colossians',
+         '1 thessalonians', '2 thessalonians', '1 timothy', '2 timothy', 'titus', 'philemon',
+         'hebrews', 'james', '1 peter', '2 peter', '1 john', '2 john', '3 john', 'jude',
+         'revelation']
+
+resolver = BookResolver(BOOKS)
+
+
+def linear_fuzzy_search(query: str) -> str:
+    """The original implementation, which scores every book."""
+    scores = {book: fuzz.ratio(book, query.lower()) for book in BOOKS}
+    best_score = max(scores.values())
+    best_books = [book for book in BOOKS if scores[book] == best_score]
+
+    return sorted(map(lambda title: (len(title), title), best_books))[0][1]
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('1 Tim', '1 timothy'),
+    ('1Tim.', '1 timothy'),
+    ('Ps', 'psalm'),
+    ('Psalms', 'psalm'),
+    ('Jn', 'john'),
+    ('1 Jn', '1 john'),
+    ('Song of Songs', 'song of solomon'),
+    ('Col', 'colossians'),
+])
+def test_aliases(query, expected):
+    assert resolver.resolve(query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    'rev', 'gensis', 'mat', 'mak', '1 john', 'john', '1 chr', 'hebrew', 'philipians', 'jude',
+    'zzz', 'x', 'songs', '2 kngs', 'lamentation', 'tess', 'o', 'ezk 2',
+])
+def test_fuzzy_search_matches_linear_search(query):
+    # Queries are resolved fuzzily unless they are a book name or an alias.
+    fuzzy = resolver._fuzzy_search(query.lower())
+    assert fuzzy == linear_fuzzy_search(query)
+
+
+def test_exact_book_name_wins():
+    assert resolver.resolve('Job') == 'job'
+
+
+def test_results_are_memoized():
+    cached = BookResolver(BOOKS, cache_size=2)
+
+    cached.resolve('gensis')
+    cached.resolve('gensis')
+
+    info = cached.resolve.cache_info()
+    assert info.hits == 1
+    assert info.currsize == 1
+
+
+def test_aliases_only_for_available_books():
+    partial = BookResolver(['genesis', '1 john'])
+
+    assert partial.resolve('gn') == 'genesis'
+    assert partial.resolve('1 jn') == '1 john'
+    assert partial.resolve('rev') in ['genesis', '1 john']
@@ -0,0 +1,238 @@
+import time
+from bible.bible_gateway import BibleGateway
+from bible.circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, \
+    CircuitOpenError
+from bible.gateway_client import DeadlineExceeded, GatewayClient
+from bible.page_cache import PageCache
+import pytest
+import requests
+import requests_mock
+from tests.utils import FakeClock
+
+URL = 'https://www.biblegateway.com/passage/?search=colossians+3&version=NIV'
+
+
+def create_breaker(**kwargs) -> CircuitBreaker:
+    options = dict(min_calls=4, failure_rate=0.5, open_seconds=60, clock=FakeClock())
+    options.update(kwargs)
+
+    return CircuitBreaker(**options)
+
+
+def open_circuit(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+
+
+def test_opens_on_failure_rate():
+    breaker = create_breaker()
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_few_calls_do_not_open():
+    breaker = create_breaker()
+
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_slow_calls_count_as_failures():
+    breaker = create_breaker(slow_call_seconds=5)
+
+    for _ in range(4):
+        breaker.record_success(seconds=6)
+
+    assert breaker.state == STATE_OPEN
+
+
+def test_old_calls_are_forgotten():
+    clock = FakeClock()
+    breaker = create_breaker(window_seconds=60, clock=clock)
+
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now += 61
+    breaker.record_failure()
+
+    assert breaker.state == STATE_CLOSED
+
+
+def test_trial_call_closes_or_reopens():
+    clock = FakeClock()
+    breaker = create_breaker(clock=clock)
+    open_circuit(breaker)
+
+    clock.now += 60
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+
+    # Only one trial call at a time.
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 60
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_probes_inline():
+    clock = FakeClock()
+    probe_succeeds = [False]
+
+    def probe():
+        if not probe_succeeds[0]:
+            raise requests.ConnectionError('down')
+
+    breaker = create_breaker(clock=clock, probe=probe)
+    open_circuit(breaker)
+
+    # The first call after the open time runs the probe, and fails fast if the probe fails.
+    clock.now += 60
+    assert not breaker.allow_request()
+    assert breaker.state == STATE_OPEN
+
+    clock.now += 60
+    probe_succeeds[0] = True
+    assert breaker.allow_request()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_ignored_trial_call_lets_next_call_be_the_trial():
+    clock = FakeClock()
+    breaker = create_breaker(clock=clock)
+    open_circuit(breaker)
+
+    clock.now += 60
+    assert breaker.allow_request()
+
+    breaker.record_ignored()
+    assert breaker.state == STATE_OPEN
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+
+
+def test_transitions():
+    clock = FakeClock()
+    breaker = create_breaker(clock=clock)
+    open_circuit(breaker)
+
+    clock.now += 60
+    breaker.allow_request()
+    breaker.record_success()
+
+    assert breaker.pop_transitions() == [
+        (1000.0, STATE_CLOSED, STATE_OPEN),
+        (1060.0, STATE_OPEN, STATE_HALF_OPEN),
+        (1060.0, STATE_HALF_OPEN, STATE_CLOSED),
+    ]
+    assert breaker.pop_transitions() == []
+
+
+def test_state_is_persisted(tmp_path):
+    state_path = str(tmp_path / 'circuit.json')
+    clock = FakeClock()
+
+    open_circuit(create_breaker(state_path=state_path, clock=clock))
+
+    breaker = create_breaker(state_path=state_path, clock=clock)
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+    # A trial that never finished is tried again.
+    clock.now += 60
+    assert breaker.allow_request()
+
+    breaker = create_breaker(state_path=state_path, clock=clock)
+    assert breaker.state == STATE_OPEN
+    assert breaker.allow_request()
+
+
+def test_gateway_fails_fast_while_open():
+    breaker = create_breaker()
+    gateway = BibleGateway(client=GatewayClient(max_retries=0), breaker=breaker)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=500)
+
+        for _ in range(4):
+            with pytest.raises(requests.HTTPError):
+                gateway.get_html('colossians', 3)
+
+        with pytest.raises(CircuitOpenError):
+            gateway.get_html('colossians', 3)
+
+    assert mock.call_count == 4
+
+
+def test_gateway_uses_cache_while_open(tmp_path):
+    breaker = create_breaker()
+    cache = PageCache(cache_dir=str(tmp_path))
+    cache.put('colossians', 3, 'NIV', 'page')
+    open_circuit(breaker)
+
+    gateway = BibleGateway(client=GatewayClient(), cache=cache, breaker=breaker)
+
+    assert gateway.get_html('colossians', 3) == 'page'
+
+
+@pytest.mark.parametrize('status, counts', [(404, False), (400, False), (429, True), (503, True)])
+def test_gateway_counts_only_upstream_failures(status: int, counts: bool):
+    breaker = create_breaker()
+    gateway = BibleGateway(client=GatewayClient(max_retries=0), breaker=breaker)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=status)
+
+        for _ in range(4):
+            with pytest.raises(requests.HTTPError):
+                gateway.get_html('colossians', 3)
+
+    assert (breaker.state == STATE_OPEN) == counts
+
+
+def test_gateway_counts_connection_errors():
+    breaker = create_breaker()
+    gateway = BibleGateway(client=GatewayClient(max_retries=0), breaker=breaker)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, exc=requests.ConnectionError)
+
+        for _ in range(4):
+            with pytest.raises(requests.ConnectionError):
+                gateway.get_html('colossians', 3)
+
+    assert breaker.state == STATE_OPEN
+
+
+def test_gateway_ignores_spent_deadline():
+    breaker = create_breaker()
+    gateway = BibleGateway(client=GatewayClient(max_retries=0), breaker=breaker)
+    # Expect fetches to be fast, so that a short deadline is tried
+    gateway.client.expected_latency = 0
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, exc=requests.ReadTimeout)
+
+        for _ in range(4):
+            with pytest.raises(DeadlineExceeded):
+                gateway.get_html('colossians', 3, deadline=time.monotonic() + 2)
+
+    assert mock.call_count == 4
+    assert breaker.state == STATE_CLOSED
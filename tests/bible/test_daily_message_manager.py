@@ -1,15 +1,34 @@
+import time
 from datetime import datetime
 from pytest_mock import MockFixture
 from bible.bible import Bible
-from bible.bible_gateway import BibleGateway
+from bible.bible_metadata import BibleMetadata
+from bible.bible_registry import BibleRegistry
+from bible.bible_gateway import BibleGateway, BibleGatewayParser
+from bible.circuit_breaker import CircuitBreaker
+from bible.gateway_client import GatewayClient
+from bible.page_cache import PageCache
 from bible.plan_manager import ReadingTask
 from telegram_bot.daily_message_manager import TaskMessageManager
+from telegram_bot.render_cache import RenderCache
 from tests.utils import get_test_asset_content
 
 TASK = ReadingTask('', 1, 1, 1000, datetime.now())
 
+# Two chapters in one page, like a search for John 17-18.
+CHAPTERS_HTML = (
+    '<div class="std-text">\n'
+    '<p><span class="text"><span class="chapternum">17 </span>One.</span> '
+    '<span class="text"><sup class="versenum">2 </sup>Two.</span></p>\n'
+    '<p><span class="text"><sup class="versenum">3 </sup>Three.</span></p>\n'
+    '<h3><span>Arrest</span></h3>\n'
+    '<p><span class="text"><span class="chapternum">18 </span>Eighteen one.</span> '
+    '<span class="text"><sup class="versenum">2 </sup>Eighteen two.</span></p>\n'
+    '</div>'
+)
 
-def gateway_error(self, book, chapter):
+
+def gateway_error(self, book, chapter, version='NIV', deadline=None, end_chapter=None):
     raise ValueError('Error!')
 
 
@@ -18,25 +37,17 @@ def bible_get_verse(self, book, chapter, start, end):
 
 
 def test_bible_gateway_success(mocker: MockFixture):
-    def gateway_success(self, book, chapter):
+    def gateway_success(self, book, chapter, version='NIV', deadline=None, end_chapter=None):
         return ''
 
     mocker.patch('bible.bible_gateway.BibleGateway.get_html', gateway_success)
 
-    def extract_verses(self, from_v, to_v):
-        return 'verses'
-
-    mocker.patch(
-        'bible.bible_gateway.BibleGatewayParser.extract_verses',
-        extract_verses
-    )
-
-    def get_footnotes(self):
-        return [('from', 'footnote')]
+    def extract_verses_with_footnotes(self, from_verse, to_verse):
+        return ('verses', [('from', 'footnote')])
 
     mocker.patch(
-        'bible.bible_gateway.BibleGatewayParser.get_footnotes',
-        get_footnotes
+        'bible.bible_gateway.BibleGatewayParser.extract_verses_with_footnotes',
+        extract_verses_with_footnotes
     )
 
     manager = TaskMessageManager()
@@ -56,3 +67,190 @@ def test_bible_gateway_error_fallbacks_to_local_bible(mocker: MockFixture):
     manager.get_task_message(TASK)
 
     assert spy_bible.call_count == 1
+
+
+def test_bible_gateway_does_not_load_local_bible(mocker: MockFixture):
+    mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                 return_value=get_test_asset_content('col-3.txt'))
+
+    metadata = BibleMetadata({'colossians': [29, 23, 25, 18]})
+    manager = TaskMessageManager(metadata=metadata)
+
+    message = manager.get_task_message(
+        ReadingTask('col', 3, 1, 1000, datetime.now()))
+
+    assert 'Living as Those Made Alive in Christ' in message
+    assert manager.registry.loaded_versions == []
+
+
+def test_passage_is_rendered_once_per_version(mocker: MockFixture):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                            return_value=get_test_asset_content('col-3.txt'))
+
+    registry = BibleRegistry(translations={'NIV': 'niv.xml', 'ESV': None},
+                             metadata=BibleMetadata({'colossians': [29, 23, 25, 18]}))
+    manager = TaskMessageManager(registry=registry)
+    task = ReadingTask('col', 3, 1, 1000, datetime.now())
+
+    for _ in range(3):
+        manager.get_task_message(task, 'niv')
+        manager.get_task_message(task, 'ESV')
+        manager.get_task_message(task)
+
+    versions = [call.args[2] for call in get_html.call_args_list]
+    assert versions == ['NIV', 'ESV']
+
+
+def test_rendered_message_is_shared_by_equal_passages(mocker: MockFixture):
+    mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                 return_value=get_test_asset_content('col-3.txt'))
+    parse = mocker.spy(BibleGatewayParser, 'get_passage')
+
+    manager = TaskMessageManager(metadata=BibleMetadata({'colossians': [29, 23, 25, 18]}))
+
+    # The same passage, written differently.
+    first = manager.get_task_message(ReadingTask('col', 3, 1, 1000, datetime.now()))
+    second = manager.get_task_message(ReadingTask('Colossians', 3, 0, 25, datetime.now()))
+
+    assert first == second
+    assert parse.call_count == 1
+
+
+def test_rendered_message_is_persisted(mocker: MockFixture, tmp_path):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                            return_value=get_test_asset_content('col-3.txt'))
+    metadata = BibleMetadata({'colossians': [29, 23, 25, 18]})
+    task = ReadingTask('col', 3, 1, 1000, datetime.now())
+
+    def create_manager():
+        render_cache = RenderCache(store=PageCache(cache_dir=str(tmp_path)))
+        return TaskMessageManager(metadata=metadata, render_cache=render_cache)
+
+    message = create_manager().get_task_message(task)
+
+    assert create_manager().get_task_message(task) == message
+    assert get_html.call_count == 1
+
+
+def test_open_circuit_fallbacks_to_local_bible_without_fetching(mocker: MockFixture):
+    mocker.patch('bible.bible.Bible.get_verses_from_chapter', bible_get_verse)
+    client_get = mocker.patch('bible.gateway_client.GatewayClient.get')
+
+    breaker = CircuitBreaker()
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+
+    manager = TaskMessageManager(bible=Bible(), gateway=BibleGateway(breaker=breaker))
+    manager.get_task_message(TASK)
+
+    assert client_get.call_count == 0
+
+
+def test_short_deadline_fallbacks_to_local_bible_without_fetching(mocker: MockFixture):
+    mocker.patch('bible.bible.Bible.get_verses_from_chapter', bible_get_verse)
+    client_get = mocker.patch('bible.gateway_client.GatewayClient.get')
+
+    # A new client expects a fetch to take a second.
+    gateway = BibleGateway(client=GatewayClient())
+    manager = TaskMessageManager(bible=Bible(), gateway=gateway)
+    manager.get_task_message(TASK, deadline=time.monotonic() + 0.1)
+
+    assert client_get.call_count == 0
+
+
+def test_cached_and_local_messages_do_not_fetch(mocker: MockFixture):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                            return_value=get_test_asset_content('col-3.txt'))
+    mocker.patch('bible.bible.Bible.get_verses_from_chapter', bible_get_verse)
+
+    manager = TaskMessageManager(bible=Bible())
+    task = ReadingTask('col', 3, 1, 1000, datetime.now())
+
+    assert manager.get_cached_message(task) is None
+    assert manager.get_local_message(task) == manager.get_local_message(task)
+    assert get_html.call_count == 0
+
+    message = manager.get_gateway_message(task)
+
+    assert manager.get_cached_message(task) == message
+    assert get_html.call_count == 1
+
+
+def test_cached_message_does_not_read_shared_tier(mocker: MockFixture):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html')
+    shared = mocker.Mock()
+    shared.get_entry.return_value = 'shared message'
+
+    manager = TaskMessageManager(render_cache=RenderCache(shared=shared))
+    task = ReadingTask('col', 3, 1, 1000, datetime.now())
+
+    assert manager.get_cached_message(task) is None
+    assert shared.get_entry.call_count == 0
+
+    assert manager.get_gateway_message(task) == 'shared message'
+    assert get_html.call_count == 0
+
+
+def test_chapter_range_is_fetched_once(mocker: MockFixture):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html', return_value=CHAPTERS_HTML)
+
+    metadata = BibleMetadata({'john': [1] * 16 + [3, 2]})
+    manager = TaskMessageManager(metadata=metadata)
+
+    message = manager.get_task_message(ReadingTask('john', 17, 2, 1000, datetime.now(), 18))
+
+    get_html.assert_called_once()
+    assert get_html.call_args.kwargs['end_chapter'] == 18
+    assert '<u><b>John 17</b></u>' in message
+    assert '<u><b>John 18</b></u>' in message
+    assert 'Two.' in message and 'One.' not in message
+    assert message.index('Three.') < message.index('Arrest') < message.index('Eighteen two.')
+
+
+def test_chapter_range_falls_back_when_page_has_one_chapter(mocker: MockFixture):
+    mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                 return_value=get_test_asset_content('john-17.txt'))
+    get_verses = mocker.patch('bible.bible.Bible.get_verses_from_chapter', return_value=['verse'])
+
+    metadata = BibleMetadata({'john': [1] * 16 + [26, 40]})
+    manager = TaskMessageManager(bible=Bible(), metadata=metadata)
+
+    message = manager.get_task_message(ReadingTask('john', 17, 2, 10, datetime.now(), 18))
+
+    # The local Bible is used, up to the last verse of the first chapter
+    assert [call.args[1:] for call in get_verses.call_args_list] == [(17, 2, 26), (18, 1, 10)]
+    assert message.count('<u><b>John 17</b></u>') == 1
+
+
+def test_partial_range_has_only_its_footnotes(mocker: MockFixture):
+    mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                 return_value=get_test_asset_content('partial.txt'))
+
+    manager = TaskMessageManager(metadata=BibleMetadata({'micah': [16]}))
+
+    whole = manager.get_task_message(ReadingTask('micah', 1, 1, 1000, datetime.now()))
+    partial = manager.get_task_message(ReadingTask('micah', 1, 11, 12, datetime.now()))
+
+    assert 'g. Micah 1:15' in whole
+    assert 'a. Micah 1:11 - <i>Shaphir</i>' in partial
+    assert 'c. Micah 1:12' in partial
+    assert 'd. ' not in partial
+    assert len(partial) < len(whole)
+
+
+def test_local_message_numbers_verses_from_start_of_passage(mocker: MockFixture):
+    mocker.patch('bible.bible.Bible.get_verses_from_chapter',
+                 lambda self, book, chapter, start, end: [f'{chapter}:{i}' for i in range(start, end + 1)])
+
+    metadata = BibleMetadata({'john': [1] * 2 + [36, 24]})
+    manager = TaskMessageManager(bible=Bible(), metadata=metadata)
+
+    partial = manager.get_local_message(ReadingTask('john', 3, 16, 18, datetime.now()))
+
+    assert '¹⁶ 3:16\n¹⁷ 3:17\n¹⁸ 3:18' in partial
+    assert '¹ ' not in partial
+
+    chapters = manager.get_local_message(ReadingTask('john', 3, 35, 2, datetime.now(), 4))
+
+    assert '³⁵ 3:35\n³⁶ 3:36' in chapters
+    assert '¹ 4:1\n² 4:2' in chapters
@@ -0,0 +1,244 @@
+import time
+from bible.bible_gateway import BibleGateway
+from bible.circuit_breaker import STATE_CLOSED, CircuitBreaker
+from bible.gateway_client import DeadlineExceeded, GatewayClient, RateLimiter, get_default_client
+import pytest
+import requests
+import requests_mock
+
+URL = 'https://www.biblegateway.com/passage/?search=colossians+3&version=NIV'
+
+
+def create_client(**kwargs) -> GatewayClient:
+    """A client that records its waits instead of sleeping."""
+    waits = []
+    client = GatewayClient(sleep=waits.append, **kwargs)
+    client.waits = waits
+
+    return client
+
+
+def test_success_uses_timeouts():
+    client = create_client(connect_timeout=2, read_timeout=5)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='page')
+        response = client.get(URL)
+
+    assert response.text == 'page'
+    assert mock.call_count == 1
+    assert mock.last_request.timeout == (2, 5)
+    assert client.waits == []
+
+
+def test_retries_retryable_status():
+    client = create_client(backoff_base=1, backoff_max=3)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [
+            {'status_code': 503},
+            {'status_code': 502},
+            {'status_code': 429},
+            {'text': 'page'},
+        ])
+        response = client.get(URL)
+
+    assert response.text == 'page'
+    assert mock.call_count == 4
+
+    # Jittered waits, bounded by the exponential backoff and its maximum.
+    assert len(client.waits) == 3
+    for retry, wait in enumerate(client.waits):
+        assert 0 <= wait <= min(3, 2 ** retry)
+
+
+def test_does_not_retry_other_errors():
+    client = create_client()
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=404)
+
+        with pytest.raises(requests.HTTPError):
+            client.get(URL)
+
+    assert mock.call_count == 1
+
+
+def test_retries_connection_errors():
+    client = create_client()
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [
+            {'exc': requests.ConnectionError},
+            {'exc': requests.ConnectTimeout},
+            {'text': 'page'},
+        ])
+
+        assert client.get(URL).text == 'page'
+
+    assert mock.call_count == 3
+
+
+def test_gives_up_after_max_retries():
+    client = create_client(max_retries=2)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=500)
+
+        with pytest.raises(requests.HTTPError):
+            client.get(URL)
+
+    assert mock.call_count == 3
+    assert len(client.waits) == 2
+
+
+def test_respects_retry_after():
+    client = create_client()
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [
+            {'status_code': 429, 'headers': {'Retry-After': '2'}},
+            {'text': 'page'},
+        ])
+        client.get(URL)
+
+    assert client.waits == [2]
+
+
+def test_does_not_wait_past_deadline():
+    client = create_client(total_timeout=1)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=503, headers={'Retry-After': '30'})
+
+        with pytest.raises(requests.HTTPError):
+            client.get(URL)
+
+    assert mock.call_count == 1
+    assert client.waits == []
+
+
+def test_deadline_already_passed():
+    client = create_client()
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='page')
+
+        with pytest.raises(requests.Timeout):
+            client.get(URL, deadline=time.monotonic() - 1)
+
+    assert mock.call_count == 0
+
+
+def test_timeouts_are_capped_by_deadline():
+    client = create_client(connect_timeout=5, read_timeout=10)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='page')
+        client.get(URL, deadline=time.monotonic() + 2)
+
+    (connect, read) = mock.last_request.timeout
+    assert 0 < connect <= 2
+    assert 0 < read <= 2
+
+
+def test_timeout_capped_by_deadline_is_deadline_exceeded():
+    client = create_client(connect_timeout=5, read_timeout=10)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, exc=requests.ReadTimeout)
+
+        with pytest.raises(DeadlineExceeded):
+            client.get(URL, deadline=time.monotonic() + 2)
+
+        # A timeout within the full timeout is Bible Gateway's
+        with pytest.raises(requests.ReadTimeout) as info:
+            client.get(URL, deadline=time.monotonic() + 60)
+
+    assert not isinstance(info.value, DeadlineExceeded)
+
+
+def test_gateways_share_the_default_client():
+    assert BibleGateway().client is get_default_client()
+    assert BibleGateway().client.session is BibleGateway().client.session
+
+
+def test_gateway_get_html_uses_client():
+    client = create_client()
+    gateway = BibleGateway(client=client)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [{'status_code': 503}, {'text': 'page'}])
+
+        assert gateway.get_html('colossians', 3) == 'page'
+
+    assert mock.call_count == 2
+
+
+def test_rate_limiter_spaces_out_requests():
+    now = [100.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+
+    limiter = RateLimiter(rate=4, clock=lambda: now[0], sleep=sleep)
+
+    for _ in range(3):
+        limiter.acquire()
+
+    assert waits == [0.25, 0.5]
+
+    # No wait once the interval has passed.
+    now[0] += 10
+    limiter.acquire()
+
+    assert waits == [0.25, 0.5]
+
+
+def test_client_waits_for_rate_limiter(mocker):
+    limiter = RateLimiter(rate=1)
+    acquire = mocker.patch.object(limiter, 'acquire')
+    client = create_client(rate_limiter=limiter)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [{'status_code': 503}, {'text': 'page'}])
+        client.get(URL)
+
+    assert acquire.call_count == 2
+
+
+def test_expected_latency_follows_fetch_times():
+    client = create_client()
+    client.expected_latency = 1.0
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='page')
+
+        for _ in range(20):
+            client.get(URL)
+
+    # Mocked fetches are nearly instant.
+    assert client.expected_latency < 0.05
+    assert client.can_fetch_by(time.monotonic() + 0.5)
+    assert not client.can_fetch_by(time.monotonic() + 0.01)
+    assert client.can_fetch_by(None)
+
+
+def test_gateway_gives_up_up_front_without_enough_time():
+    breaker = CircuitBreaker(min_calls=1)
+    gateway = BibleGateway(client=create_client(), breaker=breaker)
+    gateway.client.expected_latency = 1.0
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='page')
+
+        with pytest.raises(DeadlineExceeded):
+            gateway.get_html('colossians', 3, deadline=time.monotonic() + 0.5)
+
+        assert gateway.get_html('colossians', 3, deadline=time.monotonic() + 5) == 'page'
+
+    assert mock.call_count == 1
+
+    # Giving up is not a failure of Bible Gateway.
+    assert breaker.state == STATE_CLOSED
@@ -0,0 +1,136 @@
+import os
+from bible.bible_gateway import BibleGateway
+from bible.gateway_client import GatewayClient
+from bible.page_cache import PageCache, page_key
+import pytest
+import requests_mock
+
+URL = 'https://www.biblegateway.com/passage/?search=colossians+3&version=NIV'
+
+
+@pytest.fixture(params=[True, False], ids=['compressed', 'plain'])
+def cache(request, tmp_path) -> PageCache:
+    return PageCache(cache_dir=str(tmp_path), compress=request.param)
+
+
+def age(cache: PageCache, book: str, chapter: int, version: str, seconds: float):
+    """Moves the cached page's times back by the seconds."""
+    path = cache._entry_path(page_key(book, chapter, version))
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_get_returns_what_was_put(cache):
+    assert cache.get('john', 3, 'NIV') is None
+
+    cache.put('john', 3, 'NIV', '<p>For God so loved the world…</p>')
+
+    assert cache.get('john', 3, 'NIV') == '<p>For God so loved the world…</p>'
+    assert cache.get('john', 3, 'ESV') is None
+    assert cache.get('john', 4, 'NIV') is None
+    assert cache.get('JOHN', 3, 'niv') == '<p>For God so loved the world…</p>'
+
+
+def test_no_temporary_file_is_left(cache):
+    cache.put('john', 3, 'NIV', 'page')
+    cache.put('john', 3, 'NIV', 'new page')
+
+    assert len(os.listdir(cache.cache_dir)) == 1
+    assert cache.get('john', 3, 'NIV') == 'new page'
+
+
+def test_compression(tmp_path):
+    html = '<p>verse</p>' * 1000
+    compressed = PageCache(cache_dir=str(tmp_path / 'compressed'), compress=True)
+    plain = PageCache(cache_dir=str(tmp_path / 'plain'), compress=False)
+
+    compressed.put('john', 3, 'NIV', html)
+    plain.put('john', 3, 'NIV', html)
+
+    assert compressed.size < plain.size / 10
+    assert compressed.get('john', 3, 'NIV') == plain.get('john', 3, 'NIV') == html
+
+
+def test_expired_page_is_removed(cache):
+    cache.ttl = 60
+    cache.put('john', 3, 'NIV', 'page')
+    age(cache, 'john', 3, 'NIV', 30)
+
+    assert cache.get('john', 3, 'NIV') == 'page'
+
+    age(cache, 'john', 3, 'NIV', 60)
+
+    assert cache.get('john', 3, 'NIV') is None
+    assert cache.size == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = PageCache(cache_dir=str(tmp_path), compress=False, max_size=250)
+
+    cache.put('john', 1, 'NIV', 'a' * 100)
+    cache.put('john', 2, 'NIV', 'b' * 100)
+    age(cache, 'john', 1, 'NIV', 20)
+    age(cache, 'john', 2, 'NIV', 10)
+
+    # Reading chapter 1 makes chapter 2 the least recently used.
+    assert cache.get('john', 1, 'NIV') is not None
+
+    cache.put('john', 3, 'NIV', 'c' * 100)
+
+    assert cache.size <= 250
+    assert cache.get('john', 1, 'NIV') is not None
+    assert cache.get('john', 2, 'NIV') is None
+    assert cache.get('john', 3, 'NIV') is not None
+
+
+def test_clear(cache):
+    cache.put('john', 1, 'NIV', 'page')
+    cache.clear()
+
+    assert cache.get('john', 1, 'NIV') is None
+    assert cache.size == 0
+
+
+def create_page(text: str) -> str:
+    return f"<div class='std-text'><p>{text}</p></div>"
+
+
+def test_gateway_repeat_fetch_uses_cache(tmp_path):
+    gateway = BibleGateway(client=GatewayClient(), cache=PageCache(cache_dir=str(tmp_path)))
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text=create_page('page'))
+
+        assert gateway.get_html('colossians', 3) == create_page('page')
+        assert gateway.get_html('colossians', 3) == create_page('page')
+
+    assert mock.call_count == 1
+
+
+def test_gateway_fetches_expired_page(tmp_path):
+    cache = PageCache(cache_dir=str(tmp_path), ttl=60)
+    gateway = BibleGateway(client=GatewayClient(), cache=cache)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [{'text': create_page('old page')}, {'text': create_page('new page')}])
+
+        assert gateway.get_html('colossians', 3) == create_page('old page')
+        age(cache, 'colossians', 3, 'NIV', 120)
+        assert gateway.get_html('colossians', 3) == create_page('new page')
+
+    assert mock.call_count == 2
+    assert cache.get('colossians', 3, 'NIV') == create_page('new page')
+
+
+def test_gateway_does_not_cache_page_without_passage(tmp_path):
+    cache = PageCache(cache_dir=str(tmp_path))
+    gateway = BibleGateway(client=GatewayClient(), cache=cache)
+
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, text='<div class="search-result"><h3>No results found.</h3></div>')
+
+        gateway.get_html('colossians', 3)
+        gateway.get_html('colossians', 3)
+
+    assert mock.call_count == 2
+    assert cache.get('colossians', 3, 'NIV') is None
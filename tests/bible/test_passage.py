@@ -0,0 +1,167 @@
+from bible.bible_gateway import ENGINES, BibleGatewayParser
+from bible.passage import FootnoteMarker, Passage, VerseMarker, parse_verse_numbers
+from bible.utils import get_footnote_letter
+import pytest
+from tests.utils import get_test_asset_content
+
+# Verse 4 is omitted, like some verses in the NIV, and verses 6 and 7 are combined.
+HTML = (
+    '<div class="std-text">\n'
+    '<h3><span>Header</span></h3>\n'
+    '<p><span class="text"><span class="chapternum">1 </span>One.</span> '
+    '<span class="text"><sup class="versenum">2 </sup>Two.</span></p>\n'
+    '<h3><span>Middle</span></h3>\n'
+    '<p><span class="text"><sup class="versenum">3 </sup>Three.</span> '
+    '<span class="text"><sup class="versenum">5 </sup>Five.</span></p>\n'
+    '<p><span class="text"><sup class="versenum">6-7 </sup>Six and seven.</span> '
+    '<span class="text"><sup class="versenum">8 </sup>Eight.</span></p>\n'
+    '</div>'
+)
+
+
+def test_parse_verse_numbers():
+    assert parse_verse_numbers('12\xa0') == (12, 12)
+    assert parse_verse_numbers('6-7 ') == (6, 7)
+
+
+def test_verse_marker_is_formatted_verse_number():
+    marker = VerseMarker('12\xa0')
+
+    assert marker == ' <b>¹²</b> '
+    assert (marker.first, marker.last) == (12, 12)
+
+
+def test_from_lines_records_verse_offsets():
+    passage = Passage.from_lines([
+        ['<b>', 'Title', '</b>'],
+        ['One. ', VerseMarker('2'), 'Two. ', VerseMarker('3'), 'Three.'],
+    ])
+
+    assert passage.text == '<b>Title</b>\n\nOne.  <b>²</b> Two.  <b>³</b> Three.'
+    assert passage.verse_numbers == [2, 3]
+    assert passage.get_range(2, 2) == ' <b>²</b> Two. '
+    assert passage.get_range(3) == ' <b>³</b> Three.'
+
+
+@pytest.fixture(params=ENGINES)
+def passage(request):
+    return BibleGatewayParser(HTML, engine=request.param).get_passage()
+
+
+def test_whole_chapter(passage):
+    assert passage.get_range() == passage.text
+    assert passage.text.startswith('<b>Header</b>')
+
+
+def test_range_includes_headers_before_next_verse(passage):
+    assert passage.get_range(1, 2) == \
+        '<b>Header</b>\n\nOne. <b>²</b> Two.\n\n<b>Middle</b>\n\n'
+
+
+def test_range_ends_before_the_next_existing_verse(passage):
+    # There is no verse 4, so the range ends at verse 5.
+    assert passage.get_range(3, 3) == ' <b>³</b> Three.'
+    assert passage.get_range(2, 4) == ' <b>²</b> Two.\n\n<b>Middle</b>\n\n <b>³</b> Three.'
+
+
+def test_range_starts_at_the_next_existing_verse(passage):
+    assert passage.get_range(4, 5) == ' <b>⁵</b> Five.\n\n'
+
+
+def test_combined_verses(passage):
+    assert passage.get_range(7, 7) == ' <b>⁶⁷</b> Six and seven.'
+    assert passage.get_range(6, 6) == ' <b>⁶⁷</b> Six and seven.'
+    assert passage.get_range(8) == ' <b>⁸</b> Eight.'
+
+
+def test_range_after_the_last_verse_is_empty(passage):
+    assert passage.get_range(9, 10) == ''
+    assert passage.get_range(8, 20) == ' <b>⁸</b> Eight.'
+
+
+def test_several_ranges_from_one_parse(mocker):
+    parser = BibleGatewayParser(HTML)
+    spy = mocker.spy(Passage, 'from_lines')
+
+    assert parser.extract_verses(2, 2) == ' <b>²</b> Two.\n\n<b>Middle</b>\n\n'
+    assert parser.extract_verses(5, 8) == ' <b>⁵</b> Five.\n\n <b>⁶⁷</b> Six and seven. <b>⁸</b> Eight.'
+
+    assert spy.call_count == 1
+
+
+# Two chapters in one page, like a search for John 17-18.
+CHAPTERS_HTML = (
+    '<div class="std-text">\n'
+    '<h3><span>Prayer</span></h3>\n'
+    '<p><span class="text"><span class="chapternum">17 </span>One.</span> '
+    '<span class="text"><sup class="versenum">2 </sup>Two.</span></p>\n'
+    '<p><span class="text"><sup class="versenum">3 </sup>Three.</span></p>\n'
+    '<h3><span>Arrest</span></h3>\n'
+    '<h4><span>In the garden</span></h4>\n'
+    '<p><span class="text"><span class="chapternum">18 </span>Eighteen one.</span> '
+    '<span class="text"><sup class="versenum">2 </sup>Eighteen two.</span></p>\n'
+    '</div>'
+)
+
+
+@pytest.fixture(params=ENGINES)
+def chapters_passage(request):
+    return BibleGatewayParser(CHAPTERS_HTML, engine=request.param).get_passage()
+
+
+def test_chapter_markers_do_not_change_text(chapters_passage):
+    assert chapters_passage.chapters == [17, 18]
+    assert chapters_passage.text == (
+        '<b>Prayer</b>\n\nOne. <b>²</b> Two.\n\n <b>³</b> Three.\n\n'
+        '<b>Arrest</b>\n\n<b>In the garden</b>\n\nEighteen one. <b>²</b> Eighteen two.')
+
+
+def test_chapter_starts_at_its_headings(chapters_passage):
+    first = chapters_passage.get_chapter(17)
+    second = chapters_passage.get_chapter(18)
+
+    assert first.text == '<b>Prayer</b>\n\nOne. <b>²</b> Two.\n\n <b>³</b> Three.'
+    assert second.text == '<b>Arrest</b>\n\n<b>In the garden</b>\n\nEighteen one. <b>²</b> Eighteen two.'
+
+
+def test_chapter_verse_ranges(chapters_passage):
+    assert chapters_passage.get_chapter(17).get_range(2, 2) == ' <b>²</b> Two.\n\n'
+    assert chapters_passage.get_chapter(17).get_range(3) == ' <b>³</b> Three.'
+    assert chapters_passage.get_chapter(18).get_range(1, 1) == \
+        '<b>Arrest</b>\n\n<b>In the garden</b>\n\nEighteen one.'
+    assert chapters_passage.get_chapter(18).get_range(2) == ' <b>²</b> Eighteen two.'
+
+
+def test_missing_chapter(chapters_passage):
+    with pytest.raises(KeyError):
+        chapters_passage.get_chapter(19)
+
+
+def test_single_chapter_is_its_own_chapter(passage):
+    assert passage.get_chapter(1) is passage
+
+
+def test_page_without_the_chapter_is_not_split(passage):
+    # E.g. a search for two chapters that returned a page of one chapter
+    with pytest.raises(KeyError):
+        passage.get_chapter(2)
+
+    unnumbered = BibleGatewayParser(get_test_asset_content('psalm-1.txt')).get_passage()
+
+    with pytest.raises(KeyError):
+        unnumbered.get_chapter(1)
+
+
+def test_footnote_letters():
+    assert [get_footnote_letter(i) for i in (0, 1, 25, 26, 27, 701, 702)] == \
+        ['a', 'b', 'z', 'aa', 'ab', 'zz', 'aaa']
+
+
+def test_footnotes_follow_chapters():
+    passage = Passage.from_lines([
+        ['One', FootnoteMarker('[a]', 'fn-a'), VerseMarker('2'), 'Two', FootnoteMarker('[b]', 'fn-b')],
+        [VerseMarker('3'), 'Three', FootnoteMarker('[c]', None)],
+    ])
+
+    assert passage.get_range_with_footnotes(2) == (' <b>²</b> Two<i>[a]</i>\n\n <b>³</b> Three<i>[c]</i>', ['fn-b'])
+    assert passage.get_range_with_footnotes(1, 1, first_footnote=4) == ('One<i>[e]</i>', ['fn-a'])
@@ -0,0 +1,60 @@
+import pickle
+from datetime import date, datetime
+from bible.plan_manager import PlanIndex, PlanManager, ReadingTask
+import pytest
+
+
+def create_task(day: int, chapter: int = 1) -> ReadingTask:
+    return ReadingTask('john', chapter, 1, 1000, date(2022, 1, day))
+
+
+def test_reading_task_is_immutable():
+    task = create_task(3)
+
+    with pytest.raises(AttributeError):
+        task.chapter = 2
+
+    with pytest.raises(AttributeError):
+        task.extra = 'value'
+
+    assert not hasattr(task, '__dict__')
+
+
+def test_reading_task_is_a_value():
+    assert create_task(3) == create_task(3)
+    assert create_task(3) != create_task(3, chapter=2)
+    assert len({create_task(3), create_task(3), create_task(4)}) == 2
+    assert pickle.loads(pickle.dumps(create_task(3))) == create_task(3)
+
+
+def test_plan_index_range_queries():
+    index = PlanIndex([create_task(day) for day in (9, 3, 5, 7)])
+
+    assert [task.date.day for task in index] == [3, 5, 7, 9]
+    assert [task.date.day for task in index.get_tasks(date(2022, 1, 4), date(2022, 1, 7))] == [5, 7]
+    assert [task.date.day for task in index.get_tasks(datetime(2022, 1, 7, 12))] == [7, 9]
+    assert [task.date.day for task in index.get_tasks(end_date=date(2022, 1, 3))] == [3]
+    assert index.get_tasks(date(2022, 1, 10)) == []
+
+
+def test_plan_index_point_lookup():
+    index = PlanIndex()
+    index.add(create_task(5))
+    index.add(create_task(3))
+    index.add(create_task(5, chapter=2))
+
+    assert len(index) == 2
+    assert index.get_task_at(date(2022, 1, 5)) == create_task(5, chapter=2)
+    assert index.get_task_at(datetime(2022, 1, 3, 8)) == create_task(3)
+    assert index.get_task_at(date(2022, 1, 4)) is None
+
+
+def test_plan_manager_uses_date_order():
+    manager = PlanManager([
+        ['05-Jan-22', 'john', '2', '', ''],
+        ['03-Jan-22', 'john', '17-18', '3', '10'],
+    ])
+
+    assert [task.date for task in manager.get_tasks()] == [date(2022, 1, 3), date(2022, 1, 5)]
+    assert manager.get_task_at(date(2022, 1, 3)) == \
+        ReadingTask('john', 17, 3, 10, date(2022, 1, 3), 18)
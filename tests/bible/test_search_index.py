@@ -0,0 +1,141 @@
+import os
+from bible.bible_index import BibleIndex, build_index
+from bible.bible_metadata import BibleMetadata
+from bible.search_index import SearchIndex, build_search_index, tokenize
+from ..utils import test_asset_dir
+import pytest
+
+XML_PATH = os.path.join(test_asset_dir, 'mini-bible.xml')
+
+
+@pytest.fixture
+def search_index(tmp_path):
+    index_path = os.path.join(tmp_path, 'mini-bible.idx')
+    build_index(XML_PATH, index_path)
+
+    text = BibleIndex(index_path)
+    search_path = os.path.join(tmp_path, 'mini-bible.search')
+    build_search_index(text, search_path)
+
+    index = SearchIndex(search_path, BibleMetadata.from_text(text))
+    yield index
+
+    index.close()
+    text.close()
+
+
+def _references(results):
+    return [(result.book, result.chapter, result.verse) for result in results]
+
+
+def test_tokenize():
+    assert tokenize('And God said, “Let there be light,”') == [
+        'and', 'god', 'said', 'let', 'there', 'be', 'light']
+    assert tokenize("the Lord's law") == ['the', 'lords', 'law']
+
+
+def test_single_word(search_index):
+    results = search_index.search('light')
+
+    assert sorted(_references(results)) == [
+        ('1 john', 1, 5), ('genesis', 1, 3)]
+
+    # The verse that says "light" twice ranks first.
+    assert _references(results)[0] == ('genesis', 1, 3)
+
+
+def test_all_words_must_match(search_index):
+    assert sorted(_references(search_index.search('God light'))) == [
+        ('1 john', 1, 5), ('genesis', 1, 3)]
+
+    assert search_index.search('light seventh') == []
+    assert search_index.search('unknownword light') == []
+
+
+def test_case_and_punctuation_are_ignored(search_index):
+    assert _references(search_index.search('SEVENTH, day!')) == [
+        ('genesis', 2, 2)]
+
+
+def test_phrase(search_index):
+    # Both verses have "the" and "beginning", but only one has the phrase.
+    assert _references(search_index.search('"in the beginning"')) == [
+        ('genesis', 1, 1)]
+    assert sorted(_references(search_index.search('"the beginning"'))) == [
+        ('1 john', 1, 1), ('genesis', 1, 1)]
+
+    assert search_index.search('"beginning the"') == []
+
+
+def test_limit(search_index):
+    results = search_index.search('the', limit=3)
+
+    assert len(results) == 3
+    assert [r.score for r in results] == sorted(
+        [r.score for r in results], reverse=True)
+
+
+def test_empty_query(search_index):
+    assert search_index.search('') == []
+    assert search_index.search('?!') == []
+
+
+def test_reference(search_index):
+    assert search_index.reference(0) == ('genesis', 1, 1)
+    assert search_index.reference(3) == ('genesis', 2, 1)
+    assert search_index.reference(5) == ('psalms', 1, 1)
+    assert search_index.reference(11) == ('1 john', 1, 5)
+
+
+class _GeneratedText:
+    """A text store with enough verses for the postings to have skip entries."""
+
+    def __init__(self, verses):
+        self.verses = verses
+
+    @property
+    def book_names(self):
+        return ['book']
+
+    def chapter_count(self, book):
+        return 1
+
+    def verse_count(self, book, chapter):
+        return len(self.verses)
+
+    def get_verses(self, book, chapter, start, end):
+        return self.verses[start - 1:end]
+
+
+def test_matches_scan_on_long_postings(tmp_path):
+    words = ['alpha', 'beta', 'gamma', 'delta']
+    verses = [' '.join(word for j, word in enumerate(words) if i % (j + 2) == 0) + ' end'
+              for i in range(1000)]
+
+    text = _GeneratedText(verses)
+    path = os.path.join(tmp_path, 'generated.search')
+    build_search_index(text, path)
+
+    index = SearchIndex(path, BibleMetadata({'book': [len(verses)]}))
+
+    for query in ['alpha', 'alpha gamma', 'delta beta', 'gamma delta end', '"alpha beta"']:
+        terms = tokenize(query)
+        expected = [i + 1 for i, verse in enumerate(verses)
+                    if all(term in tokenize(verse) for term in terms)]
+
+        if query.startswith('"'):
+            expected = [verse for verse in expected if ' '.join(terms) in verses[verse - 1]]
+
+        results = index.search(query, limit=len(verses))
+        assert sorted(result.verse for result in results) == expected
+
+    index.close()
+
+
+def test_metadata_mismatch(tmp_path):
+    text = _GeneratedText(['a', 'b'])
+    path = os.path.join(tmp_path, 'generated.search')
+    build_search_index(text, path)
+
+    with pytest.raises(ValueError):
+        SearchIndex(path, BibleMetadata({'book': [3]}))
@@ -1,4 +1,4 @@
-from bible.utils import get_superscript
+from bible.utils import get_book_title, get_superscript
 
 
 def test_superscript_zero():
@@ -7,3 +7,8 @@ def test_superscript_zero():
 
 def test_superscript_multiple_digit():
     assert get_superscript(12) == '¹²'
+
+
+def test_book_title():
+    assert get_book_title('song of songs') == 'Song of Songs'
+    assert get_book_title('1 john') == '1 John'
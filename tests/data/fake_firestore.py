@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.transforms import ArrayRemove, ArrayUnion
+
+
+class FakeClient:
+    """An in-memory stand-in for `firestore.Client`, with only what the repositories use. Every
+    commit of a batch is recorded with its number of writes, and every document that is read is
+    counted, like Firestore bills it.
+    """
+
+    def __init__(self) -> None:
+        self.collections: Dict[str, 'FakeCollection'] = {}
+        self.commits: List[int] = []
+        self.transactions: List['FakeTransaction'] = []
+        self.reads = 0
+        self._time = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+    def collection(self, name: str) -> 'FakeCollection':
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+
+        return self.collections[name]
+
+    def batch(self) -> 'FakeBatch':
+        return FakeBatch(self)
+
+    def transaction(self) -> 'FakeTransaction':
+        self.transactions.append(FakeTransaction())
+        return self.transactions[-1]
+
+    def _next_time(self) -> datetime:
+        self._time += timedelta(seconds=1)
+        return self._time
+
+
+class FakeSnapshot:
+    def __init__(self, reference: 'FakeDocument', data: Optional[dict],
+                 update_time: Optional[datetime] = None) -> None:
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self) -> Optional[dict]:
+        return None if self._data is None else dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, collection: 'FakeCollection', id: str) -> None:
+        self.collection = collection
+        self.id = id
+
+    def get(self, transaction=None, timeout: Optional[float] = None) -> FakeSnapshot:
+        self.collection.timeouts.append(timeout)
+        return self.collection._snapshot(self.id)
+
+    def set(self, data: dict, timeout: Optional[float] = None):
+        self.collection.timeouts.append(timeout)
+        self.collection._set(self.id, data)
+
+    def update(self, data: dict):
+        self.collection._update(self.id, data)
+
+    def delete(self):
+        self.collection._delete(self.id)
+
+
+class FakeQuery:
+    def __init__(self, collection: 'FakeCollection', filters: tuple = (),
+                 fields: Optional[List[str]] = None, count: Optional[int] = None,
+                 after: Optional[str] = None) -> None:
+        self.collection = collection
+        self.filters = filters
+        self.fields = fields
+        self.count = count
+        self.after = after
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        args = dict(filters=self.filters, fields=self.fields, count=self.count, after=self.after)
+        args.update(changes)
+        return FakeQuery(self.collection, **args)
+
+    def where(self, field: str, op: str, value) -> 'FakeQuery':
+        return self._copy(filters=self.filters + ((field, op, value),))
+
+    def select(self, fields: List[str]) -> 'FakeQuery':
+        return self._copy(fields=list(fields))
+
+    def order_by(self, _) -> 'FakeQuery':
+        # Documents are always in order of their ids, which is the only order that is used.
+        return self
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(count=count)
+
+    def start_after(self, snapshot: FakeSnapshot) -> 'FakeQuery':
+        return self._copy(after=snapshot.id)
+
+    def _matches(self, data: dict) -> bool:
+        for (field, op, value) in self.filters:
+            if op == '==' and data.get(field) != value:
+                return False
+            if op == 'in' and data.get(field) not in value:
+                return False
+            if op == 'array_contains' and value not in data.get(field, []):
+                return False
+
+        return True
+
+    def stream(self, transaction=None, timeout: Optional[float] = None) -> List[FakeSnapshot]:
+        self.collection.queries.append(self)
+        self.collection.timeouts.append(timeout)
+
+        result = []
+        for doc_id in sorted(self.collection.docs):
+            data = self.collection.docs[doc_id]
+
+            if self.after is not None and doc_id <= self.after:
+                continue
+            if not self._matches(data):
+                continue
+            if self.count is not None and len(result) == self.count:
+                break
+
+            if self.fields is not None:
+                data = {field: data[field] for field in self.fields if field in data}
+
+            result.append(FakeSnapshot(self.collection.document(doc_id), dict(data),
+                                       self.collection.update_times[doc_id]))
+
+        self.collection.client.reads += len(result)
+        return result
+
+    def get(self, transaction=None, timeout: Optional[float] = None) -> List[FakeSnapshot]:
+        return self.stream(transaction, timeout)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client: FakeClient, name: str) -> None:
+        super().__init__(self)
+        self.client = client
+        self.name = name
+        self.docs: Dict[str, dict] = {}
+        self.update_times: Dict[str, datetime] = {}
+
+        # The queries that were run, and the timeouts of every read.
+        self.queries: List[FakeQuery] = []
+        self.timeouts: List[Optional[float]] = []
+
+    def document(self, id: str) -> FakeDocument:
+        return FakeDocument(self, id)
+
+    def _snapshot(self, doc_id: str) -> FakeSnapshot:
+        data = self.docs.get(doc_id)
+
+        if data is not None:
+            self.client.reads += 1
+
+        return FakeSnapshot(self.document(doc_id), None if data is None else dict(data),
+                            self.update_times.get(doc_id))
+
+    def _set(self, doc_id: str, data: dict):
+        self.docs[doc_id] = dict(data)
+        self.update_times[doc_id] = self.client._next_time()
+
+    def _update(self, doc_id: str, changes: dict):
+        if doc_id not in self.docs:
+            raise NotFound(f'No document to update: {self.name}/{doc_id}')
+
+        data = dict(self.docs[doc_id])
+
+        for field, value in changes.items():
+            if isinstance(value, ArrayUnion):
+                data[field] = data.get(field, []) + [v for v in value.values if v not in data.get(field, [])]
+            elif isinstance(value, ArrayRemove):
+                data[field] = [v for v in data.get(field, []) if v not in value.values]
+            else:
+                data[field] = value
+
+        self._set(doc_id, data)
+
+    def _delete(self, doc_id: str):
+        self.docs.pop(doc_id, None)
+        self.update_times.pop(doc_id, None)
+
+
+class FakeBatch:
+    def __init__(self, client: FakeClient) -> None:
+        self.client = client
+        self.writes = []
+
+    def set(self, ref: FakeDocument, data: dict):
+        self.writes.append(lambda: ref.set(data))
+
+    def update(self, ref: FakeDocument, data: dict):
+        self.writes.append(lambda: ref.update(data))
+
+    def delete(self, ref: FakeDocument):
+        self.writes.append(ref.delete)
+
+    def commit(self):
+        for write in self.writes:
+            write()
+
+        self.client.commits.append(len(self.writes))
+
+
+class FakeTransaction:
+    """Applies the writes as they are made, and records them as (operation, document id, data)."""
+
+    def __init__(self) -> None:
+        self.writes = []
+
+    def get(self, query: FakeQuery) -> List[FakeSnapshot]:
+        return query.stream()
+
+    def set(self, ref: FakeDocument, data: dict):
+        self.writes.append(('set', ref.id, data))
+        ref.set(data)
+
+    def update(self, ref: FakeDocument, data: dict):
+        self.writes.append(('update', ref.id, data))
+        ref.update(data)
+
+    def delete(self, ref: FakeDocument):
+        self.writes.append(('delete', ref.id, None))
+        ref.delete()
@@ -0,0 +1,56 @@
+from data.firestore_repository import write_in_batches
+from data.subscriber_repository import SubscriberRepository
+from tests.data.fake_firestore import FakeClient
+
+
+def test_write_in_batches_splits_at_batch_size():
+    client = FakeClient()
+    collection = client.collection('items')
+    collection._set('old', {'value': 0})
+
+    progress = []
+    groups = [[(str(i), {'value': i})] for i in range(5)]
+    groups.append([('5', {'value': 5}), ('old', None)])
+
+    write_in_batches(client, collection, groups,
+                     on_progress=lambda done, total: progress.append((done, total)), batch_size=3)
+
+    # A group is never split between batches
+    assert client.commits == [3, 2, 2]
+    assert progress == [(3, 6), (5, 6), (6, 6)]
+    assert collection.docs == {str(i): {'value': i} for i in range(6)}
+
+
+def test_write_in_batches_commits_full_batches():
+    client = FakeClient()
+    collection = client.collection('items')
+
+    write_in_batches(client, collection, [[(str(i), {})] for i in range(1001)])
+
+    assert client.commits == [500, 500, 1]
+
+
+def test_write_in_batches_without_writes_commits_nothing():
+    client = FakeClient()
+
+    write_in_batches(client, client.collection('items'), [])
+
+    assert client.commits == []
+
+
+def test_iter_reads_a_page_at_a_time():
+    client = FakeClient()
+    repo = SubscriberRepository(client)
+
+    for chat_id in range(100, 107):
+        repo.collection._set(str(chat_id), {'chat_id': str(chat_id), 'sub_items': []})
+
+    items = repo.iter(page_size=3)
+
+    # Only the first page is read before the first item is used
+    assert next(items).chat_id == '100'
+    assert len(repo.collection.queries) == 1
+
+    assert [item.chat_id for item in items] == [str(chat_id) for chat_id in range(101, 107)]
+    assert len(repo.collection.queries) == 3
+    assert client.reads == 7
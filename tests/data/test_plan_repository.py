@@ -0,0 +1,98 @@
+from datetime import date
+import pytest
+from google.api_core.exceptions import DeadlineExceeded
+from bible.plan_manager import ReadingTask
+from data.plan_repository import PlanRepository
+from tests.data.fake_firestore import FakeClient
+
+
+def create_task(day: int, book: str = 'john') -> ReadingTask:
+    return ReadingTask(book, day, 1, 1000, date(2022, 1, day))
+
+
+def create_repo(docs: dict, legacy_lookup: bool = True):
+    client = FakeClient()
+    repo = PlanRepository(client, legacy_lookup=legacy_lookup)
+
+    for doc_id, data in docs.items():
+        repo.collection._set(doc_id, data)
+
+    return (client, repo)
+
+
+def test_get_plan_at_reads_document_of_date():
+    (client, repo) = create_repo({'2022-01-03': create_task(3).to_dict()})
+
+    assert repo.get_plan_at(date(2022, 1, 3)) == create_task(3)
+    assert repo.collection.queries == []
+    assert client.reads == 1
+
+
+def test_get_plan_at_falls_back_to_legacy_query():
+    (_, repo) = create_repo({'random-id': create_task(3).to_dict()})
+
+    assert repo.get_plan_at(date(2022, 1, 3)) == create_task(3)
+    assert repo.get_plan_at(date(2022, 1, 4)) is None
+
+    repo.legacy_lookup = False
+    assert repo.get_plan_at(date(2022, 1, 3)) is None
+
+
+def test_migrate_plan_ids_keeps_keyed_document_or_last_updated():
+    (client, repo) = create_repo({
+        # Already keyed, so its duplicate is only deleted
+        '2022-01-03': create_task(3).to_dict(),
+        'random-3': create_task(3, 'mark').to_dict(),
+        # Not keyed, so the last updated is kept
+        'b-random-4': create_task(4, 'luke').to_dict(),
+        'a-random-4': create_task(4).to_dict(),
+        'invalid': {'date': 'someday'},
+    })
+
+    assert repo.migrate_plan_ids() == 2
+    assert repo.collection.docs == {
+        '2022-01-03': create_task(3).to_dict(),
+        '2022-01-04': create_task(4).to_dict(),
+        'invalid': {'date': 'someday'},
+    }
+
+    # Running it again changes nothing
+    assert repo.migrate_plan_ids() == 0
+    assert len(client.commits) == 1
+
+
+def test_upsert_plans_only_reads_documents_of_their_dates():
+    old_plans = {f'random-{day}': create_task(day, 'mark').to_dict() for day in range(1, 31)}
+    (client, repo) = create_repo(old_plans)
+
+    assert repo.upsert_plans([create_task(day) for day in range(3, 15)]) == 12
+
+    # The older documents of the 12 dates are replaced, in queries of 10 dates
+    assert len(repo.collection.queries) == 2
+    assert client.reads == 12
+    assert repo.get_plan_at(date(2022, 1, 3)) == create_task(3)
+    assert 'random-3' not in repo.collection.docs
+    assert 'random-15' in repo.collection.docs
+
+
+def test_upsert_plans_without_legacy_lookup_only_writes():
+    (client, repo) = create_repo({'random-3': create_task(3, 'mark').to_dict()},
+                                 legacy_lookup=False)
+
+    repo.upsert_plan(create_task(3))
+
+    assert repo.collection.queries == []
+    assert client.reads == 0
+    assert client.commits == [1]
+
+
+def test_get_plan_at_skips_legacy_query_without_time_left():
+    (_, repo) = create_repo({'random-id': create_task(3).to_dict()})
+
+    assert repo.get_plan_at(date(2022, 1, 3), timeout=5) == create_task(3)
+
+    with pytest.raises(DeadlineExceeded):
+        repo.get_plan_at(date(2022, 1, 3), timeout=0.0)
+
+    # Only the document of the date was read
+    assert repo.collection.timeouts[-1] == 0.0
@@ -0,0 +1,42 @@
+from data.rendered_message_repository import RenderedMessageRepository
+from tests.data.fake_firestore import FakeClient
+from tests.utils import FakeClock
+
+KEY = 'rendered\ncolossians\n3\n1\n25\nNIV\n1'
+
+
+def test_get_entry_returns_what_was_put():
+    repo = RenderedMessageRepository(FakeClient(), timeout=3)
+
+    assert repo.get_entry(KEY) is None
+
+    repo.put_entry(KEY, 'body')
+
+    assert repo.get_entry(KEY) == 'body'
+    assert repo.get_entry(KEY.replace('NIV', 'ESV')) is None
+    assert len(repo.collection.docs) == 1
+    assert set(repo.collection.timeouts) == {3}
+
+
+def test_entry_expires():
+    clock = FakeClock()
+    repo = RenderedMessageRepository(FakeClient(), ttl=60, clock=clock)
+    repo.put_entry(KEY, 'body')
+
+    clock.now += 59
+    assert repo.get_entry(KEY) == 'body'
+
+    clock.now += 1
+    assert repo.get_entry(KEY) is None
+
+    repo.put_entry(KEY, 'new body')
+    assert repo.get_entry(KEY) == 'new body'
+
+
+def test_get_entry_timeout_is_capped():
+    repo = RenderedMessageRepository(FakeClient(), timeout=3)
+
+    repo.get_entry(KEY, timeout=1)
+    repo.get_entry(KEY, timeout=10)
+
+    assert repo.collection.timeouts == [1, 3]
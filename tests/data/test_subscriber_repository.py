@@ -0,0 +1,124 @@
+import pytest
+from google.cloud import firestore
+from pytest_mock import MockFixture
+from data.subscriber_repository import SubscriberRepository, SubscriptionItem
+from tests.data.fake_firestore import FakeClient
+
+PLAN = SubscriptionItem.PULSE_BIBLE_READING_PLAN
+SERVICE = SubscriptionItem.SUNDAY_SERVICE
+
+
+@pytest.fixture(autouse=True)
+def run_transactions_once(mocker: MockFixture):
+    # The fake transaction has no commit to retry, so the function is run as it is.
+    mocker.patch('google.cloud.firestore.transactional', side_effect=lambda function: function)
+
+
+def create_repo(docs: dict, legacy_lookup: bool = True):
+    client = FakeClient()
+    repo = SubscriberRepository(client, legacy_lookup=legacy_lookup)
+
+    for doc_id, data in docs.items():
+        repo.collection._set(doc_id, data)
+
+    return (client, repo)
+
+
+def test_toggle_updates_keyed_document_in_place():
+    (client, repo) = create_repo({'100': {'chat_id': '100', 'sub_items': [SERVICE.value]}})
+
+    assert repo.toggle_subscription('100', PLAN) is True
+    assert client.transactions[-1].writes == [
+        ('update', '100', {'sub_items': firestore.ArrayUnion([PLAN.value])})]
+    assert repo.get('100').sub_items == {PLAN, SERVICE}
+
+    assert repo.toggle_subscription('100', PLAN) is False
+    assert client.transactions[-1].writes == [
+        ('update', '100', {'sub_items': firestore.ArrayRemove([PLAN.value])})]
+    assert repo.get('100').sub_items == {SERVICE}
+
+
+def test_toggle_moves_legacy_document_then_deletes_it():
+    (client, repo) = create_repo({'random-id': {'chat_id': '100', 'sub_items': [SERVICE.value],
+                                                'version': 'ESV'}})
+
+    assert repo.toggle_subscription('100', PLAN) is True
+
+    # The set and the delete are in the same transaction
+    assert [(op, doc_id) for (op, doc_id, _) in client.transactions[-1].writes] == \
+        [('set', '100'), ('delete', 'random-id')]
+    assert repo.collection.docs == {
+        '100': {'chat_id': '100', 'sub_items': [SERVICE.value, PLAN.value], 'version': 'ESV'}}
+
+
+def test_toggle_creates_missing_subscriber():
+    (_, repo) = create_repo({})
+
+    assert repo.toggle_subscription('100', PLAN) is True
+    assert repo.collection.docs == {
+        '100': {'chat_id': '100', 'sub_items': [PLAN.value], 'version': None}}
+
+
+def test_legacy_document_is_ignored_without_legacy_lookup():
+    (_, repo) = create_repo({'random-id': {'chat_id': '100', 'sub_items': [PLAN.value]}},
+                            legacy_lookup=False)
+
+    assert repo.get('100') is None
+    assert repo.toggle_subscription('100', PLAN) is True
+    assert set(repo.collection.docs) == {'100', 'random-id'}
+
+
+def test_set_version():
+    (client, repo) = create_repo({
+        '100': {'chat_id': '100', 'sub_items': [PLAN.value], 'version': None},
+        'random-id': {'chat_id': '200', 'sub_items': [PLAN.value]},
+    })
+
+    repo.set_version('100', 'ESV')
+    assert client.transactions[-1].writes == [('update', '100', {'version': 'ESV'})]
+
+    repo.set_version('200', 'KJV')
+    assert repo.collection.docs['200'] == {'chat_id': '200', 'sub_items': [PLAN.value], 'version': 'KJV'}
+    assert 'random-id' not in repo.collection.docs
+    assert repo.get('100').version == 'ESV'
+
+
+def test_migrate_ids_keeps_keyed_document_or_first_by_id():
+    (client, repo) = create_repo({
+        # Already keyed, so its duplicate is only deleted
+        '100': {'chat_id': '100', 'sub_items': [PLAN.value]},
+        'b-dup': {'chat_id': '100', 'sub_items': []},
+        # Not keyed, so the first by document id is kept
+        'y-200': {'chat_id': '200', 'sub_items': []},
+        'x-200': {'chat_id': '200', 'sub_items': [SERVICE.value]},
+        '300': {'chat_id': '300', 'sub_items': []},
+        'no-chat': {'sub_items': []},
+    })
+
+    assert repo.migrate_ids() == 2
+    assert repo.collection.docs == {
+        '100': {'chat_id': '100', 'sub_items': [PLAN.value]},
+        '200': {'chat_id': '200', 'sub_items': [SERVICE.value]},
+        '300': {'chat_id': '300', 'sub_items': []},
+        'no-chat': {'sub_items': []},
+    }
+
+    # Running it again changes nothing
+    assert repo.migrate_ids() == 0
+    assert len(client.commits) == 1
+
+
+def test_iter_by_subscription_reads_pages_and_yields_each_chat_once():
+    docs = {str(chat_id): {'chat_id': str(chat_id), 'sub_items': [PLAN.value]}
+            for chat_id in range(100, 105)}
+    docs['a-legacy'] = {'chat_id': '102', 'sub_items': [PLAN.value]}
+    docs['200'] = {'chat_id': '200', 'sub_items': [SERVICE.value]}
+    (_, repo) = create_repo(docs)
+
+    subscribers = list(repo.iter_by_subscription(PLAN, page_size=2))
+
+    assert [subscriber.chat_id for subscriber in subscribers] == ['100', '101', '102', '103', '104']
+    assert [subscriber.id for subscriber in subscribers][2] == '102'
+
+    # 6 matching documents in pages of 2, and an empty page to find the end
+    assert len(repo.collection.queries) == 4
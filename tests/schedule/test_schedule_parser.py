@@ -3,7 +3,7 @@ import csv
 from io import StringIO
 from datetime import datetime
 from bible.plan_manager import ReadingTask
-from schedule.schedule_parser import ScheduleParser
+from schedule.schedule_parser import ScheduleParser, parse_passage
 from bible.bible import Bible
 import pytest
 
@@ -59,3 +59,45 @@ def test_get_tasks_with_end_date():
 
     for task in tasks:
         assert task.date >= from_date.date() and task.date <= to_date.date()
+
+
+def test_parse_passage():
+    assert parse_passage('17') == (17, 1, 17, 1000)
+    assert parse_passage('17-18') == (17, 1, 18, 1000)
+    assert parse_passage('17 – 18') == (17, 1, 18, 1000)
+    assert parse_passage('119:1-88') == (119, 1, 119, 88)
+    assert parse_passage('3:16') == (3, 16, 3, 16)
+    assert parse_passage('3:16-4:5') == (3, 16, 4, 5)
+
+    with pytest.raises(ValueError):
+        parse_passage('17-')
+
+
+def test_parsing_passage_ranges():
+    ranges_csv = [
+        ['Dates', 'Week', 'Day 1', 'Day 2', 'Day 3', 'Day 4', 'Day 5', 'Day 6', 'Day 7', 'Remarks'],
+        ['', '1', 'John 17–18', '19 - 20', 'Ps 119:1-88', '119:89-176', '', '', '', ''],
+    ]
+    parser = ScheduleParser(ranges_csv, start, bible)
+    tasks = parser.get_tasks(start)
+
+    assert [(task.book, task.chapter, task.start_verse, task.end_chapter, task.end_verse)
+            for task in tasks] == [
+        ('john', 17, 1, 18, 1000),
+        ('john', 19, 1, 20, 1000),
+        ('psalms', 119, 1, 119, 88),
+        ('psalms', 119, 89, 119, 176),
+    ]
+    assert tasks[0].chapter_label == '17-18'
+    assert tasks[2].chapter_label == '119'
+
+
+def test_reading_task_from_doc_without_end_chapter(mocker):
+    doc = mocker.Mock()
+    doc.to_dict.return_value = {'book': 'john', 'chapter': 17, 'start_verse': 1,
+                                'end_verse': 1000, 'date': '03-Jan-22'}
+
+    task = ReadingTask.from_doc(doc)
+
+    assert task.end_chapter == 17
+    assert task.chapters == [17]
@@ -1,4 +1,7 @@
-from telegram_bot.message import split_html_message
+from typing import List
+from unittest.mock import MagicMock
+from telegram.error import BadRequest
+from telegram_bot.message import edit_html_message, split_html_message
 
 
 def test_split_verses():
@@ -13,3 +16,60 @@ def test_split_footnotes():
     expected = ['📝 <b>Footnotes</b>\n', 'a. 45\nb. 45\nc. 45\n', 'd. 45']
 
     assert split_html_message(footnotes, length=20) == expected
+
+
+def test_split_long_part_at_line_breaks():
+    message = '¹ 1111\n² 2222\n³ 3333'
+    expected = ['¹ 1111\n² 2222\n', '³ 3333']
+
+    assert split_html_message(message, length=16) == expected
+
+
+def test_split_long_part_without_line_breaks():
+    assert split_html_message('a' * 25, length=10) == ['a' * 10, 'a' * 10, 'a' * 5]
+
+
+def create_sent_messages(count: int) -> List[MagicMock]:
+    return [MagicMock(name=f'message {i}') for i in range(count)]
+
+
+def test_edit_keeps_the_split():
+    chat = MagicMock()
+    messages = create_sent_messages(2)
+    message = 'x' * 3000 + '\n' + 'y' * 3000
+
+    result = edit_html_message(chat, messages, message)
+
+    assert messages[0].edit_text.call_args.kwargs['text'] == 'x' * 3000 + '\n'
+    assert messages[1].edit_text.call_args.kwargs['text'] == 'y' * 3000
+    assert chat.send_message.call_count == 0
+    assert result == messages
+
+
+def test_edit_sends_more_parts():
+    chat = MagicMock()
+    messages = create_sent_messages(1)
+
+    result = edit_html_message(chat, messages, 'x' * 3000 + '\n' + 'y' * 3000)
+
+    assert messages[0].edit_text.call_count == 1
+    assert chat.send_message.call_args.kwargs['text'] == 'y' * 3000
+    assert result == [messages[0], chat.send_message.return_value]
+
+
+def test_edit_deletes_extra_parts():
+    messages = create_sent_messages(3)
+
+    result = edit_html_message(MagicMock(), messages, 'short')
+
+    assert messages[0].edit_text.call_args.kwargs['text'] == 'short'
+    assert messages[1].delete.call_count == 1
+    assert messages[2].delete.call_count == 1
+    assert result == messages[:1]
+
+
+def test_edit_ignores_unchanged_parts():
+    messages = create_sent_messages(1)
+    messages[0].edit_text.side_effect = BadRequest('Message is not modified')
+
+    assert edit_html_message(MagicMock(), messages, 'same') == messages
@@ -0,0 +1,51 @@
+from datetime import datetime
+from pytest_mock import MockFixture
+from bible.bible_metadata import BibleMetadata
+from bible.bible_registry import BibleRegistry
+from bible.plan_manager import ReadingTask
+from telegram_bot.daily_message_manager import TaskMessageManager
+from telegram_bot.prefetch import prefetch_messages
+from tests.utils import get_test_asset_content
+
+METADATA = BibleMetadata({'colossians': [29, 23, 25, 18], 'john': [51]})
+
+
+def create_manager() -> TaskMessageManager:
+    registry = BibleRegistry(translations={'NIV': 'niv.xml', 'ESV': None}, metadata=METADATA)
+    return TaskMessageManager(registry=registry)
+
+
+def test_prefetched_messages_are_sent_without_fetching(mocker: MockFixture):
+    get_html = mocker.patch('bible.bible_gateway.BibleGateway.get_html',
+                            return_value=get_test_asset_content('col-3.txt'))
+    manager = create_manager()
+    tasks = [ReadingTask('col', 3, 1, 1000, datetime(2022, 1, 3)),
+             ReadingTask('col', 3, 1, 10, datetime(2022, 1, 4))]
+
+    result = prefetch_messages(tasks, ['NIV', 'ESV'], manager, max_workers=3)
+
+    assert len(result.succeeded) == 4
+    assert result.failed == []
+    assert get_html.call_count == 4
+
+    for task in tasks:
+        manager.get_task_message(task, 'ESV')
+
+    assert get_html.call_count == 4
+
+
+def test_failures_are_reported(mocker: MockFixture):
+    def get_html(self, book, chapter, version='NIV', deadline=None, end_chapter=None):
+        if book == 'john':
+            raise ValueError('Error!')
+
+        return get_test_asset_content('col-3.txt')
+
+    mocker.patch('bible.bible_gateway.BibleGateway.get_html', get_html)
+    john = ReadingTask('john', 1, 1, 1000, datetime(2022, 1, 4))
+
+    result = prefetch_messages([ReadingTask('col', 3, 1, 1000, datetime(2022, 1, 3)), john],
+                               ['NIV'], create_manager())
+
+    assert str(result) == '1 passage(s) cached, 1 failed'
+    assert [(task, version) for task, version, _ in result.failed] == [(john, 'NIV')]
@@ -0,0 +1,112 @@
+import time
+from typing import Optional
+from bible.page_cache import PageCache
+from telegram_bot.render_cache import RenderCache
+from tests.utils import FakeClock
+
+KEY = ('colossians', 3, 1, 25, 'NIV', 1)
+
+
+def test_get_returns_what_was_put():
+    cache = RenderCache()
+
+    assert cache.get(KEY) is None
+
+    cache.put(KEY, 'body')
+
+    assert cache.get(KEY) == 'body'
+    assert cache.get(('colossians', 3, 1, 25, 'ESV', 1)) is None
+
+
+def test_evicts_least_recently_used():
+    cache = RenderCache(max_entries=2)
+
+    cache.put(('a',), 'a')
+    cache.put(('b',), 'b')
+    cache.get(('a',))
+    cache.put(('c',), 'c')
+
+    assert len(cache) == 2
+    assert cache.get(('a',)) == 'a'
+    assert cache.get(('b',)) is None
+    assert cache.get(('c',)) == 'c'
+
+
+def test_expires():
+    clock = FakeClock()
+    cache = RenderCache(ttl=60, clock=clock)
+    cache.put(KEY, 'body')
+
+    clock.now += 59
+    assert cache.get(KEY) == 'body'
+
+    clock.now += 1
+    assert cache.get(KEY) is None
+    assert len(cache) == 0
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    RenderCache(store=PageCache(cache_dir=str(tmp_path))).put(KEY, 'body')
+
+    cache = RenderCache(store=PageCache(cache_dir=str(tmp_path)))
+
+    assert cache.get(KEY) == 'body'
+    assert len(cache) == 1
+    assert cache.get(KEY[:-1] + (2,)) is None
+
+
+class FakeSharedStore:
+    def __init__(self, fail: bool = False):
+        self.entries = {}
+        self.fail = fail
+        self.timeouts = []
+
+    def get_entry(self, key: str, timeout: Optional[float] = None):
+        self.timeouts.append(timeout)
+
+        if self.fail:
+            raise ConnectionError('unavailable')
+
+        return self.entries.get(key)
+
+    def put_entry(self, key: str, text: str):
+        if self.fail:
+            raise ConnectionError('unavailable')
+
+        self.entries[key] = text
+
+
+def test_shared_tier_is_read_by_another_process(tmp_path):
+    shared = FakeSharedStore()
+    RenderCache(store=PageCache(cache_dir=str(tmp_path / 'a')), shared=shared).put(KEY, 'body')
+
+    store = PageCache(cache_dir=str(tmp_path / 'b'))
+    cache = RenderCache(store=store, shared=shared)
+
+    assert cache.get(KEY) == 'body'
+    assert len(cache) == 1
+    # The local tier is filled, so the next process on this machine does not read the shared one
+    assert RenderCache(store=store).get(KEY) == 'body'
+
+
+def test_shared_tier_failures_are_ignored():
+    cache = RenderCache(shared=FakeSharedStore(fail=True))
+
+    assert cache.get(KEY) is None
+
+    cache.put(KEY, 'body')
+
+    assert cache.get(KEY) == 'body'
+
+
+def test_shared_tier_is_skipped_or_bounded_by_deadline():
+    shared = FakeSharedStore()
+    shared.entries[RenderCache._store_key(KEY)] = 'body'
+    cache = RenderCache(shared=shared)
+
+    assert cache.get(KEY, shared=False) is None
+    assert cache.get(KEY, deadline=time.monotonic() - 1) is None
+    assert shared.timeouts == []
+
+    assert cache.get(KEY, deadline=time.monotonic() + 2) == 'body'
+    assert 0 < shared.timeouts[0] <= 2
@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+from pytest_mock import MockFixture
+from telegram_bot.subscriber_cache import RESTART_SECONDS, SubscriberCache
+from tests.utils import FakeClock
+
+
+def create_repo(mocker: MockFixture, subscribers: dict):
+    repo = mocker.Mock()
+    repo.get.side_effect = lambda chat_id: subscribers.get(str(chat_id))
+    repo.from_doc.side_effect = lambda doc: doc.to_dict()
+    repo.collection.on_snapshot.return_value = mocker.Mock(is_active=True)
+
+    return repo
+
+
+def change(doc_id: str, data: dict, change_type: str = 'MODIFIED'):
+    doc = SimpleNamespace(id=doc_id, to_dict=lambda: data)
+    return SimpleNamespace(document=doc, type=SimpleNamespace(name=change_type))
+
+
+def start(cache: SubscriberCache):
+    cache.start()
+    cache._on_snapshot(None, [], None)
+
+
+def test_reads_through_until_listening(mocker: MockFixture):
+    repo = create_repo(mocker, {'1': {'chat_id': 1}})
+    cache = SubscriberCache(repo)
+
+    cache.get(1)
+    cache.get(1)
+
+    assert repo.get.call_count == 2
+    assert cache.metrics['bypasses'] == 2
+
+    # Not synced until the first snapshot
+    cache.start()
+    cache.get(1)
+
+    assert repo.get.call_count == 3
+
+
+def test_repeated_reads_are_served_from_memory(mocker: MockFixture):
+    repo = create_repo(mocker, {'1': {'chat_id': 1}})
+    cache = SubscriberCache(repo)
+    start(cache)
+
+    for _ in range(3):
+        assert cache.get(1) == {'chat_id': 1}
+        assert cache.get('2') is None
+
+    assert repo.get.call_count == 2
+    assert cache.metrics['hits'] == 4
+    assert cache.metrics['misses'] == 2
+
+
+def test_changes_update_cached_subscribers(mocker: MockFixture):
+    repo = create_repo(mocker, {'1': {'chat_id': 1, 'sub_items': []}})
+    cache = SubscriberCache(repo)
+    start(cache)
+    cache.get(1)
+    cache.get(2)
+
+    cache._on_snapshot(None, [
+        change('1', {'chat_id': 1, 'sub_items': [1]}),
+        change('2', {'chat_id': 2, 'sub_items': [1]}, 'ADDED'),
+        change('3', {'chat_id': 3, 'sub_items': [1]}, 'ADDED'),
+    ], None)
+
+    assert cache.get(1) == {'chat_id': 1, 'sub_items': [1]}
+    assert cache.get(2) == {'chat_id': 2, 'sub_items': [1]}
+    assert repo.get.call_count == 2
+
+    # Chats that were not cached are not added
+    assert len(cache) == 2
+
+
+def test_removed_and_unkeyed_documents_are_read_again(mocker: MockFixture):
+    subscribers = {'1': {'chat_id': 1}, '2': {'chat_id': 2}}
+    repo = create_repo(mocker, subscribers)
+    cache = SubscriberCache(repo)
+    start(cache)
+    cache.get(1)
+    cache.get(2)
+
+    del subscribers['1']
+    cache._on_snapshot(None, [
+        change('1', {'chat_id': 1}, 'REMOVED'),
+        change('random-id', {'chat_id': 2}),
+    ], None)
+
+    assert cache.get(1) is None
+    assert cache.get(2) == {'chat_id': 2}
+    assert repo.get.call_count == 4
+    assert cache.metrics['invalidations'] == 2
+
+
+def test_size_is_bounded(mocker: MockFixture):
+    repo = create_repo(mocker, {})
+    cache = SubscriberCache(repo, max_entries=2)
+    start(cache)
+
+    for chat_id in [1, 2, 1, 3]:
+        cache.get(chat_id)
+
+    assert len(cache) == 2
+    assert cache.metrics['evictions'] == 1
+
+    # The least recently used chat was evicted
+    cache.get(1)
+    assert repo.get.call_count == 3
+
+
+def test_read_racing_a_change_is_not_cached(mocker: MockFixture):
+    repo = create_repo(mocker, {})
+    cache = SubscriberCache(repo)
+    start(cache)
+
+    def get_during_change(chat_id):
+        cache.invalidate(chat_id)
+        return {'chat_id': chat_id}
+
+    repo.get.side_effect = get_during_change
+    cache.get(1)
+    cache.get(1)
+
+    assert repo.get.call_count == 2
+
+
+def test_listens_again_after_listener_stops(mocker: MockFixture):
+    clock = FakeClock()
+    repo = create_repo(mocker, {'1': {'chat_id': 1}})
+    cache = SubscriberCache(repo, clock=clock)
+    start(cache)
+    cache.get(1)
+
+    repo.collection.on_snapshot.return_value.is_active = False
+
+    # The cache is not used while the listener is down
+    cache.get(1)
+    assert repo.get.call_count == 2
+    assert repo.collection.on_snapshot.call_count == 1
+
+    clock.now += RESTART_SECONDS
+    repo.collection.on_snapshot.return_value = mocker.Mock(is_active=True)
+    cache.get(1)
+
+    assert repo.collection.on_snapshot.call_count == 2
@@ -26,3 +26,13 @@ def get_expected_footnotes(file: str) -> List[Tuple[str, str]]:
         result.append((lines[i], lines[i + 1]))
 
     return result
+
+
+class FakeClock:
+    """Returns the time in seconds, which only changes when `now` is changed."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
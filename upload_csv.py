@@ -1,5 +1,6 @@
 from assets import get_asset
 from bible.plan_manager import PlanManager
+from config.env import PLAN_LEGACY_LOOKUP
 from data import db
 from data.plan_repository import PlanRepository
 from google.cloud import firestore
@@ -25,19 +26,12 @@ plan_manager = PlanManager(rows)
 tasks = plan_manager.get_tasks()
 
 # Create repo
-repo = PlanRepository(db)
+repo = PlanRepository(db, legacy_lookup=PLAN_LEGACY_LOOKUP)
 
-# Counter
-i = 0
 print(f'Uploading {len(tasks)} tasks.')
 
-# Upload all tasks
-for task in tasks:
-    repo.upsert_plan(task)
-
-    # Print progress
-    i += 1
-    print(f'\r{i} / {len(tasks)}', end='')
+# Upload all tasks in batches, printing the progress
+repo.upsert_plans(tasks, on_progress=lambda done, total: print(f'\r{done} / {total}', end=''))
 
 print()
 print('Uploaded all tasks!')